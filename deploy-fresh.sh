@@ -204,7 +204,7 @@ fi
 log "Systemd: gunicorn..."
 cat > /etc/systemd/system/fc_phones_django.service <<EOF
 [Unit]
-Description=FC Phones Django (Gunicorn)
+Description=FC Phones Django (Gunicorn + Uvicorn, ASGI)
 After=network.target
 
 [Service]
@@ -213,7 +213,8 @@ User=${SERVICE_USER}
 Group=${SERVICE_USER}
 WorkingDirectory=${PROJECT_DIR}
 Environment=PATH=${VENV}/bin
-ExecStart=${VENV}/bin/gunicorn fc_phones.wsgi:application \
+ExecStart=${VENV}/bin/gunicorn fc_phones.asgi:application \
+    --worker-class uvicorn.workers.UvicornWorker \
     --bind 127.0.0.1:8000 \
     --workers ${GUNICORN_WORKERS} \
     --timeout 120 \
@@ -246,6 +247,146 @@ RestartSec=5
 WantedBy=multi-user.target
 EOF
 
+log "Systemd: notification worker..."
+cat > /etc/systemd/system/fc_phones_notifications.service <<EOF
+[Unit]
+Description=FC Phones Notification Worker
+After=network.target fc_phones_django.service
+
+[Service]
+Type=exec
+User=${SERVICE_USER}
+Group=${SERVICE_USER}
+WorkingDirectory=${PROJECT_DIR}
+Environment=PATH=${VENV}/bin
+ExecStart=${VENV}/bin/python ${PROJECT_DIR}/manage.py run_notification_worker
+Restart=always
+RestartSec=5
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+log "Systemd: export worker..."
+cat > /etc/systemd/system/fc_phones_exports.service <<EOF
+[Unit]
+Description=FC Phones Export Worker
+After=network.target fc_phones_django.service
+
+[Service]
+Type=exec
+User=${SERVICE_USER}
+Group=${SERVICE_USER}
+WorkingDirectory=${PROJECT_DIR}
+Environment=PATH=${VENV}/bin
+ExecStart=${VENV}/bin/python ${PROJECT_DIR}/manage.py run_export_worker
+Restart=always
+RestartSec=5
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+cat > /etc/systemd/system/fc_phones_log_indexer.service <<EOF
+[Unit]
+Description=FC Phones Log Indexer
+After=network.target fc_phones_django.service
+
+[Service]
+Type=exec
+User=${SERVICE_USER}
+Group=${SERVICE_USER}
+WorkingDirectory=${PROJECT_DIR}
+Environment=PATH=${VENV}/bin
+ExecStart=${VENV}/bin/python ${PROJECT_DIR}/manage.py index_logs
+Restart=always
+RestartSec=5
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+cat > /etc/systemd/system/fc_phones_log_blobs.service <<EOF
+[Unit]
+Description=FC Phones Log Storage Reconcile
+After=network.target
+
+[Service]
+Type=oneshot
+User=${SERVICE_USER}
+Group=${SERVICE_USER}
+WorkingDirectory=${PROJECT_DIR}
+Environment=PATH=${VENV}/bin
+ExecStart=${VENV}/bin/python ${PROJECT_DIR}/manage.py reconcile_log_blobs
+EOF
+
+cat > /etc/systemd/system/fc_phones_log_blobs.timer <<EOF
+[Unit]
+Description=FC Phones Log Storage Reconcile (hourly)
+
+[Timer]
+OnCalendar=hourly
+RandomizedDelaySec=300
+Persistent=true
+
+[Install]
+WantedBy=timers.target
+EOF
+
+cat > /etc/systemd/system/fc_phones_battery_rollup.service <<EOF
+[Unit]
+Description=FC Phones Battery History Rollup
+After=network.target
+
+[Service]
+Type=oneshot
+User=${SERVICE_USER}
+Group=${SERVICE_USER}
+WorkingDirectory=${PROJECT_DIR}
+Environment=PATH=${VENV}/bin
+ExecStart=${VENV}/bin/python ${PROJECT_DIR}/manage.py rollup_battery_reports
+EOF
+
+cat > /etc/systemd/system/fc_phones_battery_rollup.timer <<EOF
+[Unit]
+Description=FC Phones Battery History Rollup (daily)
+
+[Timer]
+OnCalendar=*-*-* 03:30:00
+RandomizedDelaySec=600
+Persistent=true
+
+[Install]
+WantedBy=timers.target
+EOF
+
+cat > /etc/systemd/system/fc_phones_dashboard_counters.service <<EOF
+[Unit]
+Description=FC Phones Dashboard Counters Reconcile
+After=network.target
+
+[Service]
+Type=oneshot
+User=${SERVICE_USER}
+Group=${SERVICE_USER}
+WorkingDirectory=${PROJECT_DIR}
+Environment=PATH=${VENV}/bin
+ExecStart=${VENV}/bin/python ${PROJECT_DIR}/manage.py reconcile_dashboard_counters
+EOF
+
+cat > /etc/systemd/system/fc_phones_dashboard_counters.timer <<EOF
+[Unit]
+Description=FC Phones Dashboard Counters Reconcile (daily)
+
+[Timer]
+OnCalendar=*-*-* 04:30:00
+RandomizedDelaySec=600
+Persistent=true
+
+[Install]
+WantedBy=timers.target
+EOF
+
 log "Nginx (HTTP, только IP)..."
 cat > /etc/nginx/sites-available/${PROJECT_NAME} <<EOF
 server {
@@ -264,6 +405,11 @@ server {
         add_header Cache-Control "public, immutable";
     }
 
+    # Файлы фоновых экспортов отдаются только через админку
+    location /media/exports/ {
+        return 404;
+    }
+
     location /media/ {
         alias ${PROJECT_DIR}/media/;
         expires 7d;
@@ -306,14 +452,23 @@ fi
 
 log "Запуск сервисов..."
 systemctl daemon-reload
-systemctl enable fc_phones_django fc_phones_bot nginx
-systemctl restart fc_phones_django fc_phones_bot nginx
+systemctl enable fc_phones_django fc_phones_bot fc_phones_notifications fc_phones_exports fc_phones_log_indexer nginx
+systemctl restart fc_phones_django fc_phones_bot fc_phones_notifications fc_phones_exports fc_phones_log_indexer nginx
+systemctl enable --now fc_phones_log_blobs.timer
+systemctl enable --now fc_phones_battery_rollup.timer
+systemctl enable --now fc_phones_dashboard_counters.timer
 
 sleep 2
 
 log "Проверка..."
-systemctl is-active --quiet fc_phones_django && ok "Django (gunicorn) работает" || fail "Django не запустился"
+systemctl is-active --quiet fc_phones_django && ok "Django (gunicorn + uvicorn) работает" || fail "Django не запустился"
 systemctl is-active --quiet fc_phones_bot      && ok "Telegram bot работает"   || warn "Bot не запустился — проверьте journalctl -u fc_phones_bot"
+systemctl is-active --quiet fc_phones_notifications && ok "Воркер уведомлений работает" || warn "Воркер уведомлений не запустился — проверьте journalctl -u fc_phones_notifications"
+systemctl is-active --quiet fc_phones_exports && ok "Воркер экспортов работает" || warn "Воркер экспортов не запустился — проверьте journalctl -u fc_phones_exports"
+systemctl is-active --quiet fc_phones_log_indexer && ok "Индексатор логов работает" || warn "Индексатор логов не запустился — проверьте journalctl -u fc_phones_log_indexer"
+systemctl is-active --quiet fc_phones_log_blobs.timer && ok "Таймер сверки логов включен" || warn "Таймер сверки логов не запустился — проверьте systemctl status fc_phones_log_blobs.timer"
+systemctl is-active --quiet fc_phones_battery_rollup.timer && ok "Таймер свертки истории батареи включен" || warn "Таймер свертки истории батареи не запустился — проверьте systemctl status fc_phones_battery_rollup.timer"
+systemctl is-active --quiet fc_phones_dashboard_counters.timer && ok "Таймер сверки счетчиков панели включен" || warn "Таймер сверки счетчиков панели не запустился — проверьте systemctl status fc_phones_dashboard_counters.timer"
 systemctl is-active --quiet nginx              && ok "Nginx работает"          || fail "Nginx не запустился"
 
 HTTP_CODE=$(curl -s -o /dev/null -w "%{http_code}" "http://${SERVER_IP}/admin/login/" || echo "000")
@@ -339,5 +494,5 @@ echo ""
 echo "  Полезные команды:"
 echo "    journalctl -u fc_phones_django -f"
 echo "    journalctl -u fc_phones_bot -f"
-echo "    systemctl restart fc_phones_django fc_phones_bot nginx"
+echo "    systemctl restart fc_phones_django fc_phones_bot fc_phones_notifications fc_phones_exports fc_phones_log_indexer nginx"
 echo ""
@@ -106,7 +106,7 @@ sudo -u $SERVICE_USER $PROJECT_DIR/venv/bin/python $PROJECT_DIR/manage.py create
 log "Создание systemd сервиса для Django..."
 cat > $SYSTEMD_DIR/fc_phones_django.service << EOF
 [Unit]
-Description=FC Phones Django Application
+Description=FC Phones Django Application (Uvicorn, ASGI)
 After=network.target
 
 [Service]
@@ -115,7 +115,8 @@ User=$SERVICE_USER
 Group=$SERVICE_USER
 WorkingDirectory=$PROJECT_DIR
 Environment=PATH=$PROJECT_DIR/venv/bin
-ExecStart=$PROJECT_DIR/venv/bin/python $PROJECT_DIR/manage.py runserver 0.0.0.0:8000
+# ASGI (uvicorn): под runserver (WSGI) живая лента дашборда (SSE) отключена и дашборд обновляется опросом
+ExecStart=$PROJECT_DIR/venv/bin/uvicorn fc_phones.asgi:application --host 0.0.0.0 --port 8000
 Restart=always
 RestartSec=3
 
@@ -143,6 +144,26 @@ RestartSec=3
 WantedBy=multi-user.target
 EOF
 
+log "Создание systemd сервиса для воркера уведомлений..."
+cat > $SYSTEMD_DIR/fc_phones_notifications.service << EOF
+[Unit]
+Description=FC Phones Notification Worker
+After=network.target
+
+[Service]
+Type=exec
+User=$SERVICE_USER
+Group=$SERVICE_USER
+WorkingDirectory=$PROJECT_DIR
+Environment=PATH=$PROJECT_DIR/venv/bin
+ExecStart=$PROJECT_DIR/venv/bin/python $PROJECT_DIR/manage.py run_notification_worker
+Restart=always
+RestartSec=3
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
 log "Настройка Nginx..."
 cat > $NGINX_SITES_AVAILABLE/$PROJECT_NAME << EOF
 server {
@@ -202,8 +223,10 @@ log "Перезапуск сервисов..."
 systemctl daemon-reload
 systemctl enable fc_phones_django
 systemctl enable fc_phones_bot
+systemctl enable fc_phones_notifications
 systemctl start fc_phones_django
 systemctl start fc_phones_bot
+systemctl start fc_phones_notifications
 systemctl restart nginx
 
 log "Настройка файрвола..."
@@ -215,6 +238,7 @@ ufw --force enable
 log "Проверка статуса сервисов..."
 systemctl status fc_phones_django --no-pager
 systemctl status fc_phones_bot --no-pager
+systemctl status fc_phones_notifications --no-pager
 
 success "Разворачивание завершено!"
 echo ""
@@ -222,7 +246,7 @@ echo "📋 Следующие шаги:"
 echo "1. Отредактируйте файл $PROJECT_DIR/.env с вашими настройками"
 echo "2. Измените домен в конфигурации Nginx: $NGINX_SITES_AVAILABLE/$PROJECT_NAME"
 echo "3. Настройте SSL сертификат (рекомендуется Let's Encrypt)"
-echo "4. Перезапустите сервисы: systemctl restart fc_phones_django fc_phones_bot nginx"
+echo "4. Перезапустите сервисы: systemctl restart fc_phones_django fc_phones_bot fc_phones_notifications nginx"
 echo ""
 echo "🌐 Ваше приложение доступно по адресу: http://your-server-ip"
 echo "📱 Админка: http://your-server-ip/admin/"
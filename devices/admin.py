@@ -1,22 +1,39 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import path, reverse
 from django.utils.safestring import mark_safe
+from django.db import OperationalError
 from django.db.models import Count, Q
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib import messages
 from django.shortcuts import redirect
-from django.http import HttpRequest, HttpResponse
-from datetime import timedelta
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse
+from django.template.response import TemplateResponse
+from datetime import datetime, time, timedelta
 from unfold.admin import ModelAdmin
 from unfold.decorators import action
+from unfold.forms import ActionForm
+from unfold.widgets import UnfoldBooleanSwitchWidget
 from unfold.contrib.filters.admin import (
     RangeDateFilter,
     RelatedDropdownFilter,
     ChoicesDropdownFilter,
 )
-from .models import Device, Message, TelegramUser, NotificationFilter, AuthToken, LogFile, DeviceStatus, DiagnosticEvent
+from .models import Device, Message, TelegramUser, NotificationFilter, AuthToken, LogFile, LogBlob, DeviceStatus, DiagnosticEvent, NotificationOutbox, NotificationTextFilter, DeviceStatusHistory, DiagnosticArchiveSegment, ExportJob
+from .dashboard_stats import get_counts
+from .diagnostics_archive import iter_archived_events
+from .diagnostics_export import (
+    csv_chunks, device_report_chunks, error_log_chunks, iter_events, json_array_chunks, last_events_chunks,
+    ndjson_chunks, selected_devices, streaming_export,
+)
+from .export_jobs import submit_export
+from .log_search import fts_available, search_logs
+from .log_storage import original_name
+from .message_feed import latest_cursor
+from .retention import delete_in_chunks
 import secrets
 import string
 import json
@@ -26,64 +43,47 @@ def dashboard_callback(request, context):
     """Кастомный dashboard для Unfold"""
     now = timezone.now()
     yesterday = now - timedelta(days=1)
-    week_ago = now - timedelta(days=7)
-    
-    # Статистика устройств
-    total_devices = Device.objects.count()
-    
-    # Определяем офлайн устройства по статусу: если последний DeviceStatus имеет network_available=False или status_level='ERROR'
-    # Получаем последний статус для каждого устройства
-    from django.db.models import OuterRef, Subquery
-    
-    latest_status = DeviceStatus.objects.filter(
-        device=OuterRef('pk')
-    ).order_by('-date_created')
-    
-    devices_with_status = Device.objects.annotate(
-        latest_network_available=Subquery(
-            latest_status.values('network_available')[:1]
-        ),
-        latest_status_level=Subquery(
-            latest_status.values('status_level')[:1]
-        )
-    )
     
+    # Статистика устройств одним запросом (одна строка DeviceStatus на устройство).
     # Устройство офлайн, если:
-    # 1. У него нет DeviceStatus (latest_network_available is None)
-    # 2. Или latest_network_available=False
-    # 3. Или latest_status_level='ERROR'
-    offline_devices = devices_with_status.filter(
-        Q(latest_network_available__isnull=True) | 
-        Q(latest_network_available=False) | 
-        Q(latest_status_level='ERROR')
-    ).count()
-    
+    # 1. У него нет DeviceStatus
+    # 2. Или network_available=False
+    # 3. Или status_level='ERROR'
+    device_stats = Device.objects.aggregate(
+        total=Count('id'),
+        offline=Count('id', filter=(
+            Q(current_status__isnull=True) |
+            Q(current_status__network_available=False) |
+            Q(current_status__status_level='ERROR')
+        )),
+    )
+    total_devices = device_stats['total']
+    offline_devices = device_stats['offline']
     online_devices = total_devices - offline_devices
     
-    # Статистика сообщений
-    total_messages = Message.objects.count()
-    today_messages = Message.objects.filter(created_at__gte=yesterday).count()
-    week_messages = Message.objects.filter(created_at__gte=week_ago).count()
-    
-    # Статистика батареи (из отчетов о статусе)
-    recent_status_reports = DeviceStatus.objects.filter(created_at__gte=yesterday)
-    low_battery_devices = recent_status_reports.filter(battery_level__lt=20).count()
+    # Сообщения и логи - из предагрегированных счетчиков (devices.dashboard_stats)
+    counts = get_counts(now)
+    today_messages = counts['messages']['day']
+    week_messages = counts['messages']['week']
+    total_logs = counts['log_files']['total']
+    today_logs = counts['log_files']['day']
+    week_logs = counts['log_files']['week']
     
-    # Статистика зарядки
-    charging_devices = recent_status_reports.filter(is_charging=True).values('device').distinct().count()
-    
-    # Статистика сети
-    devices_with_network = recent_status_reports.filter(network_available=True).values('device').distinct().count()
-    
-    # Статистика логов
-    total_logs = LogFile.objects.count()
-    today_logs = LogFile.objects.filter(created_at__gte=yesterday).count()
-    week_logs = LogFile.objects.filter(created_at__gte=week_ago).count()
-    
-    # Статистика статусов устройств
-    success_status = recent_status_reports.filter(status_level='SUCCESS').count()
-    attention_status = recent_status_reports.filter(status_level='ATTENTION').count()
-    error_status = recent_status_reports.filter(status_level='ERROR').count()
+    # Статистика батареи, зарядки, сети и статусов за сутки одним запросом
+    status_stats = DeviceStatus.objects.filter(created_at__gte=yesterday).aggregate(
+        low_battery=Count('id', filter=Q(battery_level__lt=20)),
+        charging=Count('device', filter=Q(is_charging=True), distinct=True),
+        with_network=Count('device', filter=Q(network_available=True), distinct=True),
+        success=Count('id', filter=Q(status_level='SUCCESS')),
+        attention=Count('id', filter=Q(status_level='ATTENTION')),
+        error=Count('id', filter=Q(status_level='ERROR')),
+    )
+    low_battery_devices = status_stats['low_battery']
+    charging_devices = status_stats['charging']
+    devices_with_network = status_stats['with_network']
+    success_status = status_stats['success']
+    attention_status = status_stats['attention']
+    error_status = status_stats['error']
     
     # Последние отчеты о статусе
     recent_status_qs = (
@@ -119,6 +119,7 @@ def dashboard_callback(request, context):
         }
         for m in recent_messages_qs
     ]
+    recent_messages_cursor = latest_cursor()
     
     # Последние логи
     recent_logs_qs = (
@@ -129,8 +130,8 @@ def dashboard_callback(request, context):
         {
             "device_name": l.device.name,
             "device_id": str(l.device.id),
-            "file_name": l.file.name.split('/')[-1] if l.file else "No file",
-            "file_url": l.file.url if l.file else None,
+            "file_name": original_name(l) if l.file else "No file",
+            "file_url": reverse('log-file-download', args=[l.pk]) if l.file else None,
             "date_created": l.date_created,
         }
         for l in recent_logs_qs
@@ -155,6 +156,7 @@ def dashboard_callback(request, context):
         'attention_status': attention_status,
         'error_status': error_status,
         'recent_messages': recent_messages,
+        'recent_messages_cursor': recent_messages_cursor,
         'recent_logs': recent_logs,
         'recent_status': recent_status,
     })
@@ -200,7 +202,7 @@ class DeviceAdmin(ModelAdmin):
         return redirect(reverse('admin:devices_device_changelist'))
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related()
+        return super().get_queryset(request).select_related('current_status')
     
     def id_display(self, obj):
         """Отображает первые 8 символов ID как ссылку"""
@@ -219,9 +221,8 @@ class DeviceAdmin(ModelAdmin):
     token_display.short_description = _('Токен')
     
     def status_badge(self, obj):
-        """Показывает статус устройства на основе последнего DeviceStatus"""
-        # Получаем последний статус устройства
-        latest_status = obj.status_reports.order_by('-date_created').first()
+        """Показывает статус устройства на основе текущего DeviceStatus"""
+        latest_status = getattr(obj, 'current_status', None)
         
         if latest_status:
             # Устройство офлайн, если network_available=False или status_level='ERROR'
@@ -299,9 +300,8 @@ class MessageAdmin(ModelAdmin):
     def clear_all_messages(self, request: HttpRequest):
         """Удаляет все сообщения из базы данных"""
         try:
-            count = Message.objects.count()
-            Message.objects.all().delete()
-            messages.success(request, f'✅ Успешно удалено {count} сообщений')
+            result = delete_in_chunks(Message.objects.all())
+            messages.success(request, f'✅ Успешно удалено {result.deleted} сообщений')
         except Exception as e:
             messages.error(request, f'❌ Ошибка при удалении сообщений: {str(e)}')
         
@@ -341,6 +341,18 @@ class NotificationFilterAdmin(ModelAdmin):
     is_active_badge.short_description = _('Статус')
 
 
+@admin.register(NotificationTextFilter)
+class NotificationTextFilterAdmin(ModelAdmin):
+    list_display = ['pattern', 'rule_type', 'description', 'filter_type_badge', 'is_active_badge', 'updated_at']
+    list_filter = ['rule_type', 'filter_type', 'is_active', 'created_at']
+    search_fields = ['pattern', 'description']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+    list_per_page = 25
+
+    filter_type_badge = NotificationFilterAdmin.filter_type_badge
+    is_active_badge = NotificationFilterAdmin.is_active_badge
+
+
 @admin.register(TelegramUser)
 class TelegramUserAdmin(ModelAdmin):
     list_display = ['user_display', 'username', 'is_active', 'last_activity', 'created_at']
@@ -362,6 +374,50 @@ class TelegramUserAdmin(ModelAdmin):
     user_display.short_description = _('Пользователь')
 
 
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(ModelAdmin):
+    list_display = ['text_preview', 'status_badge', 'attempts', 'next_attempt_at', 'sent_at', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['text', 'last_error']
+    readonly_fields = ['id', 'created_at', 'sent_at', 'locked_at', 'attempts', 'last_error']
+    list_per_page = 25
+    actions = ['retry_action']
+
+    def text_preview(self, obj):
+        """Показывает превью текста уведомления"""
+        text = obj.text
+        if len(text) > 60:
+            text = text[:60] + '...'
+        return format_html(
+            '<div style="max-width: 400px; overflow: hidden; text-overflow: ellipsis;">{}</div>',
+            text
+        )
+    text_preview.short_description = _('Текст уведомления')
+
+    def status_badge(self, obj):
+        """Показывает статус доставки"""
+        colors = {
+            'pending': '#FF9800',
+            'sending': '#2196F3',
+            'sent': '#4CAF50',
+            'dead': '#f44336',
+        }
+        return format_html(
+            '<span style="background: {}; color: white; padding: 2px 8px; border-radius: 12px; font-size: 11px;">{}</span>',
+            colors.get(obj.status, '#9e9e9e'),
+            obj.get_status_display()
+        )
+    status_badge.short_description = _('Статус')
+
+    def retry_action(self, request, queryset):
+        """Повторно ставит недоставленные уведомления в очередь"""
+        count = queryset.filter(status='dead').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), locked_at=None
+        )
+        self.message_user(request, f'Повторно поставлено в очередь: {count}')
+    retry_action.short_description = _('🔁 Повторить отправку недоставленных')
+
+
 @admin.register(AuthToken)
 class AuthTokenAdmin(ModelAdmin):
     list_display = ['token', 'is_used_display', 'used_by_display', 'created_at', 'used_at']
@@ -414,16 +470,87 @@ class AuthTokenAdmin(ModelAdmin):
 
 @admin.register(LogFile)
 class LogFileAdmin(ModelAdmin):
-    list_display = ['device_name', 'file', 'date_created']
-    list_filter = ['date_created', 'device']
-    search_fields = ['device__name', 'file']
-    readonly_fields = ['id', 'created_at', 'device_name']
+    list_display = ['device_name', 'file_name_display', 'size_display', 'download_link', 'date_created']
+    list_filter = ['date_created', 'device', 'compression']
+    search_fields = ['device__name', 'original_name', 'file', 'blob__sha256']
+    readonly_fields = [
+        'id', 'created_at', 'device_name', 'file', 'blob', 'original_name', 'compression',
+        'original_size', 'stored_size', 'size_display', 'download_link',
+    ]
     list_per_page = 25
+    list_select_related = ['device']
+    actions_list = ['search_content_action']
+    
+    @action(description=_("🔎 Поиск по содержимому"), url_path="search", permissions=["view"])
+    def search_content_action(self, request: HttpRequest):
+        """Поиск строк по содержимому логов (полнотекстовый индекс index_logs)"""
+        query = request.GET.get('q', '').strip()
+        selected_device = request.GET.get('device', '')
+        since = request.GET.get('since', '')
+        raw = bool(request.GET.get('raw'))
+        limit = 200
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': _('Поиск по содержимому логов'),
+            'query': query,
+            'devices': Device.objects.order_by('name').only('pk', 'name'),
+            'selected_device': selected_device,
+            'since': since,
+            'raw': raw,
+            'limit': limit,
+            'hits': [],
+            'milliseconds': 0,
+            'error': '',
+            'pending': LogBlob.objects.filter(indexed_at__isnull=True).count(),
+        }
+        if not fts_available():
+            context['error'] = 'Полнотекстовый поиск доступен только на SQLite (FTS5)'
+        elif query:
+            devices = Device.objects.filter(pk=selected_device) if selected_device.isdigit() else None
+            since_dt = None
+            if since:
+                try:
+                    since_dt = timezone.make_aware(datetime.combine(datetime.strptime(since, '%Y-%m-%d').date(), time.min))
+                except ValueError:
+                    context['error'] = f'Некорректная дата: {since}'
+            if not context['error']:
+                try:
+                    result = search_logs(query, limit=limit, devices=devices, since=since_dt, raw=raw)
+                    context['hits'] = result.hits
+                    context['milliseconds'] = result.milliseconds
+                except OperationalError as e:
+                    context['error'] = f'Некорректный запрос: {e}'
+        return TemplateResponse(request, 'admin/devices/logfile/search.html', context)
     
     def device_name(self, obj):
         """Показывает название устройства"""
         return obj.device.name
     device_name.short_description = _('Устройство')
+    
+    def file_name_display(self, obj):
+        """Исходное имя загруженного файла"""
+        return original_name(obj) if obj.file else '-'
+    file_name_display.short_description = _('Файл')
+    
+    def size_display(self, obj):
+        """Исходный размер и степень сжатия"""
+        if not obj.original_size:
+            return '-'
+        size = f"{obj.original_size / 1024:.1f} КБ"
+        ratio = obj.compression_ratio
+        if obj.compression and ratio:
+            return f"{size} ({obj.get_compression_display()}, x{ratio:.1f})"
+        return size
+    size_display.short_description = _('Размер')
+    
+    def download_link(self, obj):
+        """Ссылка на распакованный файл"""
+        if not obj.file:
+            return '-'
+        url = reverse('log-file-download', args=[obj.pk])
+        return format_html('<a href="{}" target="_blank">📄 Открыть</a>', url)
+    download_link.short_description = _('Содержимое')
 
 
 @admin.register(DeviceStatus)
@@ -598,6 +725,68 @@ class DeviceStatusAdmin(ModelAdmin):
         return super().get_queryset(request).select_related('device')
 
 
+@admin.register(DeviceStatusHistory)
+class DeviceStatusHistoryAdmin(ModelAdmin):
+    list_display = ['device_name', 'status_badge', 'is_charging', 'network_available', 'first_seen', 'last_seen', 'report_count']
+    list_filter = ['status_level', 'is_charging', 'network_available', 'first_seen']
+    search_fields = ['device__name', 'device__token']
+    readonly_fields = ['device', 'status_level', 'reasons', 'is_charging', 'network_available', 'first_seen', 'last_seen', 'report_count']
+    list_per_page = 50
+    list_select_related = ['device']
+
+    device_name = DeviceStatusAdmin.device_name
+    status_badge = DeviceStatusAdmin.status_badge
+
+    def has_add_permission(self, request):
+        return False
+
+
+class DiagnosticExportActionForm(ActionForm):
+    """Форма действий с опцией сжатия экспорта"""
+    compress = forms.BooleanField(label=_('Сжать gzip'), required=False, widget=UnfoldBooleanSwitchWidget)
+
+
+class DiagnosticEventActionForm(DiagnosticExportActionForm):
+    """Форма действий с событиями: экспорт сразу или фоновой задачей"""
+    background = forms.BooleanField(label=_('В фоне'), required=False, widget=UnfoldBooleanSwitchWidget)
+
+
+def _export_compressed(request):
+    return bool(request.POST.get('compress'))
+
+
+def _export_in_background(request):
+    return bool(request.POST.get('background'))
+
+
+def _changelist_filters(request):
+    """GET-параметры списка (фильтры и поиск) без пагинации и сортировки: {параметр: [значения]}"""
+    params = request.GET.copy()
+    for param in ('p', 'o', '_changelist_filters'):
+        params.pop(param, None)
+    return dict(params.lists())
+
+
+def _selected_ids(request):
+    """id отмеченных записей; None, если выбраны все записи по фильтру"""
+    if request.POST.get('select_across') == '1':
+        return None
+    return request.POST.getlist(ACTION_CHECKBOX_NAME)
+
+
+def _selection_description(request):
+    """Фильтры списка и выбранные записи в читаемом виде для задачи экспорта"""
+    filters = ', '.join(
+        f"{key}={value}" for key, values in sorted(_changelist_filters(request).items()) for value in values
+    )
+    selected_ids = _selected_ids(request)
+    if selected_ids is None:
+        selection = 'все записи по фильтру'
+    else:
+        selection = f"выбрано записей: {len(selected_ids)}"
+    return f"{selection}; фильтры: {filters or 'нет'}"
+
+
 @admin.register(DiagnosticEvent)
 class DiagnosticEventAdmin(ModelAdmin):
     """
@@ -657,10 +846,13 @@ class DiagnosticEventAdmin(ModelAdmin):
     # Действия для экспорта (стандартные Django actions для работы с выбранными объектами)
     actions = [
         'export_to_json_action',
+        'export_to_ndjson_action',
+        'export_to_csv_action',
         'export_error_log_action',
         'export_device_diagnostics_action',
         'export_last_10_per_device_action',
     ]
+    action_form = DiagnosticEventActionForm
     
     def get_queryset(self, request):
         """Оптимизация запросов с select_related"""
@@ -729,268 +921,273 @@ class DiagnosticEventAdmin(ModelAdmin):
     
     # Действия экспорта (стандартные Django actions)
     
+    def _submit_background_export(self, request, queryset, kind):
+        """Ставит экспорт в очередь run_export_worker вместо формирования файла в запросе"""
+        job = submit_export(
+            kind, _changelist_filters(request), _selected_ids(request), _selection_description(request), request.user
+        )
+        url = reverse('admin:devices_exportjob_change', args=[job.pk])
+        self.message_user(
+            request,
+            format_html(
+                'Экспорт «{}» поставлен в очередь. Прогресс и ссылка на файл - в <a href="{}">фоновых экспортах</a>.',
+                job.get_kind_display(), url
+            ),
+            level='success',
+        )
+    
     def export_to_json_action(self, request, queryset):
         """Экспорт выбранных событий в JSON"""
-        queryset = queryset.select_related('device')
-        
-        events_data = []
-        for event in queryset:
-            events_data.append({
-                'event_id': event.event_id,
-                'device': event.device.name,
-                'device_token': str(event.device.token),
-                'timestamp': event.timestamp,
-                'timestamp_display': event.get_timestamp_display(),
-                'event_code': event.event_code,
-                'event_severity': event.event_severity,
-                'component': event.component,
-                'pipeline_stage': event.pipeline_stage,
-                'thread': event.thread,
-                'attempt': event.attempt,
-                'flow_id': event.flow_id,
-                'context': event.context,
-                'state_snapshot': event.state_snapshot,
-                'metrics_snapshot': event.metrics_snapshot,
-                'created_at': event.created_at.isoformat(),
-            })
-        
-        response = HttpResponse(
-            json.dumps(events_data, indent=2, ensure_ascii=False),
-            content_type='application/json; charset=utf-8'
+        if _export_in_background(request):
+            return self._submit_background_export(request, queryset, 'json')
+        return streaming_export(
+            json_array_chunks(iter_events(queryset)),
+            'diagnostic_events.json',
+            'application/json; charset=utf-8',
+            compress=_export_compressed(request),
         )
-        response['Content-Disposition'] = 'attachment; filename="diagnostic_events.json"'
-        return response
     export_to_json_action.short_description = _('📄 Экспортировать в JSON')
     
+    def export_to_ndjson_action(self, request, queryset):
+        """Экспорт выбранных событий в NDJSON (одно событие в строке)"""
+        if _export_in_background(request):
+            return self._submit_background_export(request, queryset, 'ndjson')
+        return streaming_export(
+            ndjson_chunks(iter_events(queryset)),
+            'diagnostic_events.ndjson',
+            'application/x-ndjson; charset=utf-8',
+            compress=_export_compressed(request),
+        )
+    export_to_ndjson_action.short_description = _('📄 Экспортировать в NDJSON')
+    
+    def export_to_csv_action(self, request, queryset):
+        """Экспорт выбранных событий в CSV"""
+        if _export_in_background(request):
+            return self._submit_background_export(request, queryset, 'csv')
+        return streaming_export(
+            csv_chunks(iter_events(queryset)),
+            'diagnostic_events.csv',
+            'text/csv; charset=utf-8',
+            compress=_export_compressed(request),
+        )
+    export_to_csv_action.short_description = _('📊 Экспортировать в CSV')
+    
     def export_error_log_action(self, request, queryset):
         """Экспорт ошибок в удобный читаемый лог для разработчика"""
-        queryset = queryset.select_related('device')
+        if _export_in_background(request):
+            return self._submit_background_export(request, queryset, 'error_log')
         error_events = queryset.filter(
             event_severity__in=['ERROR', 'CRITICAL']
         ).order_by('device', 'timestamp')
         
-        if not error_events.exists():
+        total = error_events.count()
+        if not total:
             self.message_user(request, _('Нет ошибок для экспорта среди выбранных событий'), level='warning')
             return
         
-        response = HttpResponse(content_type='text/plain; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="error_log.txt"'
-        
-        lines = []
-        lines.append("=" * 80)
-        lines.append("ОТЧЕТ ОБ ОШИБКАХ - ДИАГНОСТИЧЕСКИЕ СОБЫТИЯ")
-        lines.append("=" * 80)
-        lines.append(f"Дата создания: {timezone.now().strftime('%d.%m.%Y %H:%M:%S')}")
-        lines.append(f"Всего ошибок: {error_events.count()}")
-        lines.append("=" * 80)
-        lines.append("")
-        
-        current_device = None
-        for event in error_events:
-            if current_device != event.device:
-                if current_device is not None:
-                    lines.append("")
-                current_device = event.device
-                lines.append(f"\n{'=' * 80}")
-                lines.append(f"УСТРОЙСТВО: {event.device.name} (Token: {event.device.token})")
-                lines.append(f"{'=' * 80}")
-                lines.append("")
-            
-            lines.append(f"[{event.get_timestamp_display()}] {event.event_severity} - {event.event_code}")
-            lines.append(f"  Компонент: {event.component}")
-            if event.pipeline_stage:
-                lines.append(f"  Этап пайплайна: {event.pipeline_stage}")
-            if event.thread:
-                lines.append(f"  Поток: {event.thread}")
-            if event.attempt:
-                lines.append(f"  Попытка: {event.attempt}")
-            if event.flow_id:
-                lines.append(f"  Flow ID: {event.flow_id}")
-            
-            if event.context:
-                lines.append("  Контекст:")
-                for key, value in event.context.items():
-                    lines.append(f"    {key}: {value}")
-            
-            if event.state_snapshot:
-                state = event.state_snapshot
-                lines.append("  Состояние устройства:")
-                if state.get('batteryLevel') is not None:
-                    lines.append(f"    Батарея: {state['batteryLevel']}% {'(заряжается)' if state.get('isCharging') else ''}")
-                if state.get('isNetworkAvailable') is not None:
-                    lines.append(f"    Сеть: {'доступна' if state['isNetworkAvailable'] else 'недоступна'}")
-                if state.get('networkType'):
-                    lines.append(f"    Тип сети: {state['networkType']}")
-                if state.get('serviceRunning') is not None:
-                    lines.append(f"    Сервис: {'запущен' if state['serviceRunning'] else 'остановлен'}")
-                if state.get('workerRunning') is not None:
-                    lines.append(f"    Воркер: {'запущен' if state['workerRunning'] else 'остановлен'}")
-                if state.get('queueSize') is not None:
-                    lines.append(f"    Размер очереди: {state['queueSize']}")
-            
-            if event.metrics_snapshot:
-                metrics = event.metrics_snapshot
-                lines.append("  Метрики:")
-                if metrics.get('totalRetries') is not None:
-                    lines.append(f"    Всего повторных попыток: {metrics['totalRetries']}")
-                if metrics.get('totalServiceRestarts') is not None:
-                    lines.append(f"    Всего перезапусков сервиса: {metrics['totalServiceRestarts']}")
-                if metrics.get('failuresSinceLastRecovery') is not None:
-                    lines.append(f"    Ошибок с последнего восстановления: {metrics['failuresSinceLastRecovery']}")
-            
-            lines.append("")
-            lines.append("-" * 80)
-            lines.append("")
-        
-        response.write("\n".join(lines))
-        return response
+        return streaming_export(
+            error_log_chunks(iter_events(error_events), total),
+            'error_log.txt',
+            'text/plain; charset=utf-8',
+            compress=_export_compressed(request),
+        )
     export_error_log_action.short_description = _('🚨 Экспортировать лог ошибок (только ERROR/CRITICAL)')
     
     def export_device_diagnostics_action(self, request, queryset):
         """Экспорт всех диагностических данных по выбранным устройствам"""
-        queryset = queryset.select_related('device')
-        devices = set(event.device for event in queryset)
+        if _export_in_background(request):
+            return self._submit_background_export(request, queryset, 'device_report')
+        devices = list(selected_devices(queryset))
         
         if not devices:
             self.message_user(request, _('Нет данных для экспорта'), level='warning')
             return
         
-        response = HttpResponse(content_type='text/plain; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="device_diagnostics.txt"'
-        
-        lines = []
-        lines.append("=" * 80)
-        lines.append("ПОЛНЫЙ ОТЧЕТ ПО ДИАГНОСТИКЕ УСТРОЙСТВ")
-        lines.append("=" * 80)
-        lines.append(f"Дата создания: {timezone.now().strftime('%d.%m.%Y %H:%M:%S')}")
-        lines.append(f"Количество устройств: {len(devices)}")
-        lines.append("=" * 80)
-        lines.append("")
-        
-        for device in devices:
-            device_events = queryset.filter(device=device).order_by('timestamp')
-            
-            lines.append(f"\n{'=' * 80}")
-            lines.append(f"УСТРОЙСТВО: {device.name}")
-            lines.append(f"Token: {device.token}")
-            lines.append(f"Последний раз онлайн: {device.last_seen.strftime('%d.%m.%Y %H:%M:%S') if device.last_seen else 'Никогда'}")
-            lines.append(f"Всего событий: {device_events.count()}")
-            lines.append(f"{'=' * 80}")
-            lines.append("")
-            
-            severity_stats = {}
-            for event in device_events:
-                severity_stats[event.event_severity] = severity_stats.get(event.event_severity, 0) + 1
-            
-            if severity_stats:
-                lines.append("Статистика по уровням серьезности:")
-                for severity, count in sorted(severity_stats.items()):
-                    lines.append(f"  {severity}: {count}")
-                lines.append("")
-            
-            component_stats = {}
-            for event in device_events:
-                component_stats[event.component] = component_stats.get(event.component, 0) + 1
-            
-            if component_stats:
-                lines.append("Статистика по компонентам:")
-                for component, count in sorted(component_stats.items()):
-                    lines.append(f"  {component}: {count}")
-                lines.append("")
-            
-            lines.append("Последние события:")
-            for event in device_events[:20]:
-                lines.append(f"  [{event.get_timestamp_display()}] {event.event_severity} - {event.event_code} ({event.component})")
-            
-            if device_events.count() > 20:
-                lines.append(f"  ... и еще {device_events.count() - 20} событий")
-            
-            lines.append("")
-        
-        response.write("\n".join(lines))
-        return response
+        return streaming_export(
+            device_report_chunks(queryset, devices),
+            'device_diagnostics.txt',
+            'text/plain; charset=utf-8',
+            compress=_export_compressed(request),
+        )
     export_device_diagnostics_action.short_description = _('📱 Экспортировать отчет по устройствам')
     
     def export_last_10_per_device_action(self, request, queryset):
         """Экспорт последних 10 событий по каждому устройству"""
-        queryset = queryset.select_related('device')
-        devices = set(event.device for event in queryset)
+        if _export_in_background(request):
+            return self._submit_background_export(request, queryset, 'last_10')
+        devices = list(selected_devices(queryset))
         
         if not devices:
             self.message_user(request, _('Нет данных для экспорта'), level='warning')
             return
         
-        response = HttpResponse(content_type='text/plain; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="last_10_events_per_device.txt"'
-        
-        lines = []
-        lines.append("=" * 80)
-        lines.append("ПОСЛЕДНИЕ 10 СОБЫТИЙ ПО КАЖДОМУ УСТРОЙСТВУ")
-        lines.append("=" * 80)
-        lines.append(f"Дата создания: {timezone.now().strftime('%d.%m.%Y %H:%M:%S')}")
-        lines.append(f"Количество устройств: {len(devices)}")
-        lines.append("=" * 80)
-        lines.append("")
-        
-        for device in devices:
-            # Получаем последние 10 событий для этого устройства из выбранных
-            device_events = queryset.filter(device=device).order_by('-timestamp', '-created_at')[:10]
-            
-            if not device_events.exists():
-                continue
-            
-            lines.append(f"\n{'=' * 80}")
-            lines.append(f"УСТРОЙСТВО: {device.name}")
-            lines.append(f"Token: {device.token}")
-            lines.append(f"Последний раз онлайн: {device.last_seen.strftime('%d.%m.%Y %H:%M:%S') if device.last_seen else 'Никогда'}")
-            lines.append(f"Всего выбрано событий: {queryset.filter(device=device).count()}")
-            lines.append(f"Показано последних: {device_events.count()}")
-            lines.append(f"{'=' * 80}")
-            lines.append("")
-            
-            for idx, event in enumerate(device_events, 1):
-                lines.append(f"[{idx}] {event.get_timestamp_display()} - {event.event_severity} - {event.event_code}")
-                lines.append(f"     Компонент: {event.component}")
-                if event.pipeline_stage:
-                    lines.append(f"     Этап пайплайна: {event.pipeline_stage}")
-                
-                # Краткая информация о состоянии
-                if event.state_snapshot:
-                    state = event.state_snapshot
-                    state_info = []
-                    if state.get('batteryLevel') is not None:
-                        state_info.append(f"Батарея: {state['batteryLevel']}%")
-                    if state.get('isNetworkAvailable') is not None:
-                        state_info.append(f"Сеть: {'✅' if state['isNetworkAvailable'] else '❌'}")
-                    if state.get('serviceRunning') is not None:
-                        state_info.append(f"Сервис: {'✅' if state['serviceRunning'] else '❌'}")
-                    if state_info:
-                        lines.append(f"     Состояние: {', '.join(state_info)}")
-                
-                # Краткая информация о метриках
-                if event.metrics_snapshot:
-                    metrics = event.metrics_snapshot
-                    metrics_info = []
-                    if metrics.get('totalRetries') is not None and metrics['totalRetries'] > 0:
-                        metrics_info.append(f"Retries: {metrics['totalRetries']}")
-                    if metrics.get('totalServiceRestarts') is not None and metrics['totalServiceRestarts'] > 0:
-                        metrics_info.append(f"Restarts: {metrics['totalServiceRestarts']}")
-                    if metrics_info:
-                        lines.append(f"     Метрики: {', '.join(metrics_info)}")
-                
-                # Контекст если есть важная информация
-                if event.context:
-                    important_context = {k: v for k, v in event.context.items() 
-                                       if k in ['errorMessage', 'retryCount', 'exception'] and v}
-                    if important_context:
-                        lines.append(f"     Контекст: {important_context}")
-                
-                lines.append("")
-            
-            lines.append("-" * 80)
-            lines.append("")
-        
-        response.write("\n".join(lines))
-        return response
+        return streaming_export(
+            last_events_chunks(queryset, devices, limit=10),
+            'last_10_events_per_device.txt',
+            'text/plain; charset=utf-8',
+            compress=_export_compressed(request),
+        )
     export_last_10_per_device_action.short_description = _('📋 Экспортировать последние 10 событий по каждому устройству')
 
+
+@admin.register(DiagnosticArchiveSegment)
+class DiagnosticArchiveSegmentAdmin(ModelAdmin):
+    """
+    Сегменты архива диагностических событий. События читаются из файлов
+    потоково и экспортируются в тех же форматах, что и из основной таблицы
+    """
+    list_display = ['device_name', 'day', 'period_display', 'event_count', 'severity_display', 'size_display', 'created_at']
+    list_filter = [
+        ('day', RangeDateFilter),
+        ('device', RelatedDropdownFilter),
+    ]
+    search_fields = ['device__name', 'device__token']
+    readonly_fields = ['device', 'path', 'day', 'min_timestamp', 'max_timestamp', 'event_count', 'severity_counts', 'size_bytes', 'created_at']
+    list_per_page = 50
+    list_filter_submit = True
+    list_select_related = ['device']
+    actions = ['export_to_json_action', 'export_error_log_action']
+    action_form = DiagnosticExportActionForm
+
+    def has_add_permission(self, request):
+        return False
+
+    def device_name(self, obj):
+        return obj.device.name
+    device_name.short_description = _('Устройство')
+
+    def period_display(self, obj):
+        """Время первого и последнего события сегмента"""
+        first = DiagnosticEvent(timestamp=obj.min_timestamp).get_timestamp_display()
+        last = DiagnosticEvent(timestamp=obj.max_timestamp).get_timestamp_display()
+        return f"{first} - {last}"
+    period_display.short_description = _('Период')
+
+    def severity_display(self, obj):
+        return ', '.join(f"{severity}: {count}" for severity, count in sorted(obj.severity_counts.items()))
+    severity_display.short_description = _('По уровням')
+
+    def size_display(self, obj):
+        return f"{obj.size_bytes / 1024:.1f} КБ"
+    size_display.short_description = _('Размер')
+
+    def export_to_json_action(self, request, queryset):
+        """Экспорт событий выбранных сегментов в JSON"""
+        segments = queryset.select_related('device').order_by('device_id', 'min_timestamp')
+        return streaming_export(
+            json_array_chunks(iter_archived_events(segments.iterator())),
+            'diagnostic_events.json',
+            'application/json; charset=utf-8',
+            compress=_export_compressed(request),
+        )
+    export_to_json_action.short_description = _('📄 Экспортировать события в JSON')
+
+    def export_error_log_action(self, request, queryset):
+        """Экспорт ошибок выбранных сегментов в читаемый лог"""
+        segments = [
+            segment for segment in queryset.select_related('device').order_by('device_id', 'min_timestamp')
+            if segment.severity_counts.get('ERROR') or segment.severity_counts.get('CRITICAL')
+        ]
+        if not segments:
+            self.message_user(request, _('Нет ошибок для экспорта в выбранных сегментах'), level='warning')
+            return
+        # Количество ошибок известно из индекса сегментов, файлы читаются только при отдаче
+        total = sum(
+            segment.severity_counts.get('ERROR', 0) + segment.severity_counts.get('CRITICAL', 0)
+            for segment in segments
+        )
+        return streaming_export(
+            error_log_chunks(iter_archived_events(segments, severities=['ERROR', 'CRITICAL']), total),
+            'error_log.txt',
+            'text/plain; charset=utf-8',
+            compress=_export_compressed(request),
+        )
+    export_error_log_action.short_description = _('🚨 Экспортировать лог ошибок (только ERROR/CRITICAL)')
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(ModelAdmin):
+    """
+    Фоновые экспорты диагностики: очередь, прогресс и готовые файлы.
+    Задачи создаются действиями в списке диагностических событий (переключатель «В фоне»)
+    """
+    list_display = ['kind', 'status_badge', 'progress_display', 'description_preview', 'requested_by', 'created_at', 'download_link']
+    list_filter = ['status', 'kind', 'created_at']
+    readonly_fields = [
+        'id', 'kind', 'status', 'description', 'requested_by', 'total', 'processed', 'size_bytes',
+        'download_link', 'error', 'created_at', 'started_at', 'finished_at', 'locked_at',
+    ]
+    exclude = ['file']
+    list_per_page = 25
+    list_select_related = ['requested_by']
+    actions = ['retry_action']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<uuid:pk>/download/', self.admin_site.admin_view(self.download_view), name='devices_exportjob_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        """Отдает готовый файл экспорта (только сотрудникам, в отличие от /media/)"""
+        job = ExportJob.objects.filter(pk=pk, status='done').first()
+        if job is None or not job.file or not self.has_view_permission(request, job):
+            raise Http404
+        try:
+            return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.file.name.rsplit('/', 1)[-1])
+        except FileNotFoundError:
+            raise Http404
+
+    def status_badge(self, obj):
+        """Показывает состояние задачи"""
+        colors = {
+            'pending': '#FF9800',
+            'running': '#2196F3',
+            'done': '#4CAF50',
+            'failed': '#f44336',
+        }
+        return format_html(
+            '<span style="background: {}; color: white; padding: 2px 8px; border-radius: 12px; font-size: 11px;">{}</span>',
+            colors.get(obj.status, '#9e9e9e'),
+            obj.get_status_display()
+        )
+    status_badge.short_description = _('Статус')
+
+    def progress_display(self, obj):
+        """Обработано событий из общего числа"""
+        if obj.status == 'pending':
+            return '-'
+        percent = min(100, obj.processed * 100 // obj.total) if obj.total else (100 if obj.status == 'done' else 0)
+        return format_html(
+            '<div style="width: 120px; background: #e0e0e0; border-radius: 4px; height: 8px;">'
+            '<div style="width: {}%; background: #4CAF50; border-radius: 4px; height: 8px;"></div></div>'
+            '<small>{} / {}</small>',
+            percent, obj.processed, obj.total
+        )
+    progress_display.short_description = _('Прогресс')
+
+    def description_preview(self, obj):
+        text = obj.description
+        if len(text) > 80:
+            text = text[:80] + '...'
+        return text
+    description_preview.short_description = _('Выборка')
+
+    def download_link(self, obj):
+        """Ссылка на готовый файл"""
+        if obj.status != 'done' or not obj.file:
+            return '-'
+        url = reverse('admin:devices_exportjob_download', args=[obj.pk])
+        return format_html('<a href="{}">⬇️ Скачать ({} МБ)</a>', url, f"{obj.size_bytes / 1024 / 1024:.1f}")
+    download_link.short_description = _('Файл')
+
+    def retry_action(self, request, queryset):
+        """Повторно ставит в очередь задачи, завершившиеся ошибкой"""
+        count = queryset.filter(status='failed').update(status='pending', error='', locked_at=None, finished_at=None)
+        self.message_user(request, f'Повторно поставлено в очередь: {count}')
+    retry_action.short_description = _('🔁 Повторить неудавшиеся экспорты')
@@ -5,3 +5,5 @@ class DevicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'devices'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -1,7 +1,7 @@
 from rest_framework import authentication, exceptions
 from django.contrib.auth.models import AnonymousUser
-from django.utils import timezone
-from .models import Device
+from .last_seen import touch_device
+from .token_resolver import resolve_device
 
 
 class XTokenAuthentication(authentication.BaseAuthentication):
@@ -16,15 +16,15 @@ class XTokenAuthentication(authentication.BaseAuthentication):
             return None
             
         try:
-            device = Device.objects.get(token=token)
-            # Update last_seen when device authenticates
-            device.last_seen = timezone.now()
-            device.save(update_fields=['last_seen'])
-            return (device, None)
-        except Device.DoesNotExist:
-            raise exceptions.AuthenticationFailed('Неверный токен')
+            device = resolve_device(token)
         except ValueError:
             raise exceptions.AuthenticationFailed('Неверный формат токена')
+        if device is None:
+            raise exceptions.AuthenticationFailed('Неверный токен')
+
+        # Update last_seen when device authenticates
+        touch_device(device)
+        return (device, None)
     
     def authenticate_header(self, request):
         return 'X-TOKEN'
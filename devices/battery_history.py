@@ -0,0 +1,214 @@
+"""
+Хранение и чтение истории уровня батареи.
+
+Сырые отчеты хранятся интервалами: подряд идущие отчеты с одинаковым уровнем
+продлевают одну строку BatteryReport. Интервалы старше
+BATTERY_REPORT_RAW_RETENTION_DAYS сворачиваются в почасовые сводки
+BatteryReportHourly (min/max/среднее по времени/последнее значение) командой
+rollup_battery_reports (раз в сутки, таймер fc_phones_battery_rollup из
+deploy-fresh.sh).
+
+Читать историю следует через battery_levels(): она объединяет сводки и сырые
+интервалы в один список точек.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import BatteryReport, BatteryReportHourly, Device
+
+
+class BatteryPoint(NamedTuple):
+    """Точка истории батареи: сырой интервал или почасовая сводка"""
+    date_created: datetime
+    last_seen: datetime
+    battery_level: int
+    min_level: int
+    max_level: int
+    report_count: int
+    is_rollup: bool = False
+
+
+def record_battery_level(device: Device, battery_level: int, seen_at: datetime) -> BatteryReport:
+    """Учитывает отчет: продлевает текущий интервал или начинает новый, если уровень изменился"""
+    current = BatteryReport.objects.filter(device=device).order_by('-date_created').first()
+
+    if current is not None and current.battery_level == battery_level and current.last_seen <= seen_at:
+        BatteryReport.objects.filter(pk=current.pk).update(
+            last_seen=seen_at,
+            report_count=F('report_count') + 1
+        )
+        current.last_seen = seen_at
+        current.report_count += 1
+        return current
+
+    return BatteryReport.objects.create(
+        device=device,
+        battery_level=battery_level,
+        date_created=seen_at,
+        last_seen=seen_at
+    )
+
+
+def battery_levels(device: Device, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> List[BatteryPoint]:
+    """История батареи устройства за период в хронологическом порядке"""
+    rollups = BatteryReportHourly.objects.filter(device=device)
+    raw = BatteryReport.objects.filter(device=device)
+    if start is not None:
+        rollups = rollups.filter(last_at__gte=start)
+        raw = raw.filter(last_seen__gte=start)
+    if end is not None:
+        rollups = rollups.filter(hour__lte=end)
+        raw = raw.filter(date_created__lte=end)
+
+    points = [
+        BatteryPoint(r.hour, r.last_at, round(r.avg_level), r.min_level, r.max_level, r.report_count, True)
+        for r in rollups.order_by('hour')
+    ]
+    points.extend(
+        BatteryPoint(r.date_created, r.last_seen, r.battery_level, r.battery_level, r.battery_level, r.report_count)
+        for r in raw.order_by('date_created')
+    )
+    points.sort(key=lambda point: point.date_created)
+    return points
+
+
+def latest_battery_level(device: Device) -> Optional[int]:
+    """Последний известный уровень батареи устройства"""
+    report = BatteryReport.objects.filter(device=device).order_by('-date_created').first()
+    if report is not None:
+        return report.battery_level
+    rollup = BatteryReportHourly.objects.filter(device=device).order_by('-hour').first()
+    return rollup.last_level if rollup is not None else None
+
+
+def _hour_start(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _split_by_hour(start: datetime, end: datetime) -> List[Tuple[datetime, float]]:
+    """Разбивает интервал на части по границам часов: [(час, длительность в секундах)]"""
+    pieces = []
+    hour = _hour_start(start)
+    while True:
+        next_hour = hour + timedelta(hours=1)
+        piece_start = max(start, hour)
+        piece_end = min(end, next_hour)
+        pieces.append((hour, max((piece_end - piece_start).total_seconds(), 0.0)))
+        if end <= next_hour:
+            return pieces
+        hour = next_hour
+
+
+class _Bucket:
+    __slots__ = ('min_level', 'max_level', 'level_seconds', 'seconds', 'last_level', 'last_at', 'reports')
+
+    def __init__(self):
+        self.min_level = None
+        self.max_level = None
+        self.level_seconds = 0.0
+        self.seconds = 0.0
+        self.last_level = None
+        self.last_at = None
+        self.reports = 0
+
+    def add(self, level, weight, last_at, reports):
+        self.min_level = level if self.min_level is None else min(self.min_level, level)
+        self.max_level = level if self.max_level is None else max(self.max_level, level)
+        self.level_seconds += level * weight
+        self.seconds += weight
+        if self.last_at is None or last_at >= self.last_at:
+            self.last_level = level
+            self.last_at = last_at
+        self.reports += reports
+
+
+def _rollup_rows(rows) -> Dict[Tuple[object, datetime], _Bucket]:
+    buckets: Dict[Tuple[object, datetime], _Bucket] = {}
+    for row in rows:
+        pieces = _split_by_hour(row.date_created, row.last_seen)
+        total = sum(seconds for _, seconds in pieces)
+        assigned = 0
+        for i, (hour, seconds) in enumerate(pieces):
+            if i == len(pieces) - 1:
+                reports = row.report_count - assigned
+            else:
+                reports = round(row.report_count * seconds / total) if total else 0
+                assigned += reports
+            # Отчет без длительности учитывается с весом в 1 секунду
+            weight = max(seconds, 1.0)
+            last_at = min(row.last_seen, hour + timedelta(hours=1))
+            bucket = buckets.setdefault((row.device_id, hour), _Bucket())
+            bucket.add(row.battery_level, weight, last_at, reports)
+    return buckets
+
+
+def rollup_battery_reports(older_than: datetime, chunk_size: int = 1000) -> int:
+    """
+    Сворачивает сырые интервалы, закончившиеся до older_than, в почасовые сводки
+    и удаляет их. Работает пачками по chunk_size строк в короткой транзакции.
+
+    Returns:
+        int: количество свернутых строк BatteryReport
+    """
+    cutoff = _hour_start(older_than)
+    processed = 0
+
+    while True:
+        with transaction.atomic():
+            rows = list(
+                BatteryReport.objects.filter(last_seen__lt=cutoff)
+                .order_by('date_created')
+                .only('id', 'device_id', 'battery_level', 'date_created', 'last_seen', 'report_count')[:chunk_size]
+            )
+            if not rows:
+                return processed
+
+            buckets = _rollup_rows(rows)
+            existing = {
+                (r.device_id, r.hour): r
+                for r in BatteryReportHourly.objects.filter(
+                    device_id__in={device_id for device_id, _ in buckets},
+                    hour__in={hour for _, hour in buckets},
+                )
+            }
+
+            to_create = []
+            to_update = []
+            for (device_id, hour), bucket in buckets.items():
+                rollup = existing.get((device_id, hour))
+                if rollup is None:
+                    to_create.append(BatteryReportHourly(
+                        device_id=device_id,
+                        hour=hour,
+                        min_level=bucket.min_level,
+                        max_level=bucket.max_level,
+                        avg_level=bucket.level_seconds / bucket.seconds,
+                        last_level=bucket.last_level,
+                        last_at=bucket.last_at,
+                        report_count=bucket.reports,
+                        covered_seconds=bucket.seconds,
+                    ))
+                    continue
+
+                seconds = rollup.covered_seconds + bucket.seconds
+                rollup.avg_level = (rollup.avg_level * rollup.covered_seconds + bucket.level_seconds) / seconds
+                rollup.covered_seconds = seconds
+                rollup.min_level = min(rollup.min_level, bucket.min_level)
+                rollup.max_level = max(rollup.max_level, bucket.max_level)
+                rollup.report_count += bucket.reports
+                if bucket.last_at >= rollup.last_at:
+                    rollup.last_level = bucket.last_level
+                    rollup.last_at = bucket.last_at
+                to_update.append(rollup)
+
+            BatteryReportHourly.objects.bulk_create(to_create)
+            BatteryReportHourly.objects.bulk_update(
+                to_update,
+                ['min_level', 'max_level', 'avg_level', 'last_level', 'last_at', 'report_count', 'covered_seconds']
+            )
+            BatteryReport.objects.filter(pk__in=[row.pk for row in rows]).delete()
+            processed += len(rows)
@@ -0,0 +1,176 @@
+"""
+Счетчики панели управления.
+
+Вместо COUNT по растущим таблицам при каждом открытии админки панель читает
+DashboardCounter: общее количество (bucket='total') и почасовые значения за
+последние DASHBOARD_WINDOW_HOURS часов. Счетчики увеличиваются сигналами
+post_save при создании записей и уменьшаются сигналами post_delete при любом
+удалении: из админки, каскадом вместе с устройством, политиками хранения.
+Уменьшения, накопленные за транзакцию, применяются одной пачкой после ее
+фиксации. Расхождения (raw SQL, ручные правки БД, частичный откат
+транзакции до точки сохранения) исправляет reconcile_counters() - команда
+reconcile_dashboard_counters (раз в сутки, таймер fc_phones_dashboard_counters
+из deploy-fresh.sh).
+"""
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import DashboardCounter, LogFile, Message
+
+TOTAL_BUCKET = 'total'
+DASHBOARD_WINDOW_HOURS = 24 * 7
+
+# Метрика -> модель; время записи берется из created_at
+TRACKED_MODELS = {
+    'messages': Message,
+    'log_files': LogFile,
+}
+
+
+def metric_for(model):
+    """Имя метрики для модели или None, если модель не отслеживается"""
+    return next((name for name, tracked in TRACKED_MODELS.items() if tracked is model), None)
+
+
+def hour_bucket(moment: datetime) -> str:
+    return moment.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H')
+
+
+def _hour_buckets(now: datetime, hours: int) -> List[str]:
+    """Ключи последних hours часов, включая текущий"""
+    return [hour_bucket(now - timedelta(hours=i)) for i in range(hours)]
+
+
+def _add(metric: str, bucket: str, delta: int):
+    updated = DashboardCounter.objects.filter(metric=metric, bucket=bucket).update(value=F('value') + delta)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            DashboardCounter.objects.create(metric=metric, bucket=bucket, value=delta)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        DashboardCounter.objects.filter(metric=metric, bucket=bucket).update(value=F('value') + delta)
+
+
+def record_created(metric: str, created_at: datetime):
+    """Учитывает новую запись в общем и почасовом счетчике"""
+    _add(metric, TOTAL_BUCKET, 1)
+    _add(metric, hour_bucket(created_at), 1)
+
+
+class _PendingDeletes:
+    """Уменьшения счетчиков, накопленные в одной транзакции; вызывается после ее фиксации"""
+
+    def __init__(self):
+        self.deltas = Counter()
+
+    def __call__(self):
+        for (metric, bucket), delta in self.deltas.items():
+            _add(metric, bucket, -delta)
+
+
+_local = threading.local()
+
+
+def record_deleted(metric: str, created_at: datetime):
+    """
+    Учитывает удаление записи. Внутри транзакции уменьшения копятся и
+    применяются после фиксации (удаление тысяч записей - несколько UPDATE,
+    а не по два на запись); откат транзакции отбрасывает их вместе с on_commit
+    """
+    window_start = timezone.now() - timedelta(hours=DASHBOARD_WINDOW_HOURS + 1)
+    buckets = [TOTAL_BUCKET] + ([hour_bucket(created_at)] if created_at >= window_start else [])
+
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        for bucket in buckets:
+            _add(metric, bucket, -1)
+        return
+
+    pending = getattr(_local, 'pending', None)
+    # Пачка принадлежит текущей транзакции, пока ее колбэк ждет фиксации
+    if pending is None or not any(entry[1] is pending for entry in connection.run_on_commit):
+        pending = _local.pending = _PendingDeletes()
+        transaction.on_commit(pending)
+    for bucket in buckets:
+        pending.deltas[(metric, bucket)] += 1
+
+
+def get_counts(now: datetime = None) -> Dict[str, Dict[str, int]]:
+    """
+    Значения всех метрик одним запросом:
+    {метрика: {'total': ..., 'day': ..., 'week': ...}}.
+    'day' и 'week' - сумма по последним 24 и 168 часовым корзинам.
+    """
+    now = now or timezone.now()
+    week = _hour_buckets(now, DASHBOARD_WINDOW_HOURS)
+    day = set(week[:24])
+
+    counts = {metric: {'total': 0, 'day': 0, 'week': 0} for metric in TRACKED_MODELS}
+    rows = DashboardCounter.objects.filter(
+        metric__in=list(TRACKED_MODELS), bucket__in=[TOTAL_BUCKET] + week
+    ).values_list('metric', 'bucket', 'value')
+    for metric, bucket, value in rows:
+        if bucket == TOTAL_BUCKET:
+            counts[metric]['total'] = value
+            continue
+        counts[metric]['week'] += value
+        if bucket in day:
+            counts[metric]['day'] += value
+    return counts
+
+
+def reconcile_counters(now: datetime = None) -> Dict[str, int]:
+    """
+    Пересчитывает счетчики по таблицам: общее количество и почасовые
+    значения за окно, удаляет корзины старше окна.
+
+    Returns:
+        dict: метрика -> количество исправленных строк счетчиков
+    """
+    now = now or timezone.now()
+    window = _hour_buckets(now, DASHBOARD_WINDOW_HOURS + 1)
+    window_start = now - timedelta(hours=DASHBOARD_WINDOW_HOURS)
+    window_start = window_start.replace(minute=0, second=0, microsecond=0)
+    fixed = {}
+
+    for metric, model in TRACKED_MODELS.items():
+        with transaction.atomic():
+            actual = {TOTAL_BUCKET: model.objects.count()}
+            hourly = (
+                model.objects.filter(created_at__gte=window_start)
+                .annotate(hour=TruncHour('created_at', tzinfo=dt_timezone.utc))
+                .values('hour')
+                .annotate(count=Count('pk'))
+                .values_list('hour', 'count')
+            )
+            for hour, count in hourly:
+                actual[hour_bucket(hour)] = count
+
+            stored = dict(DashboardCounter.objects.filter(metric=metric).values_list('bucket', 'value'))
+            to_write = []
+            for bucket in set(stored) | set(actual):
+                if bucket != TOTAL_BUCKET and bucket not in window:
+                    continue
+                value = actual.get(bucket, 0)
+                if stored.get(bucket) != value:
+                    to_write.append(DashboardCounter(metric=metric, bucket=bucket, value=value))
+            DashboardCounter.objects.bulk_create(
+                to_write,
+                update_conflicts=True,
+                unique_fields=['metric', 'bucket'],
+                update_fields=['value', 'updated_at'],
+            )
+            expired, _ = DashboardCounter.objects.filter(metric=metric).exclude(
+                bucket__in=[TOTAL_BUCKET] + window
+            ).delete()
+            fixed[metric] = len(to_write) + expired
+    return fixed
@@ -0,0 +1,239 @@
+"""
+Холодный архив диагностических событий.
+
+Старые строки DiagnosticEvent переносятся из основной таблицы в сжатые
+NDJSON-файлы (gzip, одно событие на строку) в DIAGNOSTICS_ARCHIVE_ROOT.
+Файлы разбиты по дням (UTC) и устройствам: ГГГГ/ММ/ДД/<device_id>-<id>.ndjson.gz.
+Для каждого файла создается DiagnosticArchiveSegment с диапазоном времени и
+количеством событий по уровням, поэтому при чтении открываются только
+подходящие сегменты.
+
+Читать архив следует через iter_archived_events(): она потоково отдает
+несохраненные экземпляры DiagnosticEvent, с которыми работают те же
+функции экспорта, что и для основной таблицы.
+
+Приложение может повторно отправить событие, которое уже перенесено в
+архив (не получило ответ на загрузку). Пакетная загрузка проверяет такие
+события через archived_event_ids() и считает их дубликатами, иначе они
+снова попали бы в основную таблицу, а затем и в архив вторым экземпляром.
+"""
+import logging
+import gzip
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Device, DiagnosticArchiveSegment, DiagnosticEvent
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_FIELDS = (
+    'event_id', 'timestamp', 'event_code', 'event_severity', 'component', 'pipeline_stage',
+    'context', 'thread', 'attempt', 'flow_id', 'state_snapshot', 'metrics_snapshot',
+)
+
+
+class ArchiveResult(NamedTuple):
+    events: int
+    segments: int
+    size_bytes: int
+    seconds: float
+
+
+ProgressCallback = Callable[[int, int], None]  # (событий в архиве, сегментов создано)
+
+
+def archive_root() -> str:
+    return str(settings.DIAGNOSTICS_ARCHIVE_ROOT)
+
+
+def segment_file_path(segment: DiagnosticArchiveSegment) -> str:
+    return os.path.join(archive_root(), segment.path)
+
+
+def _event_day(timestamp: int):
+    return datetime.fromtimestamp(timestamp / 1000, tz=dt_timezone.utc).date()
+
+
+def _serialize(event: DiagnosticEvent) -> str:
+    record = {field: getattr(event, field) for field in ARCHIVED_FIELDS}
+    record['created_at'] = event.created_at.isoformat()
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+
+def _write_segment(device_id, day, events: List[DiagnosticEvent]) -> DiagnosticArchiveSegment:
+    """Записывает события одного устройства за день в новый файл сегмента"""
+    segment_id = uuid.uuid4()
+    relative = os.path.join(day.strftime('%Y'), day.strftime('%m'), day.strftime('%d'),
+                            f'{device_id}-{segment_id.hex}.ndjson.gz')
+    full_path = os.path.join(archive_root(), relative)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+    severity_counts: Dict[str, int] = {}
+    tmp_path = full_path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as fh:
+        for event in events:
+            fh.write(_serialize(event))
+            fh.write('\n')
+            severity_counts[event.event_severity] = severity_counts.get(event.event_severity, 0) + 1
+    os.replace(tmp_path, full_path)
+
+    return DiagnosticArchiveSegment(
+        id=segment_id,
+        device_id=device_id,
+        path=relative,
+        day=day,
+        min_timestamp=events[0].timestamp,
+        max_timestamp=events[-1].timestamp,
+        event_count=len(events),
+        severity_counts=severity_counts,
+        size_bytes=os.path.getsize(full_path),
+    )
+
+
+def _remove_files(segments: Iterable[DiagnosticArchiveSegment]):
+    for segment in segments:
+        try:
+            os.remove(segment_file_path(segment))
+        except FileNotFoundError:
+            pass
+
+
+def archive_events(older_than: datetime, chunk_size: int = 5000,
+                   progress: Optional[ProgressCallback] = None) -> ArchiveResult:
+    """
+    Переносит события, созданные до older_than, в файлы архива и удаляет их
+    из таблицы. Работает пачками по chunk_size событий: файлы пачки
+    записываются на диск, затем в одной короткой транзакции создаются
+    сегменты и удаляются строки. Если транзакция не прошла, файлы пачки
+    удаляются, и события остаются в таблице.
+    """
+    started = time.monotonic()
+    archived = 0
+    created = 0
+    size_bytes = 0
+
+    queryset = DiagnosticEvent.objects.filter(created_at__lt=older_than).order_by('created_at', 'pk')
+
+    while True:
+        events = list(queryset[:chunk_size])
+        if not events:
+            break
+
+        groups: Dict[Tuple[object, object], List[DiagnosticEvent]] = {}
+        for event in events:
+            groups.setdefault((event.device_id, _event_day(event.timestamp)), []).append(event)
+
+        segments = []
+        try:
+            for (device_id, day), group in groups.items():
+                group.sort(key=lambda e: (e.timestamp, e.event_id))
+                segments.append(_write_segment(device_id, day, group))
+            with transaction.atomic():
+                DiagnosticArchiveSegment.objects.bulk_create(segments)
+                DiagnosticEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+        except BaseException:
+            _remove_files(segments)
+            raise
+
+        archived += len(events)
+        created += len(segments)
+        size_bytes += sum(segment.size_bytes for segment in segments)
+        if progress is not None:
+            progress(archived, created)
+        if len(events) < chunk_size:
+            break
+
+    return ArchiveResult(archived, created, size_bytes, time.monotonic() - started)
+
+
+def find_segments(devices=None, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                  severities: Optional[Iterable[str]] = None) -> List[DiagnosticArchiveSegment]:
+    """Сегменты, которые могут содержать события с заданными устройствами, временем и уровнями"""
+    segments = DiagnosticArchiveSegment.objects.select_related('device')
+    if devices is not None:
+        segments = segments.filter(device__in=devices)
+    if start_ms is not None:
+        segments = segments.filter(max_timestamp__gte=start_ms)
+    if end_ms is not None:
+        segments = segments.filter(min_timestamp__lte=end_ms)
+    segments = segments.order_by('device_id', 'min_timestamp')
+
+    if severities is None:
+        return list(segments)
+    severities = set(severities)
+    return [segment for segment in segments if severities.intersection(segment.severity_counts)]
+
+
+def read_segment(segment: DiagnosticArchiveSegment) -> Iterator[dict]:
+    """Потоково читает записи событий из файла сегмента"""
+    with gzip.open(segment_file_path(segment), 'rt', encoding='utf-8') as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def archived_event_ids(device: Device, timestamps: Dict[str, int]) -> Set[str]:
+    """
+    Какие из событий устройства {event_id: timestamp} уже лежат в архиве.
+    Обычно это один запрос к сегментам без чтения файлов: файл сегмента
+    открывается, только если время какого-то события попадает в его диапазон
+    """
+    if not timestamps:
+        return set()
+    found = set()
+    for segment in find_segments([device], min(timestamps.values()), max(timestamps.values())):
+        candidates = {
+            event_id for event_id, timestamp in timestamps.items()
+            if segment.min_timestamp <= timestamp <= segment.max_timestamp and event_id not in found
+        }
+        if not candidates:
+            continue
+        try:
+            for record in read_segment(segment):
+                if record['event_id'] in candidates:
+                    found.add(record['event_id'])
+                    candidates.discard(record['event_id'])
+                    if not candidates:
+                        break
+        except (OSError, EOFError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать сегмент архива {segment.path}: {e}")
+    return found
+
+
+def _to_event(record: dict, device: Device) -> DiagnosticEvent:
+    event = DiagnosticEvent(device=device, **{field: record.get(field) for field in ARCHIVED_FIELDS})
+    event.created_at = parse_datetime(record['created_at'])
+    return event
+
+
+def iter_archived_events(segments: Optional[Iterable[DiagnosticArchiveSegment]] = None, devices=None,
+                         start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                         severities: Optional[Iterable[str]] = None) -> Iterator[DiagnosticEvent]:
+    """
+    Потоково отдает события из архива как несохраненные DiagnosticEvent
+    (с заполненным device). Если segments не переданы, они подбираются по
+    фильтрам через find_segments(). События идут по устройствам, внутри
+    устройства - по времени.
+    """
+    if severities is not None:
+        severities = set(severities)
+    if segments is None:
+        segments = find_segments(devices, start_ms, end_ms, severities)
+
+    for segment in segments:
+        for record in read_segment(segment):
+            if start_ms is not None and record['timestamp'] < start_ms:
+                continue
+            if end_ms is not None and record['timestamp'] > end_ms:
+                continue
+            if severities is not None and record['event_severity'] not in severities:
+                continue
+            yield _to_event(record, segment.device)
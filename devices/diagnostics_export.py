@@ -0,0 +1,373 @@
+"""
+Потоковый экспорт диагностических событий.
+
+Отчеты формируются генераторами строк: события читаются из БД пачками
+(queryset.iterator) или из сегментов архива, кодируются по одному и сразу
+уходят клиенту через StreamingHttpResponse, поэтому расход памяти не
+зависит от количества выбранных событий. По желанию ответ сжимается gzip.
+"""
+import csv
+import json
+import zlib
+from typing import Iterable, Iterator
+
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Device
+
+EXPORT_CHUNK_SIZE = 2000
+STREAM_BUFFER_SIZE = 64 * 1024
+
+CSV_COLUMNS = [
+    'event_id', 'device', 'device_token', 'timestamp', 'timestamp_display', 'event_code',
+    'event_severity', 'component', 'pipeline_stage', 'thread', 'attempt', 'flow_id',
+    'context', 'state_snapshot', 'metrics_snapshot', 'created_at',
+]
+
+
+def event_export_dict(event) -> dict:
+    """Событие в виде словаря для JSON-экспорта (для строк таблицы и архива)"""
+    return {
+        'event_id': event.event_id,
+        'device': event.device.name,
+        'device_token': str(event.device.token),
+        'timestamp': event.timestamp,
+        'timestamp_display': event.get_timestamp_display(),
+        'event_code': event.event_code,
+        'event_severity': event.event_severity,
+        'component': event.component,
+        'pipeline_stage': event.pipeline_stage,
+        'thread': event.thread,
+        'attempt': event.attempt,
+        'flow_id': event.flow_id,
+        'context': event.context,
+        'state_snapshot': event.state_snapshot,
+        'metrics_snapshot': event.metrics_snapshot,
+        'created_at': event.created_at.isoformat(),
+    }
+
+
+def iter_events(queryset):
+    """События queryset пачками, без загрузки всей выборки в память"""
+    return queryset.select_related('device').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _header(title: str, count_line: str) -> Iterator[str]:
+    yield "=" * 80
+    yield title
+    yield "=" * 80
+    yield f"Дата создания: {timezone.now().strftime('%d.%m.%Y %H:%M:%S')}"
+    yield count_line
+    yield "=" * 80
+    yield ""
+
+
+def _as_lines(lines: Iterable[str]) -> Iterator[str]:
+    for line in lines:
+        yield line + "\n"
+
+
+# Форматы событий
+
+def json_array_chunks(events: Iterable) -> Iterator[str]:
+    """JSON-массив, каждое событие кодируется отдельно"""
+    yield "[\n"
+    first = True
+    for event in events:
+        if not first:
+            yield ",\n"
+        first = False
+        yield json.dumps(event_export_dict(event), indent=2, ensure_ascii=False)
+    yield "\n]\n"
+
+
+def ndjson_chunks(events: Iterable) -> Iterator[str]:
+    """Одно событие в строке (NDJSON)"""
+    for event in events:
+        yield json.dumps(event_export_dict(event), ensure_ascii=False) + "\n"
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: возвращает записанную строку вместо буферизации"""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(events: Iterable) -> Iterator[str]:
+    """CSV с BOM (для Excel); JSON-поля записываются строками JSON"""
+    writer = csv.writer(_Echo())
+    yield "﻿"
+    yield writer.writerow(CSV_COLUMNS)
+    for event in events:
+        row = event_export_dict(event)
+        for field in ('context', 'state_snapshot', 'metrics_snapshot'):
+            row[field] = json.dumps(row[field], ensure_ascii=False) if row[field] is not None else ''
+        yield writer.writerow([row[column] for column in CSV_COLUMNS])
+
+
+# Текстовые отчеты
+
+def error_log_chunks(events: Iterable, total: int) -> Iterator[str]:
+    """Читаемый лог ошибок; events должны быть упорядочены по устройству и времени"""
+    return _as_lines(_error_log_lines(events, total))
+
+
+def _error_log_lines(events: Iterable, total: int) -> Iterator[str]:
+    yield from _header("ОТЧЕТ ОБ ОШИБКАХ - ДИАГНОСТИЧЕСКИЕ СОБЫТИЯ", f"Всего ошибок: {total}")
+
+    current_device = None
+    for event in events:
+        if current_device != event.device:
+            if current_device is not None:
+                yield ""
+            current_device = event.device
+            yield f"\n{'=' * 80}"
+            yield f"УСТРОЙСТВО: {event.device.name} (Token: {event.device.token})"
+            yield f"{'=' * 80}"
+            yield ""
+
+        yield f"[{event.get_timestamp_display()}] {event.event_severity} - {event.event_code}"
+        yield f"  Компонент: {event.component}"
+        if event.pipeline_stage:
+            yield f"  Этап пайплайна: {event.pipeline_stage}"
+        if event.thread:
+            yield f"  Поток: {event.thread}"
+        if event.attempt:
+            yield f"  Попытка: {event.attempt}"
+        if event.flow_id:
+            yield f"  Flow ID: {event.flow_id}"
+
+        if event.context:
+            yield "  Контекст:"
+            for key, value in event.context.items():
+                yield f"    {key}: {value}"
+
+        if event.state_snapshot:
+            state = event.state_snapshot
+            yield "  Состояние устройства:"
+            if state.get('batteryLevel') is not None:
+                yield f"    Батарея: {state['batteryLevel']}% {'(заряжается)' if state.get('isCharging') else ''}"
+            if state.get('isNetworkAvailable') is not None:
+                yield f"    Сеть: {'доступна' if state['isNetworkAvailable'] else 'недоступна'}"
+            if state.get('networkType'):
+                yield f"    Тип сети: {state['networkType']}"
+            if state.get('serviceRunning') is not None:
+                yield f"    Сервис: {'запущен' if state['serviceRunning'] else 'остановлен'}"
+            if state.get('workerRunning') is not None:
+                yield f"    Воркер: {'запущен' if state['workerRunning'] else 'остановлен'}"
+            if state.get('queueSize') is not None:
+                yield f"    Размер очереди: {state['queueSize']}"
+
+        if event.metrics_snapshot:
+            metrics = event.metrics_snapshot
+            yield "  Метрики:"
+            if metrics.get('totalRetries') is not None:
+                yield f"    Всего повторных попыток: {metrics['totalRetries']}"
+            if metrics.get('totalServiceRestarts') is not None:
+                yield f"    Всего перезапусков сервиса: {metrics['totalServiceRestarts']}"
+            if metrics.get('failuresSinceLastRecovery') is not None:
+                yield f"    Ошибок с последнего восстановления: {metrics['failuresSinceLastRecovery']}"
+
+        yield ""
+        yield "-" * 80
+        yield ""
+
+
+def selected_devices(queryset):
+    """Устройства, к которым относятся события queryset, без загрузки самих событий"""
+    return Device.objects.filter(
+        id__in=queryset.order_by().values('device_id').distinct()
+    ).order_by('name')
+
+
+def _last_seen_display(device) -> str:
+    return device.last_seen.strftime('%d.%m.%Y %H:%M:%S') if device.last_seen else 'Никогда'
+
+
+def device_report_chunks(queryset, devices) -> Iterator[str]:
+    """Отчет по устройствам: статистика по уровням и компонентам и первые 20 событий"""
+    return _as_lines(_device_report_lines(queryset, devices))
+
+
+def _counts_by_device(queryset, field: str = None) -> dict:
+    """
+    Количество событий по устройствам одним GROUP BY запросом:
+    {device_id: count} или, если задан field, {device_id: {значение: count}}
+    """
+    fields = ['device_id', field] if field else ['device_id']
+    rows = queryset.order_by().values_list(*fields).annotate(count=Count('pk'))
+    if field is None:
+        return dict(rows)
+    counts = {}
+    for device_id, value, count in rows:
+        counts.setdefault(device_id, {})[value] = count
+    return counts
+
+
+def _events_per_device(queryset, limit: int, order_by) -> dict:
+    """
+    Первые limit событий каждого устройства в порядке order_by одним запросом
+    с ROW_NUMBER() OVER (PARTITION BY device_id ...): {device_id: [события]}
+    """
+    ranked = (
+        queryset.annotate(row_number=Window(RowNumber(), partition_by=[F('device_id')], order_by=order_by))
+        .filter(row_number__lte=limit)
+        .order_by('device_id', 'row_number')
+    )
+    events = {}
+    for event in ranked.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        events.setdefault(event.device_id, []).append(event)
+    return events
+
+
+def _device_report_lines(queryset, devices) -> Iterator[str]:
+    yield from _header("ПОЛНЫЙ ОТЧЕТ ПО ДИАГНОСТИКЕ УСТРОЙСТВ", f"Количество устройств: {len(devices)}")
+
+    # Статистика и первые события по всем устройствам - фиксированное число запросов
+    totals = _counts_by_device(queryset)
+    severity_stats = _counts_by_device(queryset, 'event_severity')
+    component_stats = _counts_by_device(queryset, 'component')
+    first_events = _events_per_device(queryset, 20, [F('timestamp').asc(), F('created_at').asc()])
+
+    for device in devices:
+        total = totals.get(device.id, 0)
+
+        yield f"\n{'=' * 80}"
+        yield f"УСТРОЙСТВО: {device.name}"
+        yield f"Token: {device.token}"
+        yield f"Последний раз онлайн: {_last_seen_display(device)}"
+        yield f"Всего событий: {total}"
+        yield f"{'=' * 80}"
+        yield ""
+
+        if device.id in severity_stats:
+            yield "Статистика по уровням серьезности:"
+            for severity, count in sorted(severity_stats[device.id].items()):
+                yield f"  {severity}: {count}"
+            yield ""
+
+        if device.id in component_stats:
+            yield "Статистика по компонентам:"
+            for component, count in sorted(component_stats[device.id].items()):
+                yield f"  {component}: {count}"
+            yield ""
+
+        yield "Последние события:"
+        for event in first_events.get(device.id, []):
+            yield f"  [{event.get_timestamp_display()}] {event.event_severity} - {event.event_code} ({event.component})"
+
+        if total > 20:
+            yield f"  ... и еще {total - 20} событий"
+
+        yield ""
+
+
+def last_events_chunks(queryset, devices, limit: int = 10) -> Iterator[str]:
+    """Последние limit событий по каждому устройству"""
+    return _as_lines(_last_events_lines(queryset, devices, limit))
+
+
+def _last_events_lines(queryset, devices, limit: int) -> Iterator[str]:
+    yield from _header("ПОСЛЕДНИЕ 10 СОБЫТИЙ ПО КАЖДОМУ УСТРОЙСТВУ", f"Количество устройств: {len(devices)}")
+
+    totals = _counts_by_device(queryset)
+    last_events = _events_per_device(queryset, limit, [F('timestamp').desc(), F('created_at').desc()])
+
+    for device in devices:
+        device_events = last_events.get(device.id)
+        if not device_events:
+            continue
+
+        yield f"\n{'=' * 80}"
+        yield f"УСТРОЙСТВО: {device.name}"
+        yield f"Token: {device.token}"
+        yield f"Последний раз онлайн: {_last_seen_display(device)}"
+        yield f"Всего выбрано событий: {totals.get(device.id, 0)}"
+        yield f"Показано последних: {len(device_events)}"
+        yield f"{'=' * 80}"
+        yield ""
+
+        for idx, event in enumerate(device_events, 1):
+            yield f"[{idx}] {event.get_timestamp_display()} - {event.event_severity} - {event.event_code}"
+            yield f"     Компонент: {event.component}"
+            if event.pipeline_stage:
+                yield f"     Этап пайплайна: {event.pipeline_stage}"
+
+            # Краткая информация о состоянии
+            if event.state_snapshot:
+                state = event.state_snapshot
+                state_info = []
+                if state.get('batteryLevel') is not None:
+                    state_info.append(f"Батарея: {state['batteryLevel']}%")
+                if state.get('isNetworkAvailable') is not None:
+                    state_info.append(f"Сеть: {'✅' if state['isNetworkAvailable'] else '❌'}")
+                if state.get('serviceRunning') is not None:
+                    state_info.append(f"Сервис: {'✅' if state['serviceRunning'] else '❌'}")
+                if state_info:
+                    yield f"     Состояние: {', '.join(state_info)}"
+
+            # Краткая информация о метриках
+            if event.metrics_snapshot:
+                metrics = event.metrics_snapshot
+                metrics_info = []
+                if metrics.get('totalRetries') is not None and metrics['totalRetries'] > 0:
+                    metrics_info.append(f"Retries: {metrics['totalRetries']}")
+                if metrics.get('totalServiceRestarts') is not None and metrics['totalServiceRestarts'] > 0:
+                    metrics_info.append(f"Restarts: {metrics['totalServiceRestarts']}")
+                if metrics_info:
+                    yield f"     Метрики: {', '.join(metrics_info)}"
+
+            # Контекст если есть важная информация
+            if event.context:
+                important_context = {k: v for k, v in event.context.items()
+                                     if k in ['errorMessage', 'retryCount', 'exception'] and v}
+                if important_context:
+                    yield f"     Контекст: {important_context}"
+
+            yield ""
+
+        yield "-" * 80
+        yield ""
+
+
+# Ответ
+
+def _encoded(chunks: Iterable[str]) -> Iterator[bytes]:
+    """Склеивает мелкие строки в блоки по STREAM_BUFFER_SIZE и кодирует в UTF-8"""
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= STREAM_BUFFER_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def _gzipped(blocks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 - формат gzip
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_export(chunks: Iterable[str], filename: str, content_type: str,
+                     compress: bool = False) -> StreamingHttpResponse:
+    """Файл-вложение, отдаваемый по мере формирования; при compress - в gzip"""
+    body = _encoded(chunks)
+    if compress:
+        body = _gzipped(body)
+        filename += '.gz'
+        content_type = 'application/gzip'
+    response = StreamingHttpResponse(body, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
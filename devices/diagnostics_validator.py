@@ -0,0 +1,198 @@
+"""
+Быстрая валидация пакета диагностических событий.
+
+Повторяет правила DiagnosticEventSerializer (типы, выбор из списка, null/blank,
+обрезка пробелов) и формат его ошибок, но без создания сериализатора и полей
+DRF на каждое событие: схема компилируется один раз при импорте модуля.
+"""
+import re
+import uuid
+
+from rest_framework import fields
+from rest_framework.exceptions import ErrorDetail
+
+from .models import DiagnosticEvent
+
+
+def _messages(field_class):
+    """Сообщения об ошибках поля DRF с учетом всех родительских классов"""
+    messages = {}
+    for cls in reversed(field_class.__mro__):
+        messages.update(getattr(cls, 'default_error_messages', {}))
+    return messages
+
+
+_CHAR_MESSAGES = _messages(fields.CharField)
+_INT_MESSAGES = _messages(fields.IntegerField)
+_CHOICE_MESSAGES = _messages(fields.ChoiceField)
+_DICT_MESSAGES = _messages(fields.DictField)
+_UUID_MESSAGES = _messages(fields.UUIDField)
+_VALIDATOR_MESSAGES = {
+    'null_characters_not_allowed': fields.ProhibitNullCharactersValidator.message,
+    'surrogate_characters_not_allowed': fields.ProhibitSurrogateCharactersValidator.message,
+}
+
+_DECIMAL_SUFFIX = re.compile(r'\.0*\s*$')
+_SURROGATES = re.compile('[\ud800-\udfff]')
+_EMPTY = object()
+
+
+class _Invalid(Exception):
+    def __init__(self, messages, code, **kwargs):
+        self.detail = ErrorDetail(str(messages[code]).format(**kwargs), code=code)
+
+
+def _to_char(value):
+    if value == '' or str(value).strip() == '':
+        raise _Invalid(_CHAR_MESSAGES, 'blank')
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise _Invalid(_CHAR_MESSAGES, 'invalid')
+    value = str(value).strip()
+    if '\x00' in value:
+        raise _Invalid(_VALIDATOR_MESSAGES, 'null_characters_not_allowed')
+    surrogate = _SURROGATES.search(value)
+    if surrogate:
+        raise _Invalid(_VALIDATOR_MESSAGES, 'surrogate_characters_not_allowed', code_point=ord(surrogate.group()))
+    return value
+
+
+def _to_int(value):
+    if isinstance(value, str) and len(value) > fields.IntegerField.MAX_STRING_LENGTH:
+        raise _Invalid(_INT_MESSAGES, 'max_string_length')
+    try:
+        return int(_DECIMAL_SUFFIX.sub('', str(value)))
+    except (ValueError, TypeError):
+        raise _Invalid(_INT_MESSAGES, 'invalid')
+
+
+def _to_dict(value):
+    if not isinstance(value, dict):
+        raise _Invalid(_DICT_MESSAGES, 'not_a_dict', input_type=type(value).__name__)
+    return {str(key): item for key, item in value.items()}
+
+
+def _to_uuid(value):
+    try:
+        if isinstance(value, uuid.UUID):
+            return value
+        if isinstance(value, int):
+            return uuid.UUID(int=value)
+        if isinstance(value, str):
+            return uuid.UUID(hex=value)
+    except ValueError:
+        pass
+    raise _Invalid(_UUID_MESSAGES, 'invalid', value=value)
+
+
+def _choice(choices):
+    allowed = {str(choice): choice for choice, _ in choices}
+
+    def to_choice(value):
+        try:
+            return allowed[str(value)]
+        except KeyError:
+            raise _Invalid(_CHOICE_MESSAGES, 'invalid_choice', input=value)
+    return to_choice
+
+
+class _Field:
+    __slots__ = ('name', 'target', 'convert', 'required', 'allow_null', 'default', 'messages')
+
+    def __init__(self, name, target, convert, messages, required=False, allow_null=False, default=_EMPTY):
+        self.name = name
+        self.target = target
+        self.convert = convert
+        self.messages = messages
+        self.required = required
+        self.allow_null = allow_null
+        self.default = default
+
+
+# Поле запроса (camelCase) -> поле модели, в порядке объявления в DiagnosticEventSerializer
+SCHEMA = (
+    _Field('eventId', 'event_id', _to_char, _CHAR_MESSAGES, required=True),
+    _Field('deviceId', None, _to_uuid, _UUID_MESSAGES, allow_null=True),
+    _Field('timestamp', 'timestamp', _to_int, _INT_MESSAGES, allow_null=True),
+    _Field('eventCode', 'event_code', _to_char, _CHAR_MESSAGES, required=True),
+    _Field('eventSeverity', 'event_severity', _choice(DiagnosticEvent.SEVERITY_CHOICES), _CHOICE_MESSAGES, required=True),
+    _Field('component', 'component', _choice(DiagnosticEvent.COMPONENT_CHOICES), _CHOICE_MESSAGES, required=True),
+    _Field('pipelineStage', 'pipeline_stage', _choice(DiagnosticEvent.PIPELINE_STAGE_CHOICES), _CHOICE_MESSAGES, allow_null=True),
+    _Field('context', 'context', _to_dict, _DICT_MESSAGES, default=dict),
+    _Field('thread', 'thread', _to_char, _CHAR_MESSAGES, allow_null=True),
+    _Field('attempt', 'attempt', _to_int, _INT_MESSAGES, allow_null=True),
+    _Field('flowId', 'flow_id', _to_char, _CHAR_MESSAGES, allow_null=True),
+    _Field('state', 'state_snapshot', _to_dict, _DICT_MESSAGES, allow_null=True),
+    _Field('metrics', 'metrics_snapshot', _to_dict, _DICT_MESSAGES, allow_null=True),
+)
+
+
+def validate_event(data):
+    """
+    Проверяет одно событие.
+
+    Returns:
+        tuple: (поля модели DiagnosticEvent или None, ошибки в формате serializer.errors или None)
+    """
+    values = {}
+    errors = None
+
+    for field in SCHEMA:
+        value = data.get(field.name, _EMPTY)
+        try:
+            if value is _EMPTY:
+                if field.required:
+                    raise _Invalid(field.messages, 'required')
+                if field.default is _EMPTY or field.target is None:
+                    continue
+                value = field.default()
+            elif value is None:
+                if not field.allow_null:
+                    raise _Invalid(field.messages, 'null')
+            else:
+                value = field.convert(value)
+        except _Invalid as e:
+            if errors is None:
+                errors = {}
+            errors[field.name] = [e.detail]
+            continue
+
+        if field.target is not None:
+            values[field.target] = value
+
+    if errors:
+        return None, errors
+    return values, None
+
+
+def validate_events(events):
+    """
+    Проверяет весь пакет за один проход.
+
+    Returns:
+        tuple: (список (index, поля модели) для валидных событий,
+                список ошибок в формате ответа DiagnosticsBatchView)
+    """
+    valid = []
+    errors = []
+
+    for idx, event_data in enumerate(events):
+        if not isinstance(event_data, dict):
+            errors.append({
+                'index': idx,
+                'eventId': 'unknown',
+                'error': 'Событие должно быть объектом'
+            })
+            continue
+
+        values, event_errors = validate_event(event_data)
+        if event_errors:
+            errors.append({
+                'index': idx,
+                'eventId': event_data.get('eventId', 'unknown'),
+                'errors': event_errors
+            })
+            continue
+
+        valid.append((idx, values))
+
+    return valid, errors
@@ -0,0 +1,216 @@
+"""
+Фоновые экспорты диагностических событий.
+
+Админка не формирует большой файл в запросе (его ограничивает таймаут
+gunicorn), а создает ExportJob: формат, GET-параметры списка событий
+(фильтры и поиск) и id отмеченных событий. Воркер run_export_worker забирает
+задачи по одной, восстанавливает выборку через changelist DiagnosticEventAdmin
+с теми же параметрами, пишет файл теми же генераторами, что и потоковый экспорт
+(devices.diagnostics_export), сразу в gzip под MEDIA_ROOT/exports/ и
+по ходу работы обновляет счетчик обработанных событий.
+"""
+import gzip
+import logging
+import os
+import tempfile
+import time
+from datetime import timedelta
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.storage import default_storage
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from .diagnostics_export import (
+    csv_chunks, device_report_chunks, error_log_chunks, iter_events, json_array_chunks, last_events_chunks,
+    ndjson_chunks, selected_devices,
+)
+from .models import DiagnosticEvent, ExportJob
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FILENAMES = {
+    'json': 'diagnostic_events.json',
+    'ndjson': 'diagnostic_events.ndjson',
+    'csv': 'diagnostic_events.csv',
+    'error_log': 'error_log.txt',
+    'device_report': 'device_diagnostics.txt',
+    'last_10': 'last_10_events_per_device.txt',
+}
+
+# Как часто (в событиях) записывать прогресс задачи в БД
+PROGRESS_EVERY = 5000
+# Как часто (в секундах) продлевать блокировку задачи, пока пишется файл
+LOCK_REFRESH_INTERVAL = 60
+
+
+class JobLockLost(Exception):
+    """Задачу вернули в очередь (блокировка истекла) - ее выполняет другой воркер"""
+
+
+def submit_export(kind: str, filters: dict, selected_ids: Optional[list], description: str = '',
+                  user=None) -> ExportJob:
+    """
+    Ставит выборку событий в очередь на экспорт в формате kind: filters -
+    GET-параметры списка событий {параметр: [значения]}, selected_ids - id
+    отмеченных событий (None - все события по фильтрам)
+    """
+    return ExportJob.objects.create(
+        kind=kind,
+        filters=filters,
+        selected_ids=[str(pk) for pk in selected_ids] if selected_ids is not None else None,
+        description=description,
+        requested_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def job_queryset(job: ExportJob):
+    """
+    Восстанавливает выборку событий: тот же changelist админки (фильтры, поиск,
+    права автора задачи), что видел пользователь, плюс отмеченные события
+    """
+    from django.contrib import admin  # admin.py импортирует этот модуль
+
+    model_admin = admin.site._registry[DiagnosticEvent]
+    request = RequestFactory().get(reverse('admin:devices_diagnosticevent_changelist'), job.filters)
+    request.user = job.requested_by or AnonymousUser()
+    changelist = model_admin.get_changelist_instance(request)
+    queryset = changelist.get_queryset(request)
+    if job.selected_ids is not None:
+        queryset = queryset.filter(pk__in=job.selected_ids)
+    return queryset
+
+
+def _claim(job: ExportJob, now) -> bool:
+    """Атомарно забирает задачу в работу, чтобы ее не взял другой воркер"""
+    return ExportJob.objects.filter(pk=job.pk, status='pending').update(
+        status='running', locked_at=now, started_at=now, processed=0
+    ) == 1
+
+
+def release_stale_jobs() -> int:
+    """Возвращает в очередь задачи, зависшие в 'running' (воркер упал посреди экспорта)"""
+    stale_before = timezone.now() - timedelta(seconds=settings.EXPORT_JOB_LOCK_TIMEOUT)
+    return ExportJob.objects.filter(
+        status='running', locked_at__lt=stale_before
+    ).update(status='pending', locked_at=None)
+
+
+def _tracked(job: ExportJob, events: Iterable) -> Iterator:
+    """Отдает события дальше и периодически сохраняет прогресс"""
+    processed = 0
+    for event in events:
+        yield event
+        processed += 1
+        if processed % PROGRESS_EVERY == 0:
+            ExportJob.objects.filter(pk=job.pk).update(processed=processed)
+
+
+def _refresh_lock(job: ExportJob):
+    """
+    Продлевает блокировку задачи. Если задачу уже вернули в очередь или
+    забрал другой воркер (locked_at сменился), выбрасывает JobLockLost
+    """
+    now = timezone.now()
+    if not ExportJob.objects.filter(pk=job.pk, status='running', locked_at=job.locked_at).update(locked_at=now):
+        raise JobLockLost(f'Задача экспорта {job.pk} выполняется другим воркером')
+    job.locked_at = now
+
+
+def _export_chunks(job: ExportJob, queryset) -> Iterator[str]:
+    """Строки файла экспорта; заполняет job.total до начала выгрузки"""
+    if job.kind == 'error_log':
+        queryset = queryset.filter(event_severity__in=['ERROR', 'CRITICAL']).order_by('device', 'timestamp')
+
+    job.total = queryset.count()
+    ExportJob.objects.filter(pk=job.pk).update(total=job.total)
+
+    if job.kind == 'json':
+        return json_array_chunks(_tracked(job, iter_events(queryset)))
+    if job.kind == 'ndjson':
+        return ndjson_chunks(_tracked(job, iter_events(queryset)))
+    if job.kind == 'csv':
+        return csv_chunks(_tracked(job, iter_events(queryset)))
+    if job.kind == 'error_log':
+        return error_log_chunks(_tracked(job, iter_events(queryset)), job.total)
+
+    # Отчеты по устройствам строятся фиксированным числом агрегирующих запросов,
+    # прогресс для них отмечается только по завершении
+    devices = list(selected_devices(queryset))
+    if job.kind == 'device_report':
+        return device_report_chunks(queryset, devices)
+    if job.kind == 'last_10':
+        return last_events_chunks(queryset, devices, limit=10)
+    raise ValueError(f'Неизвестный формат экспорта: {job.kind}')
+
+
+def run_job(job: ExportJob):
+    """
+    Формирует файл задачи. Файл пишется в уникальный для этого запуска .tmp
+    рядом с итоговым и переименовывается только после успешного завершения.
+    Пока файл пишется, блокировка задачи продлевается не реже раза в
+    LOCK_REFRESH_INTERVAL секунд; если задачу за это время забрал другой
+    воркер, запуск прекращается, ничего не сохранив
+    """
+    name = f"exports/{job.created_at:%Y/%m}/{job.pk.hex}-{EXPORT_FILENAMES[job.kind]}.gz"
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+
+    try:
+        chunks = _export_chunks(job, job_queryset(job))
+        refreshed_at = time.monotonic()
+        with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8', compresslevel=6) as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+                if time.monotonic() - refreshed_at >= LOCK_REFRESH_INTERVAL:
+                    _refresh_lock(job)
+                    refreshed_at = time.monotonic()
+        _refresh_lock(job)
+        os.replace(tmp_path, path)
+    except JobLockLost as e:
+        os.remove(tmp_path)
+        logger.warning(str(e))
+        return job
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        job.status = 'failed'
+        job.error = str(e) or e.__class__.__name__
+    else:
+        job.status = 'done'
+        job.file.name = name
+        job.size_bytes = os.path.getsize(path)
+        job.processed = job.total
+        job.error = ''
+
+    job.finished_at = timezone.now()
+    ExportJob.objects.filter(pk=job.pk, status='running', locked_at=job.locked_at).update(
+        status=job.status, file=job.file.name or '', size_bytes=job.size_bytes, total=job.total,
+        processed=job.processed, error=job.error, locked_at=None, finished_at=job.finished_at,
+    )
+    job.locked_at = None
+    return job
+
+
+def delete_expired_jobs() -> int:
+    """Удаляет завершенные задачи старше EXPORT_JOB_KEEP_DAYS вместе с файлами"""
+    if not settings.EXPORT_JOB_KEEP_DAYS:
+        return 0
+    expired_before = timezone.now() - timedelta(days=settings.EXPORT_JOB_KEEP_DAYS)
+    deleted, _ = ExportJob.objects.filter(
+        status__in=['done', 'failed'], finished_at__lt=expired_before
+    ).delete()
+    return deleted
+
+
+def process_next_job() -> Optional[ExportJob]:
+    """Выполняет самую старую задачу из очереди; None, если очередь пуста"""
+    for job in ExportJob.objects.filter(status='pending').order_by('created_at')[:5]:
+        if _claim(job, timezone.now()):
+            job.refresh_from_db()
+            return run_job(job)
+    return None
@@ -0,0 +1,222 @@
+"""
+Скомпилированные правила фильтрации уведомлений.
+
+Активные NotificationFilter и NotificationTextFilter загружаются в память
+процесса один раз: точные имена пакетов - в словарь, маски вида com.android.* -
+в префиксное дерево, текстовые правила - в PatternSet, отправители - в словарь.
+Проверка уведомления после этого не обращается к БД и не компилирует regex.
+
+Кэш сбрасывается сигналами post_save/post_delete (см. signals.py), а изменения,
+сделанные в других процессах, подхватываются по отпечатку таблиц, который
+проверяется не чаще раза в NOTIFICATION_FILTER_RELOAD_INTERVAL секунд.
+"""
+import logging
+import re
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import NotificationFilter, NotificationTextFilter
+from .text_classifier import PatternSet
+
+logger = logging.getLogger(__name__)
+
+
+class PackageRule(NamedTuple):
+    pattern: str
+    filter_type: str
+    description: str
+
+
+class TextRule(NamedTuple):
+    rule_type: str
+    pattern: str
+    filter_type: str
+    description: str
+
+
+class _TrieNode:
+    __slots__ = ('children', 'rule')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.rule: Optional[PackageRule] = None
+
+
+class PackageRuleSet:
+    """Неизменяемый набор правил: точные имена и префиксное дерево масок"""
+
+    def __init__(self, rules=()):
+        self.exact: Dict[str, PackageRule] = {}
+        self.root = _TrieNode()
+        self.has_wildcards = False
+
+        for rule in rules:
+            self.exact[rule.pattern] = rule
+            if rule.pattern.endswith('*'):
+                self._insert(rule.pattern[:-1], rule)
+
+    def _insert(self, prefix: str, rule: PackageRule):
+        node = self.root
+        for char in prefix:
+            node = node.children.setdefault(char, _TrieNode())
+        node.rule = rule
+        self.has_wildcards = True
+
+    def match_exact(self, package_name: str) -> Optional[PackageRule]:
+        return self.exact.get(package_name)
+
+    def match_wildcard(self, package_name: str) -> Optional[PackageRule]:
+        """
+        Маска, подходящая к пакету. Если подходит несколько, выбирается первая
+        по алфавиту, как при переборе фильтров из БД (ordering = package_name).
+        """
+        if not self.has_wildcards:
+            return None
+        node = self.root
+        best = node.rule
+        for char in package_name:
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.rule is not None and (best is None or node.rule.pattern < best.pattern):
+                best = node.rule
+        return best
+
+    def __len__(self):
+        return len(self.exact)
+
+
+class _TextMatcher:
+    """Правила одного типа фильтра (черный или белый список)"""
+
+    def __init__(self, rules):
+        self.senders: Dict[str, TextRule] = {}
+        self.by_pattern: Dict[str, TextRule] = {}
+        regexes = []
+        literals = []
+
+        for rule in rules:
+            if rule.rule_type == 'sender':
+                self.senders.setdefault(rule.pattern.strip().lower(), rule)
+                continue
+            if rule.rule_type == 'text_regex':
+                try:
+                    PatternSet([rule.pattern])
+                except re.error as e:
+                    logger.error(f"Skipping invalid notification filter regex {rule.pattern!r}: {e}")
+                    continue
+                regexes.append(rule.pattern)
+            else:
+                literals.append(rule.pattern)
+            self.by_pattern.setdefault(rule.pattern, rule)
+
+        self.texts = PatternSet(regexes, literals=literals)
+
+    def match(self, sender: Optional[str], text: Optional[str]) -> Optional[TextRule]:
+        if sender and self.senders:
+            rule = self.senders.get(sender.strip().lower())
+            if rule is not None:
+                return rule
+        pattern = self.texts.search(text)
+        if pattern is not None:
+            return self.by_pattern[pattern]
+        return None
+
+
+class TextRuleSet:
+    """Правила по тексту и отправителю; белый список проверяется раньше черного"""
+
+    def __init__(self, rules=()):
+        rules = list(rules)
+        self.whitelist = _TextMatcher(rule for rule in rules if rule.filter_type == 'whitelist')
+        self.blacklist = _TextMatcher(rule for rule in rules if rule.filter_type == 'blacklist')
+        self.size = len(rules)
+
+    def match(self, sender: Optional[str], text: Optional[str]) -> Optional[TextRule]:
+        if not self.size:
+            return None
+        return self.whitelist.match(sender, text) or self.blacklist.match(sender, text)
+
+    def __len__(self):
+        return self.size
+
+
+class FilterRules(NamedTuple):
+    packages: PackageRuleSet
+    texts: TextRuleSet
+
+
+_rules = FilterRules(PackageRuleSet(), TextRuleSet())
+_version = 0          # увеличивается сигналами при изменении фильтров в этом процессе
+_loaded_version = -1  # версия, из которой собран _rules
+_stamp = None         # отпечаток таблиц на момент загрузки
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _table_stamp() -> Tuple:
+    """Отпечаток таблиц фильтров: количество строк и время последнего изменения"""
+    stamp = ()
+    for model in (NotificationFilter, NotificationTextFilter):
+        result = model.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+        stamp += (result['count'], result['updated'])
+    return stamp
+
+
+def _load():
+    global _rules, _loaded_version, _stamp, _checked_at
+    version = _version
+    stamp = _table_stamp()
+    package_rules = [
+        PackageRule(*row)
+        for row in NotificationFilter.objects.filter(
+            is_active=True
+        ).values_list('package_name', 'filter_type', 'description')
+    ]
+    text_rules = [
+        TextRule(*row)
+        for row in NotificationTextFilter.objects.filter(
+            is_active=True
+        ).values_list('rule_type', 'pattern', 'filter_type', 'description')
+    ]
+    _rules = FilterRules(PackageRuleSet(package_rules), TextRuleSet(text_rules))
+    _loaded_version = version
+    _stamp = stamp
+    _checked_at = time.monotonic()
+    logger.debug(f"Loaded {len(package_rules)} package and {len(text_rules)} text notification filter rules")
+
+
+def get_filter_rules() -> FilterRules:
+    """Текущие правила процесса, при необходимости перезагруженные из БД"""
+    global _checked_at, _loaded_version, _stamp
+    if _loaded_version == _version and time.monotonic() - _checked_at < settings.NOTIFICATION_FILTER_RELOAD_INTERVAL:
+        return _rules
+
+    with _lock:
+        try:
+            if _loaded_version != _version:
+                _load()
+            elif time.monotonic() - _checked_at >= settings.NOTIFICATION_FILTER_RELOAD_INTERVAL:
+                if _table_stamp() != _stamp:
+                    _load()
+                else:
+                    _checked_at = time.monotonic()
+        except Exception as e:
+            # При ошибке продолжаем работать с последними загруженными правилами и повторяем
+            # загрузку не раньше чем через NOTIFICATION_FILTER_RELOAD_INTERVAL, а не на каждом уведомлении
+            logger.error(f"Failed to load notification filter rules: {e}")
+            _loaded_version = _version
+            _stamp = None
+            _checked_at = time.monotonic()
+    return _rules
+
+
+def invalidate_filter_rules():
+    """Помечает правила устаревшими - они будут перезагружены при следующей проверке"""
+    global _version
+    with _lock:
+        _version += 1
@@ -0,0 +1,108 @@
+"""
+Отложенная запись Device.last_seen.
+
+Запросы устройства не обновляют last_seen сразу: время запоминается в памяти
+процесса и раз в DEVICE_LAST_SEEN_FLUSH_INTERVAL секунд записывается в БД одним
+bulk UPDATE для всех устройств. Значение в БД отстает от реального не больше
+чем на этот интервал.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from .models import Device
+
+logger = logging.getLogger(__name__)
+
+
+class LastSeenBuffer:
+    """Копит последние времена активности устройств и сбрасывает их пачкой"""
+
+    def __init__(self, flush_interval: float, batch_size: int = 500):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pending: Dict[object, datetime] = {}  # device_id -> last_seen
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+
+    def touch(self, device_id, seen_at: datetime):
+        with self.lock:
+            current = self.pending.get(device_id)
+            if current is None or seen_at > current:
+                self.pending[device_id] = seen_at
+            self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name='last-seen-flusher', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush device last_seen: {e}")
+            finally:
+                close_old_connections()
+
+    def flush(self) -> int:
+        """Записывает накопленные значения в БД, возвращает число устройств"""
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+            if not pending:
+                return 0
+
+            try:
+                Device.objects.bulk_update(
+                    [Device(id=device_id, last_seen=seen_at) for device_id, seen_at in pending.items()],
+                    ['last_seen'],
+                    batch_size=self.batch_size,
+                )
+            except DatabaseError:
+                # Возвращаем значения в буфер, не затирая более свежие
+                with self.lock:
+                    for device_id, seen_at in pending.items():
+                        current = self.pending.get(device_id)
+                        if current is None or seen_at > current:
+                            self.pending[device_id] = seen_at
+                raise
+            return len(pending)
+
+    def __len__(self):
+        return len(self.pending)
+
+
+_buffer = LastSeenBuffer(settings.DEVICE_LAST_SEEN_FLUSH_INTERVAL)
+
+
+def touch_device(device: Device):
+    """Отмечает активность устройства: сразу в экземпляре, в БД - при следующем сбросе"""
+    device.last_seen = timezone.now()
+    if settings.DEVICE_LAST_SEEN_FLUSH_INTERVAL <= 0:
+        device.save(update_fields=['last_seen'])
+        return
+    _buffer.touch(device.id, device.last_seen)
+
+
+def flush_last_seen() -> int:
+    """Немедленно записывает накопленные last_seen в БД"""
+    return _buffer.flush()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        _buffer.flush()
+    except Exception as e:
+        logger.error(f"Failed to flush device last_seen on exit: {e}")
@@ -0,0 +1,332 @@
+"""
+Живая лента событий для дашборда админки (Server-Sent Events).
+
+Источник событий - сама БД: новые сообщения, критические диагностические
+события и смены статуса устройств (новые строки DeviceStatusHistory).
+Поэтому дашборд видит данные, принятые любым воркером, а не только тем,
+к которому подключен его EventSource.
+
+В каждом процессе БД опрашивается не чаще раза в LIVE_EVENTS_POLL_INTERVAL
+секунд и только пока есть подписчики: опрос делает тот подписчик, чья очередь
+подошла, найденное складывается в ограниченный кольцевой буфер процесса, и все
+подписчики читают из него. Число зрителей не увеличивает нагрузку на БД.
+
+Идентификатор события - позиция ленты после него: курсоры сообщений и
+диагностики ("<микросекунды UNIX>_<id>", см. message_feed) и id строки
+истории статусов, через "~". Позиция одинакова во всех процессах, поэтому
+клиент, переподключившийся с Last-Event-ID к другому воркеру, получает
+пропущенные события из его буфера, а если буфер начат позже позиции
+клиента - одним запросом к БД. Если пропущено больше размера буфера,
+отправляется событие reset, и дашборд перезагружает данные целиком.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+
+from .message_feed import make_cursor, message_payload, parse_cursor
+from .models import DeviceStatusHistory, DiagnosticEvent, Message
+
+POSITION_SEPARATOR = '~'
+KINDS = ('message', 'diagnostic', 'status')
+# После простоя без подписчиков дольше этого лента начинается заново с конца БД,
+# а не с накопившихся за простой событий
+IDLE_RESTART = 60  # секунды
+
+
+class Position(NamedTuple):
+    """Позиция ленты: курсор последнего сообщения, последнего CRITICAL-события и id смены статуса"""
+    message: str
+    diagnostic: str
+    status: int
+
+    def as_id(self) -> str:
+        return POSITION_SEPARATOR.join([self.message, self.diagnostic, str(self.status)])
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> Optional['Position']:
+        """Позиция из Last-Event-ID; None, если идентификатор некорректен"""
+        if not value:
+            return None
+        parts = value.split(POSITION_SEPARATOR)
+        if len(parts) != 3 or not parts[2].isdigit():
+            return None
+        try:
+            for cursor in parts[:2]:
+                if cursor:
+                    parse_cursor(cursor)
+        except ValueError:
+            return None
+        return cls(parts[0], parts[1], int(parts[2]))
+
+
+def _key(kind: str, position: Position):
+    """Сравнимый ключ компоненты позиции для вида событий kind"""
+    if kind == 'status':
+        return position.status
+    cursor = getattr(position, kind)
+    if not cursor:
+        return (-1, '')
+    micros, _, pk = cursor.partition('_')
+    return (int(micros), pk)
+
+
+def _latest(position: Position, other: Position) -> Position:
+    """Покомпонентный максимум двух позиций"""
+    return Position(*(
+        getattr(position if _key(kind, position) >= _key(kind, other) else other, kind) for kind in KINDS
+    ))
+
+
+def _after_cursor(cursor: str) -> Q:
+    if not cursor:
+        return Q()
+    created_at, pk = parse_cursor(cursor)
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+
+
+def current_position() -> Position:
+    """Позиция конца ленты в БД"""
+    message = Message.objects.order_by('-created_at', '-id').values_list('created_at', 'id').first()
+    diagnostic = DiagnosticEvent.objects.filter(event_severity='CRITICAL').order_by(
+        '-created_at', '-id'
+    ).values_list('created_at', 'id').first()
+    status = DeviceStatusHistory.objects.order_by('-id').values_list('id', flat=True).first()
+    return Position(
+        make_cursor(*message) if message else '',
+        make_cursor(*diagnostic) if diagnostic else '',
+        status or 0,
+    )
+
+
+def diagnostic_payload(event: DiagnosticEvent) -> dict:
+    return {
+        'device_name': event.device.name,
+        'event_code': event.event_code,
+        'event_severity': event.event_severity,
+        'component': event.component,
+        'timestamp_display': event.get_timestamp_display(),
+    }
+
+
+def status_payload(history: DeviceStatusHistory) -> dict:
+    return {
+        'device_name': history.device.name,
+        'status_level': history.status_level,
+        'reasons': history.reasons,
+        'is_charging': history.is_charging,
+        'network_available': history.network_available,
+        'first_seen': history.first_seen.isoformat(),
+    }
+
+
+def fetch_events(position: Position, limit: int) -> List[Tuple[str, dict, Position]]:
+    """
+    Не больше limit событий каждого вида после позиции, от старых к новым:
+    (вид, данные, позиция после события)
+    """
+    events = []
+    messages = (
+        Message.objects.select_related('device').filter(_after_cursor(position.message))
+        .order_by('created_at', 'id')[:limit]
+    )
+    for message in messages:
+        cursor = make_cursor(message.created_at, message.id)
+        position = position._replace(message=cursor)
+        events.append(('message', dict(message_payload(message), cursor=cursor), position))
+
+    diagnostics = (
+        DiagnosticEvent.objects.select_related('device')
+        .filter(_after_cursor(position.diagnostic), event_severity='CRITICAL')
+        .order_by('created_at', 'id')[:limit]
+    )
+    for event in diagnostics:
+        position = position._replace(diagnostic=make_cursor(event.created_at, event.id))
+        events.append(('diagnostic', diagnostic_payload(event), position))
+
+    transitions = (
+        DeviceStatusHistory.objects.select_related('device')
+        .filter(id__gt=position.status).order_by('id')[:limit]
+    )
+    for history in transitions:
+        position = position._replace(status=history.id)
+        events.append(('status', status_payload(history), position))
+    return events
+
+
+class LiveEvent(NamedTuple):
+    event_type: str
+    data: str
+    position: Position
+
+
+class LiveEventBroker:
+    """Кольцевой буфер событий, пополняемый опросом БД, и оповещение подписчиков в их event loop"""
+
+    def __init__(self, buffer_size: int, poll_interval: float):
+        self.buffer_size = buffer_size
+        self.poll_interval = poll_interval
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._subscribers = set()
+        self._position: Optional[Position] = None  # конец ленты на момент последнего опроса
+        self._base: Optional[Position] = None  # позиция перед самым старым событием буфера
+        self._polled_at = 0.0
+        self._idle_since: Optional[float] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def position(self) -> Optional[Position]:
+        with self._lock:
+            return self._position
+
+    def poll(self):
+        """
+        Дописывает в буфер новые события из БД и будит подписчиков. Пока лента
+        не начата, ждет параллельный опрос, иначе пропускает вызов
+        """
+        if not self._poll_lock.acquire(blocking=self._position is None):
+            return
+        try:
+            idle = self._idle_since is not None and time.monotonic() - self._idle_since > IDLE_RESTART
+            self._idle_since = None
+            if time.monotonic() - self._polled_at < self.poll_interval and self._position is not None and not idle:
+                return
+            if self._position is None or idle:
+                position = current_position()
+                with self._lock:
+                    self._buffer.clear()
+                    self._position = self._base = position
+                events = []
+            else:
+                events = fetch_events(self._position, self.buffer_size)
+            self._polled_at = time.monotonic()
+            if not events:
+                return
+
+            with self._lock:
+                for event_type, payload, position in events:
+                    data = json.dumps(payload, ensure_ascii=False, default=str)
+                    self._buffer.append(LiveEvent(event_type, data, position))
+                    self._position = _latest(self._position, position)
+                while len(self._buffer) > self.buffer_size:
+                    evicted = self._buffer.popleft()
+                    self._base = _latest(self._base, evicted.position)
+                subscribers = list(self._subscribers)
+            for loop, waiter in subscribers:
+                try:
+                    loop.call_soon_threadsafe(waiter.set)
+                except RuntimeError:
+                    # event loop подписчика уже закрыт
+                    pass
+        finally:
+            self._poll_lock.release()
+
+    def since(self, position: Position) -> Tuple[List[LiveEvent], bool]:
+        """События после позиции и признак разрыва (часть событий уже вытеснена или не попала в буфер)"""
+        with self._lock:
+            if self._base is None or any(_key(kind, position) < _key(kind, self._base) for kind in KINDS):
+                return [], True
+            return [
+                event for event in self._buffer
+                if _key(event.event_type, event.position) > _key(event.event_type, position)
+            ], False
+
+    def catch_up(self, position: Position) -> Optional[List[LiveEvent]]:
+        """
+        События между позицией клиента и началом буфера - прямо из БД (клиент
+        переподключился к процессу, чей буфер начат позже). None, если их
+        больше размера буфера
+        """
+        with self._lock:
+            base = self._base
+        if base is None:
+            return None
+        events = []
+        for event_type, payload, event_position in fetch_events(position, self.buffer_size):
+            position = _latest(position, event_position)
+            events.append(LiveEvent(event_type, json.dumps(payload, ensure_ascii=False, default=str), event_position))
+        if any(_key(kind, position) < _key(kind, base) for kind in KINDS):
+            return None
+        return events
+
+    async def listen(self, last_position: Optional[Position], reset: bool, heartbeat: float) -> AsyncIterator[str]:
+        """
+        Поток SSE-фрагментов для одного подписчика. Без last_position отдает
+        только новые события; при reset или разрыве отправляет reset. Если
+        событий нет heartbeat секунд, отправляет комментарий, чтобы прокси
+        не закрывали соединение.
+        """
+        waiter = asyncio.Event()
+        entry = (asyncio.get_running_loop(), waiter)
+        with self._lock:
+            self._subscribers.add(entry)
+        try:
+            await sync_to_async(self.poll)()
+            if reset or last_position is None:
+                last_position = self.position
+                if reset:
+                    yield format_sse('reset', '{}', last_position.as_id())
+            sent_at = time.monotonic()
+            while True:
+                waiter.clear()
+                events, gap = self.since(last_position)
+                if gap:
+                    missed = await sync_to_async(self.catch_up)(last_position)
+                    if missed is not None:
+                        for event in missed:
+                            last_position = _latest(last_position, event.position)
+                            yield format_sse(event.event_type, event.data, event.position.as_id())
+                        last_position = _latest(last_position, self._base)
+                        sent_at = time.monotonic()
+                        continue
+                    last_position = _latest(last_position, self.position)
+                    yield format_sse('reset', '{}', last_position.as_id())
+                    sent_at = time.monotonic()
+                    continue
+                for event in events:
+                    last_position = _latest(last_position, event.position)
+                    yield format_sse(event.event_type, event.data, event.position.as_id())
+                    sent_at = time.monotonic()
+                if events:
+                    continue
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    await sync_to_async(self.poll)()
+                    if time.monotonic() - sent_at >= heartbeat:
+                        yield f': ping {int(time.time())}\n\n'
+                        sent_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._subscribers.discard(entry)
+                if not self._subscribers:
+                    # Без подписчиков БД не опрашивается; после долгого простоя лента начнется заново
+                    self._idle_since = time.monotonic()
+
+
+def format_sse(event_type: str, data: str, event_id: str) -> str:
+    return f'id: {event_id}\nevent: {event_type}\ndata: {data}\n\n'
+
+
+_broker: Optional[LiveEventBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> LiveEventBroker:
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = LiveEventBroker(settings.LIVE_EVENTS_BUFFER_SIZE, settings.LIVE_EVENTS_POLL_INTERVAL)
+    return _broker
@@ -0,0 +1,60 @@
+"""
+Потоковая проверка загружаемых лог файлов.
+
+Файл не читается в память целиком: Django складывает загрузки больше
+FILE_UPLOAD_MAX_MEMORY_SIZE во временный файл на диске, а здесь содержимое
+проходит через инкрементальный UTF-8 декодер блоками по LOG_SCAN_CHUNK_SIZE.
+Превью берется из первых блоков, символы, строки и SHA-256 (для дедупликации
+в LogBlob) считаются на лету, поэтому расход памяти не зависит от размера файла.
+"""
+import codecs
+import hashlib
+from typing import NamedTuple
+
+LOG_SCAN_CHUNK_SIZE = 64 * 1024
+LOG_PREVIEW_CHARS = 1000
+
+
+class LogScanResult(NamedTuple):
+    chars: int
+    lines: int
+    preview: str  # первые LOG_PREVIEW_CHARS символов, с "..." если файл длиннее
+    sha256: str
+
+
+def scan_log_file(uploaded_file, preview_chars: int = LOG_PREVIEW_CHARS) -> LogScanResult:
+    """
+    Проверяет, что файл - корректный UTF-8, считает символы, строки и SHA-256.
+    При некорректной кодировке выбрасывает UnicodeDecodeError.
+    Указатель файла после проверки возвращается в начало
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')('strict')
+    digest = hashlib.sha256()
+    chars = 0
+    newlines = 0
+    last_char = ''
+    preview = []
+    preview_len = 0
+
+    uploaded_file.seek(0)
+    for block in uploaded_file.chunks(LOG_SCAN_CHUNK_SIZE):
+        digest.update(block)
+        text = decoder.decode(block)
+        if not text:
+            continue
+        chars += len(text)
+        newlines += text.count('\n')
+        last_char = text[-1]
+        if preview_len < preview_chars:
+            part = text[:preview_chars - preview_len]
+            preview.append(part)
+            preview_len += len(part)
+    # Незавершенная многобайтовая последовательность в конце файла
+    decoder.decode(b'', final=True)
+    uploaded_file.seek(0)
+
+    lines = newlines + (1 if chars and last_char != '\n' else 0)
+    preview_text = ''.join(preview)
+    if chars > preview_chars:
+        preview_text += '...'
+    return LogScanResult(chars, lines, preview_text, digest.hexdigest())
@@ -0,0 +1,236 @@
+"""
+Полнотекстовый поиск по содержимому лог файлов (SQLite FTS5).
+
+Индексируется содержимое LogBlob, а не LogFile: одинаковые загрузки
+индексируются один раз. Каждая непустая строка лога - строка виртуальной
+таблицы devices_logline_fts с rowid = blob_id * 2^32 + номер строки, поэтому
+строки одного блоба занимают непрерывный диапазон rowid: удаление блоба из
+индекса - быстрый DELETE по диапазону, а номер строки и блоб вычисляются
+из rowid без дополнительных столбцов. Смещение строки в байтах исходного
+файла хранится в неиндексируемом столбце byte_offset.
+
+Индекс пополняет index_logs (фоновый индексатор): он берет блобы без
+indexed_at и пишет строки пачками в коротких транзакциях. Результаты поиска
+отдаются от новых блобов к старым (ORDER BY rowid DESC) и сопоставляются со
+всеми LogFile, ссылающимися на блоб.
+"""
+import itertools
+import logging
+import time
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .log_storage import iter_log_chunks
+from .models import LogBlob, LogFile
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'devices_logline_fts'
+ROWID_SHIFT = 32
+MAX_LINE_CHARS = 2000  # длиннее - в индекс попадает только начало строки
+INDEX_BATCH_SIZE = 5000
+SEARCH_BATCH_SIZE = 500
+# Если фильтр оставляет не больше стольких блобов, индекс опрашивается по диапазону rowid каждого
+PER_BLOB_SEARCH_MAX = 200
+
+
+class LogSearchHit(NamedTuple):
+    log_file: LogFile
+    line_no: int  # с 1
+    byte_offset: int  # смещение начала строки в исходном файле
+    line: str
+
+
+class LogSearchResult(NamedTuple):
+    hits: List[LogSearchHit]
+    milliseconds: float
+
+
+def fts_available() -> bool:
+    return connection.vendor == 'sqlite'
+
+
+def _blob_rowid_range(blob_id: int) -> Tuple[int, int]:
+    first = blob_id << ROWID_SHIFT
+    return first, first + (1 << ROWID_SHIFT) - 1
+
+
+def iter_lines(blocks: Iterable[bytes]) -> Iterator[Tuple[int, int, bytes]]:
+    """(номер строки, смещение в байтах, строка без перевода строки) по блокам содержимого"""
+    line_no = 0
+    offset = 0
+    tail = b''
+    for block in blocks:
+        data = tail + block
+        start = 0
+        while True:
+            end = data.find(b'\n', start)
+            if end < 0:
+                break
+            line_no += 1
+            yield line_no, offset, data[start:end]
+            offset += end + 1 - start
+            start = end + 1
+        tail = data[start:]
+    if tail:
+        yield line_no + 1, offset, tail
+
+
+def remove_blob(blob_id: int):
+    """Удаляет строки блоба из индекса"""
+    if not fts_available():
+        return
+    first, last = _blob_rowid_range(blob_id)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid BETWEEN %s AND %s', [first, last])
+
+
+def index_blob(blob: LogBlob) -> int:
+    """
+    Индексирует строки блоба (заново, если часть уже была записана прерванным
+    запуском) и отмечает indexed_at. Возвращает число проиндексированных строк.
+
+    Блоб могут удалить, пока он индексируется (удалили последний ссылающийся
+    LogFile): каждая пачка пишется в одной транзакции с проверкой, что строка
+    блоба еще есть, и индексация на этом прекращается, а если блоб исчез после
+    последней пачки, его строки убираются из индекса в конце
+    """
+    remove_blob(blob.pk)
+    base = blob.pk << ROWID_SHIFT
+    indexed = 0
+    batch = []
+
+    def flush() -> bool:
+        with transaction.atomic(), connection.cursor() as cursor:
+            # UPDATE, а не SELECT: запись сразу блокирует БД, и удаление блоба
+            # не вклинится между проверкой и вставкой строк
+            if not LogBlob.objects.filter(pk=blob.pk).update(indexed_at=None):
+                return False
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, line, byte_offset) VALUES (%s, %s, %s)', batch
+            )
+        return True
+
+    for line_no, offset, raw in iter_lines(iter_log_chunks(blob)):
+        line = raw.decode('utf-8', errors='replace').rstrip('\r')
+        if not line.strip():
+            continue
+        batch.append((base + line_no, line[:MAX_LINE_CHARS], offset))
+        if len(batch) >= INDEX_BATCH_SIZE:
+            if not flush():
+                return indexed
+            indexed += len(batch)
+            batch = []
+    if batch:
+        if not flush():
+            return indexed
+        indexed += len(batch)
+
+    if not LogBlob.objects.filter(pk=blob.pk).update(indexed_at=timezone.now()):
+        remove_blob(blob.pk)
+        return 0
+    return indexed
+
+
+def index_pending(limit: Optional[int] = None) -> Tuple[int, int]:
+    """Индексирует блобы, еще не попавшие в индекс. Возвращает (блобов, строк)"""
+    if not fts_available():
+        return 0, 0
+    blobs = LogBlob.objects.filter(indexed_at__isnull=True).order_by('pk')
+    if limit:
+        blobs = blobs[:limit]
+    count = 0
+    lines = 0
+    for blob in blobs:
+        try:
+            lines += index_blob(blob)
+        except (OSError, EOFError) as e:
+            # Файл потерян или поврежден - не задерживаем очередь, блоб помечается
+            # проиндексированным (повторить можно через index_logs --rebuild)
+            logger.warning(f"Не удалось проиндексировать лог {blob.sha256}: {e}")
+            LogBlob.objects.filter(pk=blob.pk).update(indexed_at=timezone.now())
+            continue
+        count += 1
+    return count, lines
+
+
+def match_query(text: str) -> str:
+    """
+    Поисковая строка пользователя в запрос FTS5: каждое слово - фраза в
+    кавычках (точки, двоеточия и прочие символы в словах вроде
+    java.lang.NullPointerException не воспринимаются как синтаксис FTS5),
+    все слова должны встретиться в строке
+    """
+    terms = [term.replace('"', '""') for term in text.split()]
+    return ' '.join(f'"{term}"' for term in terms if term)
+
+
+def _matching_rows(query: str, rowid_range: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[int, int, str]]:
+    """(rowid, byte_offset, line) совпадений от больших rowid к меньшим, пачками"""
+    before = None
+    while True:
+        sql = f'SELECT rowid, byte_offset, line FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        params = [query]
+        if rowid_range is not None:
+            sql += ' AND rowid BETWEEN %s AND %s'
+            params.extend(rowid_range)
+        if before is not None:
+            sql += ' AND rowid < %s'
+            params.append(before)
+        sql += ' ORDER BY rowid DESC LIMIT %s'
+        params.append(SEARCH_BATCH_SIZE)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        yield from rows
+        if len(rows) < SEARCH_BATCH_SIZE:
+            return
+        before = rows[-1][0]
+
+
+def search_logs(text: str, limit: int = 100, devices=None, since=None, until=None,
+                raw: bool = False) -> LogSearchResult:
+    """
+    Строки логов, содержащие все слова text (или запрос FTS5 как есть при raw),
+    от новых загрузок к старым. devices/since/until ограничивают LogFile
+    по устройству и date_created. Если под фильтр попадает немного блобов,
+    индекс опрашивается по диапазонам rowid каждого из них
+    """
+    started = time.monotonic()
+    query = text if raw else match_query(text)
+    hits: List[LogSearchHit] = []
+    if not query or not fts_available():
+        return LogSearchResult(hits, 0.0)
+
+    files = LogFile.objects.filter(blob__isnull=False).select_related('device')
+    filtered = devices is not None or since is not None or until is not None
+    if devices is not None:
+        files = files.filter(device__in=devices)
+    if since is not None:
+        files = files.filter(date_created__gte=since)
+    if until is not None:
+        files = files.filter(date_created__lte=until)
+    allowed_blobs = set(files.values_list('blob_id', flat=True)) if filtered else None
+
+    if allowed_blobs is None:
+        rows = _matching_rows(query)
+    elif len(allowed_blobs) <= PER_BLOB_SEARCH_MAX:
+        rows = itertools.chain.from_iterable(
+            _matching_rows(query, _blob_rowid_range(blob_id)) for blob_id in sorted(allowed_blobs, reverse=True)
+        )
+    else:
+        rows = (row for row in _matching_rows(query) if row[0] >> ROWID_SHIFT in allowed_blobs)
+
+    files_by_blob = {}
+    for rowid, offset, line in rows:
+        blob_id = rowid >> ROWID_SHIFT
+        if blob_id not in files_by_blob:
+            files_by_blob[blob_id] = list(files.filter(blob_id=blob_id).order_by('-date_created'))
+        for log_file in files_by_blob[blob_id]:
+            hits.append(LogSearchHit(log_file, rowid & ((1 << ROWID_SHIFT) - 1), offset, line))
+        if len(hits) >= limit:
+            break
+
+    return LogSearchResult(hits[:limit], (time.monotonic() - started) * 1000)
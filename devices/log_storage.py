@@ -0,0 +1,278 @@
+"""
+Хранение лог файлов: сжатие и дедупликация по содержимому.
+
+Содержимое загрузки хранится в LogBlob, адресуемом SHA-256 исходных байт,
+в файле logs/blobs/<ab>/<cd>/<sha256>[.gz|.zst] (первые два байта хэша -
+два уровня каталогов, чтобы в одном каталоге не копились тысячи файлов).
+Повторная загрузка тех же байт (телефон повторил отправку после обрыва)
+стоит только хэша и вставки LogFile: ref_count блоба увеличивается, файл
+не пишется. Блоб удаляется, когда удалена последняя ссылающаяся на него
+запись LogFile. Его файл при этом остается на месте и удаляется позже
+сверкой reconcile_blobs (reconcile_log_blobs по таймеру), если за
+ORPHAN_FILE_MIN_AGE так и не появился блоб с этим содержимым: удалять файл
+сразу нельзя, его мог уже перезаписать параллельный запрос, загружающий
+те же байты, чей блоб еще не зафиксирован.
+
+Логи Android хорошо сжимаются (в 10-20 раз), поэтому файл блоба пишется
+уже сжатым: zstd, если установлен пакет zstandard, иначе gzip (настройка
+LOG_COMPRESSION). Сжатие и распаковка идут потоково блоками. LogFile.file
+указывает на файл блоба, кодек и размеры копируются в LogFile; записи без
+блоба - загруженные до перехода на LogBlob (store_log_blobs переносит их).
+
+Читать содержимое лога следует через open_log() / iter_log_chunks(): они
+возвращают исходные байты независимо от способа хранения.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterable, Iterator
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import LogBlob, LogFile
+
+try:
+    import zstandard
+except ImportError:  # zstd необязателен, без него используется gzip
+    zstandard = None
+
+LOG_IO_CHUNK_SIZE = 64 * 1024
+BLOB_DIR = 'logs/blobs'
+
+# Файлы без блоба моложе этого возраста (по mtime) не удаляются при сверке: их могла только что
+# записать загрузка, чья транзакция еще не зафиксирована
+ORPHAN_FILE_MIN_AGE = 3600  # секунды
+
+EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def get_codec() -> str:
+    """Кодек для новых файлов: '' (без сжатия), 'gzip' или 'zstd'"""
+    codec = settings.LOG_COMPRESSION
+    if codec == 'none':
+        return ''
+    if codec == 'auto':
+        return 'zstd' if zstandard is not None else 'gzip'
+    if codec == 'zstd' and zstandard is None:
+        raise RuntimeError('LOG_COMPRESSION=zstd, но пакет zstandard не установлен')
+    return codec
+
+
+def _compressing_writer(codec: str, fh: BinaryIO):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=settings.LOG_ZSTD_LEVEL).stream_writer(fh, closefd=False)
+    return gzip.GzipFile(fileobj=fh, mode='wb', compresslevel=6)
+
+
+def _storage():
+    return LogBlob._meta.get_field('file').storage
+
+
+def blob_name(sha256: str, codec: str) -> str:
+    """Имя файла блоба в хранилище: logs/blobs/ab/cd/<sha256><расширение кодека>"""
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}{EXTENSIONS.get(codec, '')}"
+
+
+def _write_blob_file(name: str, blocks: Iterable[bytes], codec: str) -> int:
+    """
+    Записывает (сжимая) содержимое в файл блоба через временный файл и
+    os.replace. Имя определяется содержимым, поэтому перезапись файла,
+    оставшегося от оборванной загрузки, безопасна. Возвращает исходный размер
+    """
+    path = _storage().path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    original_size = 0
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            if codec:
+                with _compressing_writer(codec, fh) as writer:
+                    for block in blocks:
+                        writer.write(block)
+                        original_size += len(block)
+            else:
+                for block in blocks:
+                    fh.write(block)
+                    original_size += len(block)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return original_size
+
+
+def _acquire(sha256: str):
+    """Добавляет ссылку на существующий блоб; None, если такого содержимого еще нет"""
+    if LogBlob.objects.filter(sha256=sha256).update(ref_count=F('ref_count') + 1):
+        return LogBlob.objects.get(sha256=sha256)
+    return None
+
+
+def store_blob(sha256: str, blocks: Iterable[bytes], codec: str = None) -> LogBlob:
+    """
+    Возвращает блоб с содержимым blocks (SHA-256 которого sha256), добавив
+    на него ссылку. Если такое содержимое уже хранится, blocks не читаются
+    """
+    blob = _acquire(sha256)
+    if blob is not None:
+        return blob
+
+    codec = get_codec() if codec is None else codec
+    name = blob_name(sha256, codec)
+    original_size = _write_blob_file(name, blocks, codec)
+    try:
+        with transaction.atomic():
+            return LogBlob.objects.create(
+                sha256=sha256, file=name, compression=codec,
+                original_size=original_size, stored_size=_storage().size(name), ref_count=1,
+            )
+    except IntegrityError:
+        # Те же байты одновременно загрузил другой запрос - ссылаемся на его блоб
+        blob = _acquire(sha256)
+        if blob is None:
+            raise
+        return blob
+
+
+def attach_blob(log_file: LogFile, blob: LogBlob):
+    """Заполняет у LogFile ссылку на блоб, файл, кодек и размеры"""
+    log_file.blob = blob
+    log_file.file.name = blob.file.name
+    log_file.compression = blob.compression
+    log_file.original_size = blob.original_size
+    log_file.stored_size = blob.stored_size
+
+
+def release_blob(blob_id):
+    """
+    Убирает ссылку на блоб (после удаления LogFile). Последняя ссылка
+    удаляет блоб; файл удалит reconcile_blobs
+    """
+    LogBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') - 1)
+    blob = LogBlob.objects.filter(pk=blob_id, ref_count__lte=0).first()
+    if blob is None or LogFile.objects.filter(blob_id=blob_id).exists():
+        return
+    blob.delete()
+
+
+def original_name(log_file) -> str:
+    """Исходное имя загруженного файла"""
+    if log_file.original_name:
+        return log_file.original_name
+    name = os.path.basename(log_file.file.name)
+    suffix = EXTENSIONS.get(log_file.compression)
+    if suffix and name.endswith(suffix):
+        name = name[:-len(suffix)]
+    return name
+
+
+@contextmanager
+def open_log(log_file) -> Iterator[BinaryIO]:
+    """Открывает лог для чтения исходных (распакованных) байт: with open_log(log_file) as reader"""
+    if log_file.compression == 'zstd' and zstandard is None:
+        raise RuntimeError('Лог сжат zstd, но пакет zstandard не установлен')
+    with log_file.file.open('rb') as fh:
+        if log_file.compression == 'gzip':
+            with gzip.GzipFile(fileobj=fh, mode='rb') as reader:
+                yield reader
+        elif log_file.compression == 'zstd':
+            with zstandard.ZstdDecompressor().stream_reader(fh, closefd=False) as reader:
+                yield reader
+        else:
+            yield fh
+
+
+def iter_log_chunks(log_file, chunk_size: int = LOG_IO_CHUNK_SIZE) -> Iterator[bytes]:
+    """Потоково отдает исходное содержимое лога блоками"""
+    with open_log(log_file) as reader:
+        while True:
+            block = reader.read(chunk_size)
+            if not block:
+                break
+            yield block
+
+
+def store_existing_log(log_file: LogFile, codec: str = None) -> bool:
+    """
+    Переносит содержимое лога, сохраненного до перехода на LogBlob, в блоб
+    (со сжатием и дедупликацией). Запись обновляется, только если ее не
+    изменили параллельно; старый файл удаляется после фиксации.
+    Возвращает True, если лог перенесен
+    """
+    if log_file.blob_id or not log_file.file:
+        return False
+
+    digest = hashlib.sha256()
+    for block in iter_log_chunks(log_file):
+        digest.update(block)
+    old_name = log_file.file.name
+    old_file = log_file.file
+
+    with transaction.atomic():
+        blob = store_blob(digest.hexdigest(), iter_log_chunks(log_file), codec)
+        updated = LogFile.objects.filter(pk=log_file.pk, blob__isnull=True, file=old_name).update(
+            blob=blob,
+            file=blob.file.name,
+            compression=blob.compression,
+            original_size=blob.original_size,
+            stored_size=blob.stored_size,
+            original_name=original_name(log_file),
+        )
+        if not updated:
+            release_blob(blob.pk)
+            return False
+        if old_name != blob.file.name:
+            transaction.on_commit(lambda: old_file.delete(save=False))
+    attach_blob(log_file, blob)
+    return True
+
+
+def reconcile_blobs() -> Dict[str, int]:
+    """
+    Сверяет блобы с записями LogFile: пересчитывает ref_count, удаляет блобы
+    без ссылок и файлы в logs/blobs/, которым не соответствует ни один блоб
+    (файлы удаленных блобов и загрузок, чья транзакция не была зафиксирована)
+    старше ORPHAN_FILE_MIN_AGE
+    """
+    result = {'fixed': 0, 'deleted_blobs': 0, 'orphan_files': 0}
+
+    actual = dict(
+        LogFile.objects.filter(blob__isnull=False).order_by()
+        .values_list('blob_id').annotate(count=Count('pk'))
+    )
+    for blob in LogBlob.objects.all().iterator():
+        count = actual.get(blob.pk, 0)
+        if count == 0:
+            with transaction.atomic():
+                if not LogFile.objects.filter(blob_id=blob.pk).exists():
+                    blob.delete()
+                    result['deleted_blobs'] += 1
+        elif blob.ref_count != count:
+            LogBlob.objects.filter(pk=blob.pk).update(ref_count=count)
+            result['fixed'] += 1
+
+    storage = _storage()
+    root = storage.path('')
+    known = set(LogBlob.objects.values_list('file', flat=True))
+    min_mtime = time.time() - ORPHAN_FILE_MIN_AGE
+    for dirpath, _dirnames, filenames in os.walk(storage.path(BLOB_DIR)):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            if name in known or os.path.getmtime(path) >= min_mtime:
+                continue
+            # Блоб мог появиться, пока шел обход; свежий mtime - файл только что перезаписан загрузкой
+            if LogBlob.objects.filter(file=name).exists() or os.path.getmtime(path) >= min_mtime:
+                continue
+            os.remove(path)
+            result['orphan_files'] += 1
+    return result
@@ -0,0 +1,42 @@
+"""
+Management команда - перенос старых диагностических событий в архив
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from devices.diagnostics_archive import archive_events
+
+
+class Command(BaseCommand):
+    help = 'Переносит диагностические события старше N дней в сжатые NDJSON-сегменты DIAGNOSTICS_ARCHIVE_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.DIAGNOSTICS_ARCHIVE_AFTER_DAYS,
+            help=f'Архивировать события старше N дней (по умолчанию: {settings.DIAGNOSTICS_ARCHIVE_AFTER_DAYS})',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Событий в одной пачке (по умолчанию: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options['days'])
+        self.stdout.write(f'Архивация диагностических событий старше {older_than.strftime("%d.%m.%Y %H:%M")}...')
+
+        def progress(events, segments):
+            self.stdout.write(f'  в архиве {events} событий, {segments} сегментов')
+
+        result = archive_events(older_than, chunk_size=options['chunk_size'], progress=progress)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено событий: {result.events} в {result.segments} сегментов '
+            f'({result.size_bytes / 1024:.1f} КБ) за {result.seconds:.1f} с'
+        ))
@@ -0,0 +1,135 @@
+"""
+Management команда - сравнение скорости валидации пакета диагностических событий
+"""
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from devices.diagnostics_validator import validate_events
+from devices.serializers import DiagnosticEventSerializer
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает валидацию событий через DiagnosticEventSerializer и через diagnostics_validator'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=500,
+            help='Количество событий в пакете (по умолчанию: 500)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Сколько раз прогнать пакет (по умолчанию: 20)',
+        )
+        parser.add_argument(
+            '--invalid-ratio',
+            type=float,
+            default=0.1,
+            help='Доля невалидных событий в пакете (по умолчанию: 0.1)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+        repeat = options['repeat']
+        rng = random.Random(42)
+        events = [self._make_event(rng, i, rng.random() < options['invalid_ratio']) for i in range(count)]
+
+        serializer_result = self._serializer_path(events)
+        validator_result = validate_events(events)
+        if serializer_result != validator_result:
+            self.stdout.write(self.style.ERROR('Результаты валидации различаются!'))
+            for old, new in zip(serializer_result[1], validator_result[1]):
+                if old != new:
+                    self.stdout.write(f'  сериализатор: {old}')
+                    self.stdout.write(f'  валидатор:    {new}')
+                    break
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты совпадают: {len(validator_result[0])} валидных, {len(validator_result[1])} с ошибками'
+        ))
+
+        for name, func in (('DiagnosticEventSerializer', self._serializer_path), ('diagnostics_validator', validate_events)):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                func(events)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{name:<28} {count * repeat / elapsed:>10.0f} событий/с '
+                f'({elapsed / repeat * 1000:.1f} мс на пакет из {count})'
+            )
+
+    def _serializer_path(self, events):
+        """Прежний путь: отдельный сериализатор на каждое событие"""
+        valid = []
+        errors = []
+        for idx, event_data in enumerate(events):
+            if not isinstance(event_data, dict):
+                errors.append({'index': idx, 'eventId': 'unknown', 'error': 'Событие должно быть объектом'})
+                continue
+            serializer = DiagnosticEventSerializer(data=event_data)
+            if not serializer.is_valid():
+                errors.append({'index': idx, 'eventId': event_data.get('eventId', 'unknown'), 'errors': serializer.errors})
+                continue
+            data = serializer.validated_data
+            values = {
+                'event_id': data['eventId'],
+                'timestamp': data.get('timestamp'),
+                'event_code': data['eventCode'],
+                'event_severity': data['eventSeverity'],
+                'component': data['component'],
+                'context': data.get('context', {}),
+            }
+            for source, target in (('pipelineStage', 'pipeline_stage'), ('thread', 'thread'), ('attempt', 'attempt'),
+                                   ('flowId', 'flow_id'), ('state', 'state_snapshot'), ('metrics', 'metrics_snapshot')):
+                if source in data:
+                    values[target] = data[source]
+            if 'timestamp' not in data:
+                del values['timestamp']
+            valid.append((idx, values))
+        return valid, errors
+
+    def _make_event(self, rng, i, invalid):
+        event = {
+            'eventId': str(uuid.UUID(int=rng.getrandbits(128))),
+            'deviceId': str(uuid.UUID(int=rng.getrandbits(128))),
+            'timestamp': 1700000000000 + i * 1000,
+            'eventCode': rng.choice(['NOTIF_RECEIVED', 'WORKER_RETRY', 'NETWORK_ERROR', 'APP_START']),
+            'eventSeverity': rng.choice(['INFO', 'WARNING', 'ERROR', 'CRITICAL']),
+            'component': rng.choice(['APP', 'NOTIF_SERVICE', 'WORKER', 'NETWORK', 'SYSTEM']),
+            'pipelineStage': rng.choice(['RECEIVE', 'STORE', 'QUEUE', 'SEND', 'UPLOAD', None]),
+            'context': {'package': 'com.example.bank', 'queue_size': rng.randint(0, 50)},
+            'thread': rng.choice(['main', 'worker-1', None]),
+            'attempt': rng.randint(1, 5),
+            'flowId': str(uuid.UUID(int=rng.getrandbits(128))),
+            'state': {'battery': rng.randint(0, 100), 'charging': rng.random() < 0.5},
+            'metrics': {'ram_mb': rng.randint(100, 800), 'cpu': round(rng.random(), 2)},
+        }
+        for key in ('pipelineStage', 'thread', 'state', 'metrics', 'timestamp'):
+            if rng.random() < 0.3:
+                del event[key]
+
+        if invalid:
+            broken = rng.choice([
+                ('eventSeverity', 'DEBUG'),
+                ('component', None),
+                ('timestamp', 'вчера'),
+                ('attempt', '2.5'),
+                ('context', ['not', 'a', 'dict']),
+                ('deviceId', 'not-a-uuid'),
+                ('eventCode', '   '),
+                ('eventId', None),
+                ('eventCode', None),
+            ])
+            if broken[1] is None and broken[0] != 'component':
+                del event[broken[0]]
+            else:
+                event[broken[0]] = broken[1]
+            if rng.random() < 0.2:
+                return ['не объект']
+        return event
@@ -0,0 +1,99 @@
+"""
+Management команда - сравнение скорости классификации текста уведомлений
+"""
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from devices.text_classifier import BANKING_PATTERNS, SYSTEM_PATTERNS
+
+
+SMS_TEMPLATES = [
+    'Сбербанк: Покупка {amount}р ПЯТЁРОЧКА Баланс: {balance}р',
+    'VTB: Списание {amount} RUB. Карта *{card}. Баланс: {balance} RUB',
+    'Тинькофф: Пополнение на {amount} ₽. Доступно {balance} ₽',
+    'Никому не сообщайте код {code}. Вход в Альфа-Онлайн',
+    'Код: {code}. Никому не сообщайте его',
+    'Polzovatel {card} voshel v Sberbank Onlajn',
+    'Снятие наличных {amount}р ATM {card}. Баланс: {balance}р',
+    'Уважаемый Клиент! Ваш платеж на {amount} руб. исполнен. С заботой о Вас, Газпромбанк',
+    'Вам было отправлено СМС с кодом подтверждения',
+    'МТС: Баланс {balance} руб. Пополните счет',
+    'Download completed',
+    'This service is running in the foreground',
+    'Осталось: {percent} %',
+    'Нажмите, чтобы настроить',
+    'No Content',
+    'System update available',
+    'Привет! Во сколько встречаемся?',
+    'Ваш заказ №{code} передан в доставку',
+    'Напоминаем о записи к врачу завтра в {hour}:00',
+    'Скидка {percent}% на все товары только сегодня',
+    'Мама: перезвони, как освободишься',
+]
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает поиск паттернов по одному regex за раз и объединенным PatternSet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=10000,
+            help='Количество сообщений в корпусе (по умолчанию: 10000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Сколько раз прогнать корпус (по умолчанию: 5)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+        repeat = options['repeat']
+        rng = random.Random(42)
+        corpus = [self._make_sms(rng) for _ in range(count)]
+
+        for name, pattern_set in (('Системные', SYSTEM_PATTERNS), ('Банковские', BANKING_PATTERNS)):
+            legacy = [self._legacy_search(pattern_set.patterns, text) for text in corpus]
+            combined = [text in pattern_set for text in corpus]
+            if legacy != combined:
+                mismatch = next(text for text, old, new in zip(corpus, legacy, combined) if old != new)
+                self.stdout.write(self.style.ERROR(f'{name}: результаты различаются на "{mismatch}"'))
+                return
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{name} паттерны ({len(pattern_set)} шт.): совпадений {sum(combined)} из {count}'
+            ))
+            legacy_time = self._measure(lambda: [self._legacy_search(pattern_set.patterns, text) for text in corpus], repeat)
+            combined_time = self._measure(lambda: [text in pattern_set for text in corpus], repeat)
+            self.stdout.write(f'  по одному re.search:  {count / legacy_time:>10.0f} сообщений/с')
+            self.stdout.write(f'  PatternSet:           {count / combined_time:>10.0f} сообщений/с '
+                              f'(x{legacy_time / combined_time:.1f})')
+
+    def _legacy_search(self, patterns, text):
+        """Прежний способ: отдельный re.search для каждого паттерна"""
+        for pattern in patterns:
+            if re.search(pattern, text, re.IGNORECASE):
+                return True
+        return False
+
+    def _measure(self, func, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - started) / repeat
+
+    def _make_sms(self, rng):
+        return rng.choice(SMS_TEMPLATES).format(
+            amount=rng.randint(50, 50000),
+            balance=rng.randint(0, 500000),
+            card=rng.randint(1000, 9999),
+            code=rng.randint(100000, 999999),
+            percent=rng.randint(1, 99),
+            hour=rng.randint(8, 20),
+        )
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from devices.models import Message
+from devices.retention import delete_in_chunks
 
 
 class Command(BaseCommand):
@@ -31,9 +32,9 @@ class Command(BaseCommand):
 
         self.stdout.write(f'Найдено {total_messages} сообщений для удаления...')
         
-        # Удаляем все сообщения
-        Message.objects.all().delete()
+        # Удаляем пачками, чтобы не держать блокировку БД на все время удаления
+        result = delete_in_chunks(Message.objects.all())
         
         self.stdout.write(
-            self.style.SUCCESS(f'Удалено {total_messages} сообщений')
+            self.style.SUCCESS(f'Удалено {result.deleted} сообщений за {result.seconds:.1f} с')
         )
@@ -0,0 +1,78 @@
+"""
+Management команда - фоновый индексатор содержимого логов для полнотекстового поиска
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from devices.log_search import FTS_TABLE, fts_available, index_pending
+from devices.models import LogBlob
+
+
+class Command(BaseCommand):
+    help = 'Добавляет строки новых лог файлов (LogBlob без indexed_at) в полнотекстовый индекс FTS5'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Пауза между проверками новых логов в секундах (по умолчанию: 5)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Максимум блобов за один проход (по умолчанию: 20)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Проиндексировать все ожидающие логи и выйти',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Очистить индекс и проиндексировать все логи заново',
+        )
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError('Полнотекстовый индекс логов поддерживается только для SQLite (FTS5)')
+
+        batch_size = options['batch_size']
+        if options['rebuild']:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DELETE FROM {FTS_TABLE}')
+                LogBlob.objects.update(indexed_at=None)
+            self.stdout.write('Индекс очищен')
+
+        self.stdout.write('Индексатор логов запущен')
+
+        while True:
+            try:
+                started = time.monotonic()
+                blobs, lines = index_pending(limit=batch_size)
+                if blobs:
+                    self.stdout.write(
+                        f'Проиндексировано логов: {blobs}, строк: {lines} за {time.monotonic() - started:.1f} с'
+                    )
+            except KeyboardInterrupt:
+                self.stdout.write('Индексатор остановлен')
+                return
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Ошибка индексации: {e}'))
+                blobs = 0
+
+            # Если обработали полный пакет - сразу берем следующий
+            if blobs >= batch_size:
+                continue
+            if options['once']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                self.stdout.write('Индексатор остановлен')
+                return
@@ -0,0 +1,99 @@
+"""
+Management команда - очистка старых данных по политикам хранения
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from devices.retention import apply_policy, get_policies
+
+
+class Command(BaseCommand):
+    help = 'Удаляет устаревшие сообщения, диагностические события, отчеты о батарее и логи по политикам RETENTION_*'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            action='append',
+            choices=sorted(get_policies()),
+            help='Очистить только эту модель (можно указать несколько раз)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Переопределить возраст хранения в днях для выбранных моделей',
+        )
+        parser.add_argument(
+            '--max-per-device',
+            type=int,
+            help='Переопределить число хранимых записей на устройство для выбранных моделей',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Записей в одной транзакции удаления (по умолчанию: 1000)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Пауза между пачками в секундах, чтобы не мешать другим запросам (по умолчанию: 0)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать, сколько записей будет удалено',
+        )
+
+    def handle(self, *args, **options):
+        policies = get_policies()
+        names = options['model'] or sorted(policies)
+        if (options['days'] is not None or options['max_per_device'] is not None) and not options['model']:
+            raise CommandError('--days и --max-per-device требуют явного --model')
+
+        total = 0
+        started = time.monotonic()
+
+        for name in names:
+            policy = policies[name]
+            if options['days'] is not None:
+                policy = policy._replace(max_age_days=options['days'])
+            if options['max_per_device'] is not None:
+                policy = policy._replace(max_per_device=options['max_per_device'])
+
+            if not policy.max_age_days and not policy.max_per_device:
+                self.stdout.write(f'{name}: политика не задана, пропускаем')
+                continue
+
+            limits = []
+            if policy.max_age_days:
+                limits.append(f'старше {policy.max_age_days} дн.')
+            if policy.max_per_device:
+                limits.append(f'сверх {policy.max_per_device} на устройство')
+            self.stdout.write(f'{name}: удаление записей {", ".join(limits)}...')
+
+            def progress(chunk_deleted, deleted, elapsed, name=name):
+                rate = deleted / elapsed if elapsed else 0
+                self.stdout.write(f'  {name}: удалено {deleted} ({rate:.0f} записей/с)')
+
+            result = apply_policy(
+                policy,
+                chunk_size=options['chunk_size'],
+                progress=progress,
+                pause=options['pause'],
+                dry_run=options['dry_run'],
+            )
+            total += result.deleted
+
+            if options['dry_run']:
+                self.stdout.write(f'{name}: будет удалено {result.deleted}')
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{name}: удалено {result.deleted} за {result.seconds:.1f} с '
+                    f'({result.chunks} пачек, {result.rate:.0f} записей/с)'
+                ))
+
+        elapsed = time.monotonic() - started
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{verb} всего: {total} за {elapsed:.1f} с'))
@@ -0,0 +1,91 @@
+"""
+Management команда - выборка диагностических событий из таблицы и архива
+"""
+import json
+import uuid
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from devices.diagnostics_archive import ARCHIVED_FIELDS, iter_archived_events
+from devices.models import Device, DiagnosticEvent
+
+
+def _parse_ms(value):
+    """Принимает UNIX ms или дату в ISO формате"""
+    if value is None:
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+    except ValueError:
+        raise CommandError(f'Некорректное время: {value}')
+
+
+class Command(BaseCommand):
+    help = 'Выводит диагностические события (основная таблица и архив) в формате NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--device', action='append', help='Токен или имя устройства (можно указать несколько раз)')
+        parser.add_argument('--since', help='Начало периода: UNIX ms или ISO дата (2024-01-31T12:00)')
+        parser.add_argument('--until', help='Конец периода: UNIX ms или ISO дата')
+        parser.add_argument(
+            '--severity',
+            action='append',
+            choices=[choice for choice, _ in DiagnosticEvent.SEVERITY_CHOICES],
+            help='Уровень серьезности (можно указать несколько раз)',
+        )
+        parser.add_argument(
+            '--source',
+            choices=['all', 'table', 'archive'],
+            default='all',
+            help='Откуда читать события (по умолчанию: all)',
+        )
+
+    def handle(self, *args, **options):
+        devices = None
+        if options['device']:
+            devices = []
+            for value in options['device']:
+                try:
+                    device = Device.objects.filter(token=uuid.UUID(value)).first()
+                except ValueError:
+                    device = Device.objects.filter(name=value).first()
+                if device is None:
+                    raise CommandError(f'Устройство не найдено: {value}')
+                devices.append(device)
+
+        start_ms = _parse_ms(options['since'])
+        end_ms = _parse_ms(options['until'])
+        severities = options['severity']
+
+        count = 0
+        if options['source'] in ('all', 'archive'):
+            for event in iter_archived_events(devices=devices, start_ms=start_ms, end_ms=end_ms, severities=severities):
+                self._write(event, archived=True)
+                count += 1
+
+        if options['source'] in ('all', 'table'):
+            events = DiagnosticEvent.objects.select_related('device').order_by('device_id', 'timestamp')
+            if devices is not None:
+                events = events.filter(device__in=devices)
+            if start_ms is not None:
+                events = events.filter(timestamp__gte=start_ms)
+            if end_ms is not None:
+                events = events.filter(timestamp__lte=end_ms)
+            if severities:
+                events = events.filter(event_severity__in=severities)
+            for event in events.iterator(chunk_size=2000):
+                self._write(event, archived=False)
+                count += 1
+
+        self.stderr.write(f'Событий: {count}')
+
+    def _write(self, event, archived):
+        record = {field: getattr(event, field) for field in ARCHIVED_FIELDS}
+        record['device'] = event.device.name
+        record['device_token'] = str(event.device.token)
+        record['created_at'] = event.created_at.isoformat()
+        record['archived'] = archived
+        self.stdout.write(json.dumps(record, ensure_ascii=False))
@@ -0,0 +1,16 @@
+"""
+Management команда - сверка счетчиков панели управления с таблицами
+"""
+from django.core.management.base import BaseCommand
+
+from devices.dashboard_stats import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики панели управления (DashboardCounter) по таблицам и удаляет устаревшие корзины'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_counters()
+        for metric, rows in sorted(fixed.items()):
+            self.stdout.write(f'{metric}: исправлено строк {rows}')
+        self.stdout.write(self.style.SUCCESS('Счетчики сверены'))
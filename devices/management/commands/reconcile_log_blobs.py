@@ -0,0 +1,17 @@
+"""
+Management команда - сверка хранилища содержимого логов (LogBlob) с записями LogFile
+"""
+from django.core.management.base import BaseCommand
+
+from devices.log_storage import reconcile_blobs
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает ссылки LogBlob, удаляет блобы без ссылок и файлы logs/blobs/ без блоба'
+
+    def handle(self, *args, **options):
+        result = reconcile_blobs()
+        self.stdout.write(f"Исправлено счетчиков ссылок: {result['fixed']}")
+        self.stdout.write(f"Удалено блобов без ссылок: {result['deleted_blobs']}")
+        self.stdout.write(f"Удалено файлов без блоба: {result['orphan_files']}")
+        self.stdout.write(self.style.SUCCESS('Хранилище логов сверено'))
@@ -0,0 +1,41 @@
+"""
+Management команда для свертки старых отчетов о батарее в почасовые сводки
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from devices.battery_history import rollup_battery_reports
+
+
+class Command(BaseCommand):
+    help = 'Сворачивает интервалы BatteryReport старше срока хранения в почасовые сводки BatteryReportHourly'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=settings.BATTERY_REPORT_RAW_RETENTION_DAYS,
+            help=f'Сколько дней хранить сырые интервалы (по умолчанию: {settings.BATTERY_REPORT_RAW_RETENTION_DAYS})',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Строк за одну транзакцию (по умолчанию: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options['keep_days'])
+        self.stdout.write(f'Свертка отчетов о батарее старше {older_than.strftime("%d.%m.%Y %H:%M")}...')
+
+        started = time.monotonic()
+        processed = rollup_battery_reports(older_than, chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Свернуто интервалов: {processed} за {elapsed:.1f} с'
+        ))
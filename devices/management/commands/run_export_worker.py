@@ -0,0 +1,71 @@
+"""
+Management команда - воркер фоновых экспортов диагностики
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from devices.export_jobs import delete_expired_jobs, process_next_job, release_stale_jobs
+
+
+class Command(BaseCommand):
+    help = 'Формирует файлы фоновых экспортов диагностических событий (ExportJob)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Пауза между проверками очереди в секундах (по умолчанию: 2)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить все задачи из очереди и выйти',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        self.stdout.write('Воркер экспортов запущен')
+
+        while True:
+            try:
+                released = release_stale_jobs()
+                if released:
+                    self.stdout.write(self.style.WARNING(f'Возвращено в очередь зависших экспортов: {released}'))
+
+                deleted = delete_expired_jobs()
+                if deleted:
+                    self.stdout.write(f'Удалено устаревших экспортов: {deleted}')
+
+                job = process_next_job()
+                if job is not None:
+                    self._write_result(job)
+            except KeyboardInterrupt:
+                self.stdout.write('Воркер остановлен')
+                return
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Ошибка обработки очереди: {e}'))
+                job = None
+
+            # Пока в очереди есть задачи - берем следующую сразу
+            if job is not None:
+                continue
+            if options['once']:
+                return
+            try:
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                self.stdout.write('Воркер остановлен')
+                return
+
+    def _write_result(self, job):
+        seconds = (job.finished_at - job.started_at).total_seconds() if job.started_at else 0
+        if job.status == 'done':
+            self.stdout.write(self.style.SUCCESS(
+                f'Экспорт {job.pk} ({job.get_kind_display()}): {job.total} событий, '
+                f'{job.size_bytes / 1024 / 1024:.1f} МБ за {seconds:.1f} с'
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(f'Экспорт {job.pk} ({job.get_kind_display()}) не удался: {job.error}'))
@@ -0,0 +1,91 @@
+"""
+Management команда - воркер очереди уведомлений в Telegram
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from devices.notifications import outbox_metrics, process_outbox, release_stale_outbox
+
+
+class Command(BaseCommand):
+    help = 'Отправляет уведомления из очереди NotificationOutbox в Telegram'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Пауза между проверками очереди в секундах (по умолчанию: 1)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Максимум уведомлений за один проход (по умолчанию: 50)',
+        )
+        parser.add_argument(
+            '--stats-interval',
+            type=float,
+            default=60.0,
+            help='Как часто выводить метрики очереди и лимитера в секундах, 0 - не выводить (по умолчанию: 60)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь один раз и выйти',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        batch_size = options['batch_size']
+        stats_interval = options['stats_interval']
+        last_stats = time.monotonic()
+
+        self.stdout.write('Воркер уведомлений запущен')
+
+        while True:
+            try:
+                released = release_stale_outbox()
+                if released:
+                    self.stdout.write(self.style.WARNING(f'Возвращено в очередь зависших уведомлений: {released}'))
+
+                processed = process_outbox(batch_size=batch_size)
+                if processed:
+                    self.stdout.write(f'Обработано уведомлений: {processed}')
+            except KeyboardInterrupt:
+                self.stdout.write('Воркер остановлен')
+                return
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Ошибка обработки очереди: {e}'))
+                processed = 0
+
+            if stats_interval and time.monotonic() - last_stats >= stats_interval:
+                last_stats = time.monotonic()
+                self._write_stats()
+
+            if options['once']:
+                return
+
+            # Если обработали полный пакет - сразу берем следующий
+            if processed < batch_size:
+                try:
+                    time.sleep(interval)
+                except KeyboardInterrupt:
+                    self.stdout.write('Воркер остановлен')
+                    return
+
+    def _write_stats(self):
+        try:
+            metrics = outbox_metrics()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Не удалось получить метрики: {e}'))
+            return
+        limiter = metrics['limiter']
+        self.stdout.write(
+            f"Очередь: {metrics['pending']} ожидают (старейшее {metrics['oldest_pending_seconds']} с), "
+            f"{metrics['dead']} не доставлено | "
+            f"Лимитер: ждут {limiter['waiting']} (макс. {limiter['max_waiting']}), "
+            f"отправлено {limiter['acquired']}, перенесено {limiter['throttled']}, 429: {limiter['rate_limited']}, "
+            f"задержка ср. {limiter['avg_delay_ms']} мс / макс. {limiter['max_delay_ms']} мс"
+        )
@@ -0,0 +1,93 @@
+"""
+Management команда - полнотекстовый поиск по содержимому лог файлов
+"""
+import uuid
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+from django.utils import timezone
+
+from devices.log_search import fts_available, search_logs
+from devices.log_storage import original_name
+from devices.models import Device, LogBlob
+
+
+def _parse_datetime(value):
+    """Дата или дата-время в ISO формате (2024-01-31 или 2024-01-31T12:00)"""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Некорректная дата: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Ищет строки в лог файлах по полнотекстовому индексу (сначала новые загрузки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('query', nargs='+', help='Слова для поиска; строка должна содержать все слова')
+        parser.add_argument('--device', action='append', help='Токен или имя устройства (можно указать несколько раз)')
+        parser.add_argument('--since', help='Логи, созданные не раньше: ISO дата (2024-01-31 или 2024-01-31T12:00)')
+        parser.add_argument('--until', help='Логи, созданные не позже: ISO дата')
+        parser.add_argument('--today', action='store_true', help='Только логи за сегодня')
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='Максимум найденных строк (по умолчанию: 100)',
+        )
+        parser.add_argument(
+            '--raw',
+            action='store_true',
+            help='Передать запрос в FTS5 как есть (AND/OR/NOT, "фразы", префиксы*)',
+        )
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError('Полнотекстовый индекс логов поддерживается только для SQLite (FTS5)')
+
+        devices = None
+        if options['device']:
+            devices = []
+            for value in options['device']:
+                try:
+                    device = Device.objects.filter(token=uuid.UUID(value)).first()
+                except ValueError:
+                    device = Device.objects.filter(name=value).first()
+                if device is None:
+                    raise CommandError(f'Устройство не найдено: {value}')
+                devices.append(device)
+
+        since = _parse_datetime(options['since'])
+        if options['today']:
+            since = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        try:
+            result = search_logs(
+                ' '.join(options['query']),
+                limit=options['limit'],
+                devices=devices,
+                since=since,
+                until=_parse_datetime(options['until']),
+                raw=options['raw'],
+            )
+        except OperationalError as e:
+            raise CommandError(f'Некорректный запрос: {e}')
+
+        for hit in result.hits:
+            log_file = hit.log_file
+            self.stdout.write(
+                f"{log_file.device.name} | {original_name(log_file)} | "
+                f"{timezone.localtime(log_file.date_created).strftime('%d.%m.%Y %H:%M:%S')} | "
+                f"строка {hit.line_no}, смещение {hit.byte_offset}: {hit.line}"
+            )
+
+        pending = LogBlob.objects.filter(indexed_at__isnull=True).count()
+        self.stdout.write(self.style.SUCCESS(f'Найдено строк: {len(result.hits)} за {result.milliseconds:.1f} мс'))
+        if pending:
+            self.stdout.write(self.style.WARNING(f'Еще не проиндексировано логов: {pending} (index_logs)'))
@@ -0,0 +1,46 @@
+"""
+Management команда - перенос лог файлов, сохраненных до LogBlob, в хранилище по содержимому
+"""
+from django.core.management.base import BaseCommand
+
+from devices.log_storage import store_existing_log
+from devices.models import LogFile
+
+
+class Command(BaseCommand):
+    help = 'Переносит лог файлы без LogBlob в хранилище по SHA-256 (со сжатием LOG_COMPRESSION и дедупликацией)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Перенести не больше N файлов, 0 - все (по умолчанию: 0)',
+        )
+
+    def handle(self, *args, **options):
+        queryset = (
+            LogFile.objects.filter(blob__isnull=True)
+            .exclude(file='').exclude(file__isnull=True)
+            .order_by('created_at')
+        )
+        if options['limit']:
+            queryset = queryset[:options['limit']]
+
+        moved = 0
+        original_total = 0
+        for log_file in queryset.iterator():
+            try:
+                if not store_existing_log(log_file):
+                    continue
+            except FileNotFoundError:
+                self.stdout.write(self.style.WARNING(f'  файл не найден: {log_file.file.name}'))
+                continue
+            moved += 1
+            original_total += log_file.original_size
+            if moved % 100 == 0:
+                self.stdout.write(f'  перенесено {moved} файлов')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved} ({original_total / 1024 / 1024:.1f} МБ исходных данных)'
+        ))
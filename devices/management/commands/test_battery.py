@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from devices.models import Device
 import requests
@@ -113,12 +114,16 @@ class Command(BaseCommand):
         self.stdout.write(f'Ошибок: {error_count}')
         
         if success_count > 0:
-            # Проверяем обновление last_seen
+            # Проверяем обновление last_seen. Сервер пишет его в БД пачками раз в
+            # DEVICE_LAST_SEEN_FLUSH_INTERVAL секунд, поэтому сразу после отчетов значение может быть старым
             device.refresh_from_db()
             if device.last_seen:
-                self.stdout.write(f'Последняя активность обновлена: {device.last_seen.strftime("%d.%m.%Y %H:%M:%S")}')
+                self.stdout.write(f'Последняя активность в БД: {device.last_seen.strftime("%d.%m.%Y %H:%M:%S")}')
             else:
-                self.stdout.write('⚠️  last_seen не обновился')
+                self.stdout.write('⚠️  last_seen еще не записан в БД')
+            self.stdout.write(
+                f'   (last_seen записывается с задержкой до {settings.DEVICE_LAST_SEEN_FLUSH_INTERVAL:g} с)'
+            )
         
         # Показываем пример использования
         self.stdout.write('')
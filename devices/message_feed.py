@@ -0,0 +1,55 @@
+"""
+Лента последних сообщений для дашборда админки.
+
+Курсор указывает на последнее полученное клиентом сообщение в порядке
+поступления (created_at, id) и имеет вид "<микросекунды UNIX>_<id>".
+По нему отдаются только сообщения, пришедшие позже, а сам курсор
+последнего сообщения служит ETag ленты.
+"""
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import List, Optional, Tuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Message
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def make_cursor(created_at: datetime, pk) -> str:
+    return f"{(created_at - EPOCH) // timedelta(microseconds=1)}_{pk.hex}"
+
+
+def parse_cursor(value: str) -> Tuple[datetime, uuid.UUID]:
+    """Разбирает курсор; ValueError, если он некорректен"""
+    micros, _, pk = value.partition('_')
+    return EPOCH + timedelta(microseconds=int(micros)), uuid.UUID(hex=pk)
+
+
+def latest_cursor() -> Optional[str]:
+    """Курсор последнего поступившего сообщения или None, если сообщений нет"""
+    latest = Message.objects.order_by('-created_at', '-id').values_list('created_at', 'id').first()
+    return make_cursor(*latest) if latest else None
+
+
+def messages_since(cursor: str, limit: int) -> List[Message]:
+    """Не больше limit сообщений, поступивших после курсора, от новых к старым"""
+    created_at, pk = parse_cursor(cursor)
+    return list(
+        Message.objects.select_related('device')
+        .filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+        .order_by('-created_at', '-id')[:limit]
+    )
+
+
+def message_payload(message: Message) -> dict:
+    """Сообщение в виде строки таблицы дашборда"""
+    local_dt = timezone.localtime(message.date_created) if message.date_created else None
+    return {
+        'device_name': message.device.name,
+        'date_created': local_dt.strftime('%d.%m.%Y %H:%M') if local_dt else '',
+        'sender': message.sender,
+        'text': message.text,
+    }
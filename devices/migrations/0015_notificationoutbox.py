@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:13
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0014_diagnosticevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('text', models.TextField(verbose_name='Текст уведомления')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает отправки'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('dead', 'Не доставлено')], default='pending', max_length=20, verbose_name='Статус')),
+                ('recipients', models.JSONField(blank=True, default=list, help_text='Telegram ID, которым осталось доставить уведомление. Пустой список - все активные пользователи', verbose_name='Получатели')),
+                ('attempts', models.IntegerField(default=0, verbose_name='Попыток')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующая попытка')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Взято в работу')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Исходящее уведомление',
+                'verbose_name_plural': 'Исходящие уведомления',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.RenameIndex(
+            model_name='diagnosticevent',
+            new_name='devices_dia_device__82e1e8_idx',
+            old_name='devices_dia_device__idx',
+        ),
+        migrations.RenameIndex(
+            model_name='diagnosticevent',
+            new_name='devices_dia_event_s_cfe166_idx',
+            old_name='devices_dia_event_s_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='diagnosticevent',
+            new_name='devices_dia_compone_43719c_idx',
+            old_name='devices_dia_componen_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='diagnosticevent',
+            new_name='devices_dia_device__de44e3_idx',
+            old_name='devices_dia_device__idx2',
+        ),
+        migrations.AddIndex(
+            model_name='notificationoutbox',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='devices_not_status_017455_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:23
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0015_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationTextFilter',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('rule_type', models.CharField(choices=[('text_contains', 'Текст содержит'), ('text_regex', 'Текст по регулярному выражению'), ('sender', 'Отправитель')], default='text_contains', max_length=20, verbose_name='Тип правила')),
+                ('pattern', models.CharField(help_text='Подстрока, регулярное выражение или имя отправителя (без учета регистра)', max_length=500, verbose_name='Шаблон')),
+                ('description', models.CharField(blank=True, help_text='Для чего нужно это правило', max_length=500, verbose_name='Описание')),
+                ('is_active', models.BooleanField(default=True, help_text='Применяется ли правило', verbose_name='Активен')),
+                ('filter_type', models.CharField(choices=[('blacklist', 'Черный список - блокировать'), ('whitelist', 'Белый список - разрешить')], default='blacklist', help_text='Тип фильтрации', max_length=20, verbose_name='Тип фильтра')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Фильтр по тексту',
+                'verbose_name_plural': 'Фильтры по тексту и отправителю',
+                'ordering': ['rule_type', 'pattern'],
+                'unique_together': {('rule_type', 'pattern')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def keep_latest_status(apps, schema_editor):
+    """Оставляет по одному (последнему) статусу на устройство, id статуса = id устройства"""
+    DeviceStatus = apps.get_model('devices', 'DeviceStatus')
+    seen = set()
+    duplicates = []
+    latest = []
+    for status_id, device_id in DeviceStatus.objects.order_by('device_id', '-date_created').values_list('id', 'device_id'):
+        if device_id in seen:
+            duplicates.append(status_id)
+        else:
+            seen.add(device_id)
+            latest.append((status_id, device_id))
+
+    for i in range(0, len(duplicates), 500):
+        DeviceStatus.objects.filter(id__in=duplicates[i:i + 500]).delete()
+    for status_id, device_id in latest:
+        if status_id != device_id:
+            DeviceStatus.objects.filter(id=status_id).update(id=device_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0016_notificationtextfilter'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_latest_status, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='devicestatus',
+            name='device',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='current_status', to='devices.device', verbose_name='Устройство'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0017_devicestatus_one_per_device'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceStatusHistory',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('status_level', models.CharField(choices=[('SUCCESS', 'SUCCESS - Всё хорошо'), ('ATTENTION', 'ATTENTION - Требуется внимание'), ('ERROR', 'ERROR - Критическая ошибка')], max_length=20, verbose_name='Статус устройства')),
+                ('reasons', models.JSONField(blank=True, default=list, verbose_name='Причины статуса')),
+                ('is_charging', models.BooleanField(default=False, verbose_name='Заряжается')),
+                ('network_available', models.BooleanField(default=True, verbose_name='Доступ к интернету')),
+                ('first_seen', models.DateTimeField(help_text='Время первого отчета с таким состоянием', verbose_name='Впервые')),
+                ('last_seen', models.DateTimeField(help_text='Время последнего отчета с таким состоянием', verbose_name='Последний раз')),
+                ('report_count', models.PositiveIntegerField(default=1, verbose_name='Количество отчетов')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_history', to='devices.device', verbose_name='Устройство')),
+            ],
+            options={
+                'verbose_name': 'История статуса',
+                'verbose_name_plural': 'История статусов',
+                'ordering': ['-first_seen'],
+                'indexes': [models.Index(fields=['device', '-first_seen'], name='devices_dev_device__035b09_idx')],
+            },
+        ),
+    ]
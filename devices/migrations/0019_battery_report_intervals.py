@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def init_last_seen(apps, schema_editor):
+    """Существующие отчеты - интервалы из одной точки"""
+    BatteryReport = apps.get_model('devices', 'BatteryReport')
+    BatteryReport.objects.update(last_seen=models.F('date_created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0018_devicestatushistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatteryReportHourly',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('hour', models.DateTimeField(verbose_name='Час')),
+                ('min_level', models.IntegerField(verbose_name='Минимум')),
+                ('max_level', models.IntegerField(verbose_name='Максимум')),
+                ('avg_level', models.FloatField(help_text='Среднее по времени за час', verbose_name='Среднее')),
+                ('last_level', models.IntegerField(verbose_name='Последнее значение')),
+                ('last_at', models.DateTimeField(verbose_name='Время последнего значения')),
+                ('report_count', models.PositiveIntegerField(default=0, verbose_name='Количество отчетов')),
+                ('covered_seconds', models.FloatField(default=0, verbose_name='Покрыто секунд')),
+            ],
+            options={
+                'verbose_name': 'Сводка батареи за час',
+                'verbose_name_plural': 'Сводки батареи по часам',
+                'ordering': ['-hour'],
+            },
+        ),
+        migrations.AddField(
+            model_name='batteryreport',
+            name='last_seen',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Время последнего отчета с этим уровнем', verbose_name='Последний отчет'),
+        ),
+        migrations.AddField(
+            model_name='batteryreport',
+            name='report_count',
+            field=models.PositiveIntegerField(default=1, verbose_name='Количество отчетов'),
+        ),
+        migrations.RunPython(init_last_seen, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='batteryreport',
+            index=models.Index(fields=['device', '-date_created'], name='devices_bat_device__07cb77_idx'),
+        ),
+        migrations.AddField(
+            model_name='batteryreporthourly',
+            name='device',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='battery_hourly', to='devices.device', verbose_name='Устройство'),
+        ),
+        migrations.AddConstraint(
+            model_name='batteryreporthourly',
+            constraint=models.UniqueConstraint(fields=('device', 'hour'), name='unique_battery_hour_per_device'),
+        ),
+    ]
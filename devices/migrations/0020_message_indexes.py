@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0019_battery_report_intervals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['device', '-date_created'], name='devices_mes_device__6513de_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['date_created'], name='devices_mes_date_cr_e0fda1_idx'),
+        ),
+    ]
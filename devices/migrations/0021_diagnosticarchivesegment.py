@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0020_message_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiagnosticArchiveSegment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('path', models.CharField(help_text='Путь относительно DIAGNOSTICS_ARCHIVE_ROOT', max_length=500, unique=True, verbose_name='Файл')),
+                ('day', models.DateField(verbose_name='День')),
+                ('min_timestamp', models.BigIntegerField(verbose_name='Первое событие (UNIX ms)')),
+                ('max_timestamp', models.BigIntegerField(verbose_name='Последнее событие (UNIX ms)')),
+                ('event_count', models.PositiveIntegerField(verbose_name='Количество событий')),
+                ('severity_counts', models.JSONField(blank=True, default=dict, verbose_name='События по уровням')),
+                ('size_bytes', models.PositiveBigIntegerField(default=0, verbose_name='Размер файла')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='diagnostic_archive_segments', to='devices.device', verbose_name='Устройство')),
+            ],
+            options={
+                'verbose_name': 'Сегмент архива диагностики',
+                'verbose_name_plural': 'Архив диагностики',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['device', 'min_timestamp', 'max_timestamp'], name='devices_dia_device__5c0d70_idx'), models.Index(fields=['min_timestamp', 'max_timestamp'], name='devices_dia_min_tim_f85906_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:33
+
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+
+def fill_counters(apps, schema_editor):
+    """Начальные значения счетчиков: общее количество и почасовые значения за последнюю неделю"""
+    DashboardCounter = apps.get_model('devices', 'DashboardCounter')
+    window_start = (timezone.now() - timedelta(hours=24 * 7)).replace(minute=0, second=0, microsecond=0)
+    counters = []
+    for metric, model_name in (('messages', 'Message'), ('log_files', 'LogFile')):
+        model = apps.get_model('devices', model_name)
+        counters.append(DashboardCounter(metric=metric, bucket='total', value=model.objects.count()))
+        hourly = (
+            model.objects.filter(created_at__gte=window_start)
+            .annotate(hour=TruncHour('created_at', tzinfo=dt_timezone.utc))
+            .values('hour')
+            .annotate(count=Count('pk'))
+            .values_list('hour', 'count')
+        )
+        for hour, count in hourly:
+            bucket = hour.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H')
+            counters.append(DashboardCounter(metric=metric, bucket=bucket, value=count))
+    DashboardCounter.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0021_diagnosticarchivesegment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50, verbose_name='Метрика')),
+                ('bucket', models.CharField(max_length=20, verbose_name='Период')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Значение')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Счетчик панели управления',
+                'verbose_name_plural': 'Счетчики панели управления',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dashboardcounter',
+            constraint=models.UniqueConstraint(fields=('metric', 'bucket'), name='unique_dashboard_counter_bucket'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
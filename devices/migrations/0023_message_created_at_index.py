@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0022_dashboardcounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['created_at', 'id'], name='devices_mes_created_5c42f7_idx'),
+        ),
+    ]
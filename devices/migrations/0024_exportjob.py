@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('devices', '0023_message_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('json', 'JSON'), ('ndjson', 'NDJSON'), ('csv', 'CSV'), ('error_log', 'Лог ошибок'), ('device_report', 'Отчет по устройствам'), ('last_10', 'Последние 10 событий по устройствам')], max_length=20, verbose_name='Формат')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('query', models.BinaryField(help_text='Сериализованный (pickle) запрос выборки событий', verbose_name='Запрос')),
+                ('description', models.TextField(blank=True, help_text='Фильтры и выбранные записи на момент запуска', verbose_name='Выборка')),
+                ('total', models.IntegerField(default=0, verbose_name='Всего событий')),
+                ('processed', models.IntegerField(default=0, verbose_name='Обработано')),
+                ('file', models.FileField(blank=True, null=True, upload_to='exports/', verbose_name='Файл')),
+                ('size_bytes', models.BigIntegerField(default=0, verbose_name='Размер файла (байт)')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Взято в работу')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начато')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Запустил')),
+            ],
+            options={
+                'verbose_name': 'Фоновый экспорт',
+                'verbose_name_plural': 'Фоновые экспорты',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='devices_exp_status_4c8dad_idx')],
+            },
+        ),
+    ]
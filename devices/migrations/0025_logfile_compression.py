@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0024_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logfile',
+            name='compression',
+            field=models.CharField(blank=True, choices=[('', 'Без сжатия'), ('gzip', 'gzip'), ('zstd', 'zstd')], default='', help_text='Кодек, которым сжат файл на диске (devices.log_storage)', max_length=10, verbose_name='Сжатие'),
+        ),
+        migrations.AddField(
+            model_name='logfile',
+            name='original_size',
+            field=models.BigIntegerField(default=0, verbose_name='Исходный размер (байт)'),
+        ),
+        migrations.AddField(
+            model_name='logfile',
+            name='stored_size',
+            field=models.BigIntegerField(default=0, verbose_name='Размер на диске (байт)'),
+        ),
+    ]
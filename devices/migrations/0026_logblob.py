@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0025_logfile_compression'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('file', models.FileField(upload_to='logs/blobs/', verbose_name='Файл')),
+                ('compression', models.CharField(blank=True, choices=[('', 'Без сжатия'), ('gzip', 'gzip'), ('zstd', 'zstd')], default='', max_length=10, verbose_name='Сжатие')),
+                ('original_size', models.BigIntegerField(default=0, verbose_name='Исходный размер (байт)')),
+                ('stored_size', models.BigIntegerField(default=0, verbose_name='Размер на диске (байт)')),
+                ('ref_count', models.IntegerField(default=0, verbose_name='Ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Содержимое лога',
+                'verbose_name_plural': 'Содержимое логов',
+            },
+        ),
+        migrations.AddField(
+            model_name='logfile',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Имя файла'),
+        ),
+        migrations.AlterField(
+            model_name='logfile',
+            name='file',
+            field=models.FileField(blank=True, help_text='Для загрузок с содержимым в LogBlob - файл блоба (общий для одинаковых загрузок)', null=True, upload_to='logs/', verbose_name='Файл лога'),
+        ),
+        migrations.AddField(
+            model_name='logfile',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='log_files', to='devices.logblob', verbose_name='Содержимое'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:51
+
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    """Виртуальная таблица FTS5 для строк логов (только SQLite, см. devices.log_search)"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS devices_logline_fts "
+        "USING fts5(line, byte_offset UNINDEXED, tokenize='unicode61')"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS devices_logline_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0026_logblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logblob',
+            name='indexed_at',
+            field=models.DateTimeField(blank=True, help_text='Когда строки попали в полнотекстовый индекс (devices.log_search); пусто - ожидает индексации', null=True, verbose_name='Проиндексировано'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
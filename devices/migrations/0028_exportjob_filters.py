@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:12
+
+from django.db import migrations, models
+
+
+def delete_unfinished_jobs(apps, schema_editor):
+    """
+    Выборку незавершенных задач (pickle запроса) не перенести, а повтор без нее
+    выгрузил бы все события - такие задачи удаляются, экспорт нужно запустить заново
+    """
+    ExportJob = apps.get_model('devices', 'ExportJob')
+    ExportJob.objects.filter(status__in=['pending', 'running', 'failed']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0027_log_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_unfinished_jobs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='exportjob',
+            name='query',
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='filters',
+            field=models.JSONField(blank=True, default=dict, help_text='GET-параметры списка событий (фильтры и поиск): {параметр: [значения]}', verbose_name='Фильтры'),
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='selected_ids',
+            field=models.JSONField(blank=True, help_text='id отмеченных событий; пусто - все события по фильтрам', null=True, verbose_name='Выбранные события'),
+        ),
+    ]
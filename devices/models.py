@@ -1,8 +1,13 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
+import re
 import uuid
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .text_classifier import PatternSet
+
 
 class Device(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -31,10 +36,16 @@ class Device(models.Model):
 
 
 class BatteryReport(models.Model):
+    """
+    Интервал с одинаковым уровнем батареи: повторяющиеся подряд отчеты
+    не создают новых строк, а продлевают last_seen и увеличивают report_count.
+    """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='battery_reports', verbose_name=_('Устройство'))
     battery_level = models.IntegerField(_('Уровень батареи'))  # 0-100
     date_created = models.DateTimeField(_('Дата создания'), default=timezone.now)
+    last_seen = models.DateTimeField(_('Последний отчет'), default=timezone.now, help_text=_('Время последнего отчета с этим уровнем'))
+    report_count = models.PositiveIntegerField(_('Количество отчетов'), default=1)
     created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
 
     def __str__(self):
@@ -44,6 +55,9 @@ class BatteryReport(models.Model):
         verbose_name = _('Отчет о батарее')
         verbose_name_plural = _('Отчеты о батарее')
         ordering = ['-date_created']
+        indexes = [
+            models.Index(fields=['device', '-date_created']),
+        ]
 
     def clean(self):
         from django.core.exceptions import ValidationError
@@ -51,6 +65,33 @@ class BatteryReport(models.Model):
             raise ValidationError('Battery level must be between 0 and 100')
 
 
+class BatteryReportHourly(models.Model):
+    """
+    Почасовая сводка уровня батареи для отчетов старше срока хранения сырых данных
+    """
+    id = models.BigAutoField(primary_key=True)
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='battery_hourly', verbose_name=_('Устройство'))
+    hour = models.DateTimeField(_('Час'))
+    min_level = models.IntegerField(_('Минимум'))
+    max_level = models.IntegerField(_('Максимум'))
+    avg_level = models.FloatField(_('Среднее'), help_text=_('Среднее по времени за час'))
+    last_level = models.IntegerField(_('Последнее значение'))
+    last_at = models.DateTimeField(_('Время последнего значения'))
+    report_count = models.PositiveIntegerField(_('Количество отчетов'), default=0)
+    covered_seconds = models.FloatField(_('Покрыто секунд'), default=0)
+
+    def __str__(self):
+        return f"Battery {self.hour.strftime('%d.%m.%Y %H:00')} {self.min_level}-{self.max_level}% - {self.device.name}"
+
+    class Meta:
+        verbose_name = _('Сводка батареи за час')
+        verbose_name_plural = _('Сводки батареи по часам')
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'hour'], name='unique_battery_hour_per_device'),
+        ]
+
+
 class TelegramUser(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user_id = models.BigIntegerField(_('Telegram User ID'), unique=True)
@@ -120,6 +161,57 @@ class NotificationFilter(models.Model):
         ordering = ['package_name']
 
 
+class NotificationTextFilter(models.Model):
+    """
+    Правило фильтрации уведомлений по тексту или отправителю
+    """
+    RULE_TYPE_CHOICES = [
+        ('text_contains', _('Текст содержит')),
+        ('text_regex', _('Текст по регулярному выражению')),
+        ('sender', _('Отправитель')),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    rule_type = models.CharField(_('Тип правила'), max_length=20, choices=RULE_TYPE_CHOICES, default='text_contains')
+    pattern = models.CharField(
+        _('Шаблон'),
+        max_length=500,
+        help_text=_('Подстрока, регулярное выражение или имя отправителя (без учета регистра)')
+    )
+    description = models.CharField(_('Описание'), max_length=500, blank=True, help_text=_('Для чего нужно это правило'))
+    is_active = models.BooleanField(_('Активен'), default=True, help_text=_('Применяется ли правило'))
+    filter_type = models.CharField(
+        _('Тип фильтра'),
+        max_length=20,
+        choices=[
+            ('blacklist', _('Черный список - блокировать')),
+            ('whitelist', _('Белый список - разрешить')),
+        ],
+        default='blacklist',
+        help_text=_('Тип фильтрации')
+    )
+    created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Обновлено'), auto_now=True)
+
+    def clean(self):
+        if self.rule_type == 'text_regex':
+            # Проверяем так же, как паттерн будет собран в PatternSet при загрузке правил
+            try:
+                PatternSet([self.pattern])
+            except re.error as e:
+                raise ValidationError({'pattern': _('Некорректное регулярное выражение: %(error)s') % {'error': e}})
+
+    def __str__(self):
+        status = "✅" if self.is_active else "❌"
+        return f"{status} {self.get_rule_type_display()}: {self.pattern} ({self.get_filter_type_display()})"
+
+    class Meta:
+        verbose_name = _('Фильтр по тексту')
+        verbose_name_plural = _('Фильтры по тексту и отправителю')
+        ordering = ['rule_type', 'pattern']
+        unique_together = ['rule_type', 'pattern']
+
+
 class Message(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='messages', verbose_name=_('Устройство'))
@@ -140,19 +232,80 @@ class Message(models.Model):
         verbose_name = _('Сообщение')
         verbose_name_plural = _('Сообщения')
         ordering = ['-date_created']
+        indexes = [
+            models.Index(fields=['device', '-date_created']),
+            models.Index(fields=['date_created']),
+            models.Index(fields=['created_at', 'id']),
+        ]
+
+
+LOG_COMPRESSION_CHOICES = [
+    ('', 'Без сжатия'),
+    ('gzip', 'gzip'),
+    ('zstd', 'zstd'),
+]
+
+
+class LogBlob(models.Model):
+    """
+    Содержимое лог файла, адресуемое SHA-256 исходных байт. Одинаковые
+    загрузки ссылаются на один файл logs/blobs/ab/cd/<sha256>[.gz|.zst];
+    ref_count - число LogFile, ссылающихся на блоб (devices.log_storage)
+    """
+    sha256 = models.CharField(_('SHA-256'), max_length=64, unique=True)
+    file = models.FileField(_('Файл'), upload_to='logs/blobs/')
+    compression = models.CharField(_('Сжатие'), max_length=10, choices=LOG_COMPRESSION_CHOICES, default='', blank=True)
+    original_size = models.BigIntegerField(_('Исходный размер (байт)'), default=0)
+    stored_size = models.BigIntegerField(_('Размер на диске (байт)'), default=0)
+    ref_count = models.IntegerField(_('Ссылок'), default=0)
+    indexed_at = models.DateTimeField(
+        _('Проиндексировано'), null=True, blank=True,
+        help_text=_('Когда строки попали в полнотекстовый индекс (devices.log_search); пусто - ожидает индексации')
+    )
+    created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count})"
+
+    class Meta:
+        verbose_name = _('Содержимое лога')
+        verbose_name_plural = _('Содержимое логов')
 
 
 class LogFile(models.Model):
+    COMPRESSION_CHOICES = LOG_COMPRESSION_CHOICES
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='log_files', verbose_name=_('Устройство'))
-    file = models.FileField(_('Файл лога'), upload_to='logs/', null=True, blank=True)
+    file = models.FileField(
+        _('Файл лога'), upload_to='logs/', null=True, blank=True,
+        help_text=_('Для загрузок с содержимым в LogBlob - файл блоба (общий для одинаковых загрузок)')
+    )
+    blob = models.ForeignKey(
+        LogBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='log_files',
+        verbose_name=_('Содержимое')
+    )
+    original_name = models.CharField(_('Имя файла'), max_length=255, blank=True)
     text = models.TextField(_('Текст лога'), blank=True, help_text=_('Превью текста для отображения в админке'))
+    compression = models.CharField(
+        _('Сжатие'), max_length=10, choices=COMPRESSION_CHOICES, default='', blank=True,
+        help_text=_('Кодек, которым сжат файл на диске (devices.log_storage)')
+    )
+    original_size = models.BigIntegerField(_('Исходный размер (байт)'), default=0)
+    stored_size = models.BigIntegerField(_('Размер на диске (байт)'), default=0)
     date_created = models.DateTimeField(_('Дата создания'), default=timezone.now)
     created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
 
     def __str__(self):
         return f"Log from {self.device.name} - {self.date_created.strftime('%d.%m.%Y %H:%M')}"
 
+    @property
+    def compression_ratio(self):
+        """Во сколько раз файл меньше исходного; None, если размеры неизвестны"""
+        if not self.original_size or not self.stored_size:
+            return None
+        return self.original_size / self.stored_size
+
     class Meta:
         verbose_name = _('Лог файл')
         verbose_name_plural = _('Лог файлы')
@@ -161,7 +314,10 @@ class LogFile(models.Model):
 
 class DeviceStatus(models.Model):
     """
-    Модель для хранения расширенной информации о статусе устройства
+    Модель для хранения расширенной информации о статусе устройства.
+
+    Хранит только текущий статус: одна строка на устройство (id совпадает с id
+    устройства), обновляется через upsert в SimpleBatteryReportView.
     """
     STATUS_CHOICES = [
         ('SUCCESS', 'SUCCESS - Всё хорошо'),
@@ -170,7 +326,7 @@ class DeviceStatus(models.Model):
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='status_reports', verbose_name=_('Устройство'))
+    device = models.OneToOneField(Device, on_delete=models.CASCADE, related_name='current_status', verbose_name=_('Устройство'))
     
     # Основные поля статуса
     status_level = models.CharField(
@@ -259,6 +415,35 @@ class DeviceStatus(models.Model):
             raise ValidationError('Battery level must be between 0 and 100')
 
 
+class DeviceStatusHistory(models.Model):
+    """
+    История изменений статуса устройства.
+
+    Новая строка добавляется только когда меняется статус, причины, зарядка или
+    сеть; одинаковые отчеты подряд лишь продлевают last_seen текущей строки.
+    """
+    id = models.BigAutoField(primary_key=True)
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='status_history', verbose_name=_('Устройство'))
+    status_level = models.CharField(_('Статус устройства'), max_length=20, choices=DeviceStatus.STATUS_CHOICES)
+    reasons = models.JSONField(_('Причины статуса'), default=list, blank=True)
+    is_charging = models.BooleanField(_('Заряжается'), default=False)
+    network_available = models.BooleanField(_('Доступ к интернету'), default=True)
+    first_seen = models.DateTimeField(_('Впервые'), help_text=_('Время первого отчета с таким состоянием'))
+    last_seen = models.DateTimeField(_('Последний раз'), help_text=_('Время последнего отчета с таким состоянием'))
+    report_count = models.PositiveIntegerField(_('Количество отчетов'), default=1)
+
+    def __str__(self):
+        return f"{self.device.name}: {self.status_level} ({self.first_seen.strftime('%d.%m.%Y %H:%M')} - {self.last_seen.strftime('%d.%m.%Y %H:%M')})"
+
+    class Meta:
+        verbose_name = _('История статуса')
+        verbose_name_plural = _('История статусов')
+        ordering = ['-first_seen']
+        indexes = [
+            models.Index(fields=['device', '-first_seen']),
+        ]
+
+
 class DiagnosticEvent(models.Model):
     """
     Модель для хранения диагностических событий от мобильных устройств
@@ -372,3 +557,157 @@ class DiagnosticEvent(models.Model):
         except (ValueError, TypeError):
             return str(self.timestamp)
 
+
+
+class DiagnosticArchiveSegment(models.Model):
+    """
+    Сегмент архива диагностических событий: сжатый NDJSON-файл с событиями
+    одного устройства за один день (UTC) и краткий индекс по нему
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.CASCADE,
+        related_name='diagnostic_archive_segments',
+        verbose_name=_('Устройство')
+    )
+    path = models.CharField(_('Файл'), max_length=500, unique=True, help_text=_('Путь относительно DIAGNOSTICS_ARCHIVE_ROOT'))
+    day = models.DateField(_('День'))
+    min_timestamp = models.BigIntegerField(_('Первое событие (UNIX ms)'))
+    max_timestamp = models.BigIntegerField(_('Последнее событие (UNIX ms)'))
+    event_count = models.PositiveIntegerField(_('Количество событий'))
+    severity_counts = models.JSONField(_('События по уровням'), default=dict, blank=True)
+    size_bytes = models.PositiveBigIntegerField(_('Размер файла'), default=0)
+    created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.device.name} {self.day.strftime('%d.%m.%Y')} ({self.event_count} событий)"
+
+    class Meta:
+        verbose_name = _('Сегмент архива диагностики')
+        verbose_name_plural = _('Архив диагностики')
+        ordering = ['-day']
+        indexes = [
+            models.Index(fields=['device', 'min_timestamp', 'max_timestamp']),
+            models.Index(fields=['min_timestamp', 'max_timestamp']),
+        ]
+
+
+class NotificationOutbox(models.Model):
+    """
+    Очередь исходящих уведомлений в Telegram (transactional outbox).
+    Ручки API только добавляют запись, доставкой занимается run_notification_worker.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Отправлено'),
+        ('dead', 'Не доставлено'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    text = models.TextField(_('Текст уведомления'))
+    status = models.CharField(_('Статус'), max_length=20, choices=STATUS_CHOICES, default='pending')
+    recipients = models.JSONField(
+        _('Получатели'),
+        default=list,
+        blank=True,
+        help_text=_('Telegram ID, которым осталось доставить уведомление. Пустой список - все активные пользователи')
+    )
+    attempts = models.IntegerField(_('Попыток'), default=0)
+    next_attempt_at = models.DateTimeField(_('Следующая попытка'), default=timezone.now)
+    locked_at = models.DateTimeField(_('Взято в работу'), null=True, blank=True)
+    last_error = models.TextField(_('Последняя ошибка'), blank=True)
+    sent_at = models.DateTimeField(_('Отправлено'), null=True, blank=True)
+    created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.get_status_display()} - {self.text[:50]}"
+
+    class Meta:
+        verbose_name = _('Исходящее уведомление')
+        verbose_name_plural = _('Исходящие уведомления')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+
+class DashboardCounter(models.Model):
+    """
+    Предагрегированный счетчик для панели управления: значение метрики
+    за весь период (bucket='total') или за час (bucket='ГГГГ-ММ-ДДTЧЧ', UTC)
+    """
+    metric = models.CharField(_('Метрика'), max_length=50)
+    bucket = models.CharField(_('Период'), max_length=20)
+    value = models.BigIntegerField(_('Значение'), default=0)
+    updated_at = models.DateTimeField(_('Обновлено'), auto_now=True)
+
+    def __str__(self):
+        return f"{self.metric}[{self.bucket}] = {self.value}"
+
+    class Meta:
+        verbose_name = _('Счетчик панели управления')
+        verbose_name_plural = _('Счетчики панели управления')
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'bucket'], name='unique_dashboard_counter_bucket'),
+        ]
+
+
+class ExportJob(models.Model):
+    """
+    Фоновый экспорт диагностических событий. Админка сохраняет выборку
+    (параметры фильтров списка и выбранные id) и формат, файл формирует
+    run_export_worker
+    """
+    KIND_CHOICES = [
+        ('json', 'JSON'),
+        ('ndjson', 'NDJSON'),
+        ('csv', 'CSV'),
+        ('error_log', 'Лог ошибок'),
+        ('device_report', 'Отчет по устройствам'),
+        ('last_10', 'Последние 10 событий по устройствам'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(_('Формат'), max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(_('Статус'), max_length=20, choices=STATUS_CHOICES, default='pending')
+    filters = models.JSONField(
+        _('Фильтры'), default=dict, blank=True,
+        help_text=_('GET-параметры списка событий (фильтры и поиск): {параметр: [значения]}')
+    )
+    selected_ids = models.JSONField(
+        _('Выбранные события'), null=True, blank=True,
+        help_text=_('id отмеченных событий; пусто - все события по фильтрам')
+    )
+    description = models.TextField(_('Выборка'), blank=True, help_text=_('Фильтры и выбранные записи на момент запуска'))
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='export_jobs', verbose_name=_('Запустил')
+    )
+    total = models.IntegerField(_('Всего событий'), default=0)
+    processed = models.IntegerField(_('Обработано'), default=0)
+    file = models.FileField(_('Файл'), upload_to='exports/', null=True, blank=True)
+    size_bytes = models.BigIntegerField(_('Размер файла (байт)'), default=0)
+    error = models.TextField(_('Ошибка'), blank=True)
+    locked_at = models.DateTimeField(_('Взято в работу'), null=True, blank=True)
+    created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
+    started_at = models.DateTimeField(_('Начато'), null=True, blank=True)
+    finished_at = models.DateTimeField(_('Завершено'), null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.get_status_display()} ({self.created_at:%d.%m.%Y %H:%M})"
+
+    class Meta:
+        verbose_name = _('Фоновый экспорт')
+        verbose_name_plural = _('Фоновые экспорты')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
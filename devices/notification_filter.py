@@ -2,7 +2,8 @@
 Сервис для фильтрации уведомлений
 """
 from .models import NotificationFilter
-import re
+from .filter_rules import get_filter_rules
+from .text_classifier import SYSTEM_PATTERNS, BANKING_PATTERNS
 from typing import Tuple, Optional
 
 
@@ -59,52 +60,44 @@ class NotificationFilterService:
         Returns:
             Tuple[bool, str]: (нужно_ли_фильтровать, причина_фильтрации)
         """
-        if not package_name:
-            # Если package_name пустой, проверяем только по тексту
-            if text and cls._is_system_message(text):
-                return True, "Системное сообщение - фильтруется"
-            return False, ""
-        
         # Проверяем системные пакеты из списка
-        if package_name in cls.SYSTEM_PACKAGES:
+        if package_name and package_name in cls.SYSTEM_PACKAGES:
             return True, f"Системный пакет {package_name} - фильтруется"
         
         # Проверяем системные паттерны в тексте
         if text and cls._is_system_message(text):
             return True, "Системное сообщение - фильтруется"
         
-        # Проверяем фильтры из базы данных
-        try:
-            # Ищем активные фильтры для этого пакета
-            filters = NotificationFilter.objects.filter(
-                package_name=package_name,
-                is_active=True
-            )
-            
-            for filter_obj in filters:
-                if filter_obj.filter_type == 'blacklist':
-                    return True, f"Фильтр: {filter_obj.description}"
-                elif filter_obj.filter_type == 'whitelist':
-                    return False, f"Разрешено: {filter_obj.description}"
-            
-            # Проверяем фильтры с масками (например, com.android.*)
-            wildcard_filters = NotificationFilter.objects.filter(
-                package_name__endswith='*',
-                is_active=True
-            )
-            
-            for filter_obj in wildcard_filters:
-                prefix = filter_obj.package_name[:-1]  # Убираем *
-                if package_name.startswith(prefix):
-                    if filter_obj.filter_type == 'blacklist':
-                        return True, f"Фильтр по маске: {filter_obj.description}"
-                    elif filter_obj.filter_type == 'whitelist':
-                        return False, f"Разрешено по маске: {filter_obj.description}"
-                        
-        except Exception as e:
-            # Если ошибка с БД, используем системный список как fallback
-            pass
-        
+        # Фильтры из базы данных скомпилированы в памяти процесса
+        rules = get_filter_rules()
+
+        # Правила по отправителю и тексту точнее правил по пакету, поэтому проверяются первыми
+        rule = rules.texts.match(sender, text)
+        if rule is not None:
+            source = 'отправителю' if rule.rule_type == 'sender' else 'тексту'
+            if rule.filter_type == 'blacklist':
+                return True, f"Фильтр по {source}: {rule.description or rule.pattern}"
+            elif rule.filter_type == 'whitelist':
+                return False, f"Разрешено по {source}: {rule.description or rule.pattern}"
+
+        if not package_name:
+            return False, ""
+
+        rule = rules.packages.match_exact(package_name)
+        if rule is not None:
+            if rule.filter_type == 'blacklist':
+                return True, f"Фильтр: {rule.description}"
+            elif rule.filter_type == 'whitelist':
+                return False, f"Разрешено: {rule.description}"
+
+        # Проверяем фильтры с масками (например, com.android.*)
+        rule = rules.packages.match_wildcard(package_name)
+        if rule is not None:
+            if rule.filter_type == 'blacklist':
+                return True, f"Фильтр по маске: {rule.description}"
+            elif rule.filter_type == 'whitelist':
+                return False, f"Разрешено по маске: {rule.description}"
+
         # По умолчанию разрешаем сообщение
         return False, ""
     
@@ -115,36 +108,9 @@ class NotificationFilterService:
         """
         if not text:
             return True  # Пустые сообщения фильтруем
-        
-        # Системные паттерны для фильтрации
-        system_patterns = [
-            r'^No Content$',
-            r'Осталось совсем немного',
-            r'Чтобы продолжить, подключитесь к Интернету',
-            r'Безопасная загрузка проверенных приложений',
-            r'This service is running in the foreground',
-            r'Service is running',
-            r'Download completed',
-            r'Download failed',
-            r'System update',
-            r'OTA update',
-            r'Battery optimization',
-            r'Storage space',
-            r'Background app',
-            r'App installed',
-            r'App updated',
-            r'Осталось:\s*\d+\s*%',
-            r'Выполняем проверку контента',
-            r'Нажмите, чтобы настроить',
-            r'Ваш телефон был автоматически отсоединен',
-        ]
-        
-        for pattern in system_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return True
-        
-        return False
-    
+
+        return text in SYSTEM_PATTERNS
+
     @classmethod
     def _is_banking_sms(cls, text: str) -> bool:
         """
@@ -152,86 +118,10 @@ class NotificationFilterService:
         """
         if not text:
             return False
-        
-        # Паттерны банковских SMS
-        banking_patterns = [
-            r'Снятие наличных',
-            r'Баланс:',
-            r'Код:\s*\d+',
-            r'код\s*\d+',
-            r'Пожалуйста, получив сообщение',
-            r'Уважаемый Клиент',
-            r'С заботой о Вас',
-            r'voshel v.*Onlajn',
-            r'Polzovatel.*voshel',
-            r'RMX\d+',
-            r'Обновление системы',
-            r'Критическое обновление',
-            r'Вам было отправлено СМС',
-            r'Пытались с вами связаться',
-            r'Никому не сообщайте код',
-            r'код подтверждения',
-            r'вход в.*код',
-            r'СберБизнес',
-            r'ВТБ',
-            r'Альфа.*код',
-            r'LOCKO.*код',
-            r'BLANC.*код',
-            r'Тинькофф',
-            r'Райффайзен',
-            r'Газпромбанк',
-            r'Альфа-Банк',
-            r'Сбербанк',
-            r'VTB',
-            r'Тинькофф Банк',
-            r'Райффайзенбанк',
-            r'Газпромбанк',
-            r'МТС Банк',
-            r'Росбанк',
-            r'УралСиб',
-            r'Хоум Кредит',
-            r'Ренессанс Кредит',
-            r'ОТП Банк',
-            r'ЮниКредит Банк',
-            r'Россельхозбанк',
-            r'Почта Банк',
-            r'МКБ',
-            r'Ак Барс',
-            r'Совкомбанк',
-            r'Точка',
-            r'Модульбанк',
-            r'Альфа-Банк',
-            r'Банк Открытие',
-            r'Промсвязьбанк',
-            r'Росбанк',
-            r'Сбербанк',
-            r'ВТБ',
-            r'Тинькофф',
-            r'Альфа',
-            r'LOCKO',
-            r'BLANC',
-            r'МТС',
-            r'Билайн',
-            r'МегаФон',
-            r'Теле2',
-            r'Yota',
-            r'Ростелеком',
-            r'МТС',
-            r'Билайн',
-            r'МегаФон',
-            r'Теле2',
-            r'Yota',
-            r'Ростелеком',
-        ]
-        
-        
-        for pattern in banking_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return True
-        
-        return False
-    
-    
+
+        return text in BANKING_PATTERNS
+
+
     @classmethod
     def create_default_filters(cls):
         """Создает фильтры по умолчанию"""
@@ -1,77 +1,212 @@
 import logging
+import random
+from datetime import timedelta
+
 from django.conf import settings
-from telegram import Bot
-from telegram.error import TelegramError
-from .models import TelegramUser
+from django.utils import timezone
+
+from .models import TelegramUser, NotificationOutbox
+from .telegram_sender import DeliveryResult, get_sender
 
 logger = logging.getLogger(__name__)
 
 
+def _to_html(text):
+    """Convert Markdown to HTML for better formatting"""
+    html_text = text.replace('**', '<b>').replace('**', '</b>')
+    html_text = html_text.replace('*', '<i>').replace('*', '</i>')
+    return html_text
+
+
+def get_active_chat_ids():
+    """Telegram ID всех активных пользователей"""
+    return list(TelegramUser.objects.filter(is_active=True).values_list('user_id', flat=True))
+
+
+def deliver(text, chat_ids=None):
+    """
+    Send notification to the given chats (all active users by default) concurrently.
+    Users who blocked the bot are deactivated.
+
+    Returns:
+        list[DeliveryResult]: per-recipient results
+    """
+    if chat_ids is None:
+        chat_ids = get_active_chat_ids()
+    if not chat_ids:
+        return []
+
+    results = get_sender().send_many(list(chat_ids), _to_html(text))
+
+    blocked = [result.chat_id for result in results if result.blocked]
+    if blocked:
+        # Если пользователь заблокировал бота, деактивируем его
+        TelegramUser.objects.filter(user_id__in=blocked).update(is_active=False)
+        logger.info(f"Deactivated users {blocked} (bot blocked)")
+
+    return results
+
+
 def notify(text):
     """
     Send notification to all active Telegram users.
-    Synchronous implementation for simplicity.
+    Blocks until every recipient is processed (recipients are sent to concurrently),
+    used where the caller needs the result (bot /test).
+    Device endpoints should use enqueue_notification() instead.
     """
     if not settings.TELEGRAM_BOT_TOKEN:
         logger.warning("TELEGRAM_BOT_TOKEN not configured")
         return False
-    
+
     try:
-        # Convert Markdown to HTML for better formatting
-        html_text = text.replace('**', '<b>').replace('**', '</b>')
-        html_text = html_text.replace('*', '<i>').replace('*', '</i>')
-        
-        # Get all active users
-        active_users = TelegramUser.objects.filter(is_active=True)
-        total_users = active_users.count()
-        
-        if total_users == 0:
+        chat_ids = get_active_chat_ids()
+
+        if not chat_ids:
             logger.warning("No active users found for notifications")
             return False
-        
-        logger.info(f"Sending notification to {total_users} users")
+
+        logger.info(f"Sending notification to {len(chat_ids)} users")
         logger.info(f"Message text: {text[:100]}...")
-        
-        # Use synchronous requests for simplicity
-        import requests
-        
-        success_count = 0
-        error_count = 0
-        
-        for user in active_users:
-            try:
-                url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
-                data = {
-                    'chat_id': user.user_id,
-                    'text': html_text,
-                    'parse_mode': 'HTML'
-                }
-                
-                response = requests.post(url, data=data, timeout=10)
-                response.raise_for_status()
-                
-                success_count += 1
-                logger.debug(f"Notification sent to user {user.user_id}")
-                
-            except requests.exceptions.RequestException as e:
-                error_count += 1
-                logger.warning(f"Failed to send to user {user.user_id}: {e}")
-                
-                # Если пользователь заблокировал бота, деактивируем его
-                if "bot was blocked by the user" in str(e).lower() or "Forbidden" in str(e):
-                    user.is_active = False
-                    user.save()
-                    logger.info(f"Deactivated user {user.user_id} (bot blocked)")
-                    
-            except Exception as e:
-                error_count += 1
-                logger.error(f"Unexpected error sending to user {user.user_id}: {e}")
-        
+
+        results = deliver(text, chat_ids)
+        success_count = sum(1 for result in results if result.ok)
+        error_count = len(results) - success_count
+
+        # Получателей, упершихся в лимит Telegram, досылает воркер очереди
+        rate_limited = [result for result in results if result.retry_after is not None]
+        if rate_limited:
+            retry_after = max(result.retry_after for result in rate_limited)
+            NotificationOutbox.objects.create(
+                text=text,
+                recipients=[result.chat_id for result in rate_limited],
+                next_attempt_at=timezone.now() + timedelta(seconds=retry_after)
+            )
+            logger.info(f"Rescheduled notification for {len(rate_limited)} rate-limited users in {retry_after}s")
+
         logger.info(f"Notifications sent: {success_count} success, {error_count} errors")
         return success_count > 0
-        
+
     except Exception as e:
         logger.error(f"Unexpected error in notification system: {e}")
         logger.error(f"Error type: {type(e).__name__}")
         return False
 
+
+def enqueue_notification(text):
+    """
+    Ставит уведомление в очередь NotificationOutbox.
+    Запись создается в текущей транзакции запроса, отправкой занимается run_notification_worker.
+    """
+    return NotificationOutbox.objects.create(text=text)
+
+
+def _retry_delay(attempts):
+    """Экспоненциальная задержка с джиттером перед следующей попыткой"""
+    base = settings.NOTIFICATION_OUTBOX_BACKOFF_BASE
+    delay = min(base * (2 ** (attempts - 1)), settings.NOTIFICATION_OUTBOX_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _claim(entry, now):
+    """Атомарно забирает запись в работу, чтобы ее не взял другой воркер"""
+    return NotificationOutbox.objects.filter(
+        pk=entry.pk, status='pending', attempts=entry.attempts
+    ).update(status='sending', locked_at=now) == 1
+
+
+def release_stale_outbox():
+    """Возвращает в очередь записи, зависшие в 'sending' (воркер упал посреди отправки)"""
+    stale_before = timezone.now() - timedelta(seconds=settings.NOTIFICATION_OUTBOX_LOCK_TIMEOUT)
+    return NotificationOutbox.objects.filter(
+        status='sending', locked_at__lt=stale_before
+    ).update(status='pending', locked_at=None)
+
+
+def process_outbox(batch_size=50):
+    """
+    Отправляет готовые к отправке уведомления из очереди.
+
+    Получатели, которым доставить не удалось, остаются в записи и получают
+    повторную попытку с экспоненциальной задержкой. После
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS попыток запись переходит в статус 'dead'.
+    Отказы по лимиту частоты (429, retry_after) только переносят запись.
+
+    Returns:
+        int: количество обработанных записей
+    """
+    if not settings.TELEGRAM_BOT_TOKEN:
+        logger.warning("TELEGRAM_BOT_TOKEN not configured")
+        return 0
+
+    now = timezone.now()
+    due = list(
+        NotificationOutbox.objects.filter(status='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at')[:batch_size]
+    )
+
+    processed = 0
+    active_chat_ids = None
+
+    for entry in due:
+        if not _claim(entry, now):
+            continue
+
+        if entry.recipients:
+            chat_ids = entry.recipients
+        else:
+            if active_chat_ids is None:
+                active_chat_ids = get_active_chat_ids()
+            chat_ids = active_chat_ids
+
+        try:
+            results = deliver(entry.text, chat_ids)
+        except Exception as e:
+            logger.error(f"Unexpected error delivering outbox entry {entry.pk}: {e}")
+            results = [DeliveryResult(chat_id, False, str(e)) for chat_id in chat_ids]
+
+        # Заблокировавшим бота повторно не отправляем
+        failed = {result.chat_id: result.error for result in results if not result.ok and not result.blocked}
+        # Упершиеся в лимит Telegram переносим на retry_after, попыткой это не считается
+        retry_after = max((result.retry_after for result in results if result.retry_after is not None), default=None)
+        has_errors = any(result.retry_after is None for result in results if result.chat_id in failed)
+        entry.locked_at = None
+
+        if not failed:
+            entry.attempts += 1
+            entry.status = 'sent'
+            entry.recipients = []
+            entry.last_error = ''
+            entry.sent_at = timezone.now()
+        else:
+            entry.recipients = list(failed)
+            entry.last_error = '; '.join(f"{chat_id}: {error}" for chat_id, error in failed.items())[:2000]
+            entry.status = 'pending'
+            delay = timedelta(seconds=retry_after or 0)
+            if has_errors:
+                entry.attempts += 1
+                delay = max(delay, _retry_delay(entry.attempts))
+            entry.next_attempt_at = timezone.now() + delay
+            if entry.attempts >= settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS:
+                entry.status = 'dead'
+                logger.error(f"Outbox entry {entry.pk} moved to dead letter after {entry.attempts} attempts")
+
+        entry.save(update_fields=[
+            'status', 'recipients', 'attempts', 'next_attempt_at',
+            'locked_at', 'last_error', 'sent_at'
+        ])
+        processed += 1
+
+    return processed
+
+
+def outbox_metrics():
+    """Глубина очереди уведомлений, задержка самого старого и метрики лимитера отправки"""
+    now = timezone.now()
+    pending = NotificationOutbox.objects.filter(status__in=['pending', 'sending'])
+    oldest = pending.order_by('created_at').values_list('created_at', flat=True).first()
+    return {
+        'pending': pending.count(),
+        'dead': NotificationOutbox.objects.filter(status='dead').count(),
+        'oldest_pending_seconds': round((now - oldest).total_seconds(), 1) if oldest else 0.0,
+        'limiter': get_sender().limiter.metrics(),
+    }
@@ -0,0 +1,141 @@
+"""
+Ограничение частоты отправки сообщений в Telegram (token bucket)
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """
+    Token bucket с резервированием: токены могут уходить в минус,
+    тогда следующий запрос ждет, пока ведро не наполнится снова.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Сколько секунд ждать до появления токена"""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self):
+        self.tokens -= 1
+
+    def block(self, now: float, seconds: float):
+        """Не выдавать токены в течение seconds (ответ 429 с retry_after)"""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class TelegramRateLimiter:
+    """
+    Глобальный лимит сообщений в секунду для бота плюс лимит на каждый чат.
+
+    acquire() блокирует поток до получения разрешения. Если ждать пришлось бы
+    дольше max_wait, возвращает рекомендуемую задержку - такое сообщение нужно
+    перенести, а не держать поток пула.
+    """
+
+    # Ведра чатов, не использовавшиеся дольше этого времени, удаляются
+    IDLE_BUCKET_TTL = 300
+
+    def __init__(self, global_rate: float, per_chat_rate: float, max_wait: float):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.max_wait = max_wait
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        self.lock = threading.Lock()
+        self.last_cleanup = time.monotonic()
+
+        # Метрики
+        self.waiting = 0
+        self.max_waiting = 0
+        self.acquired = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, 1)
+        return bucket
+
+    def _cleanup(self, now: float):
+        if now - self.last_cleanup < self.IDLE_BUCKET_TTL:
+            return
+        self.last_cleanup = now
+        for chat_id, bucket in list(self.chat_buckets.items()):
+            if now - bucket.updated > self.IDLE_BUCKET_TTL and bucket.blocked_until < now:
+                del self.chat_buckets[chat_id]
+
+    def acquire(self, chat_id: int) -> Optional[float]:
+        """
+        Ждет разрешения на отправку в чат.
+
+        Returns:
+            None, если можно отправлять, иначе через сколько секунд повторить
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._cleanup(now)
+            chat_bucket = self._chat_bucket(chat_id)
+            wait = max(chat_bucket.wait_time(now), self.global_bucket.wait_time(now))
+            if wait > self.max_wait:
+                self.throttled += 1
+                return wait
+
+            chat_bucket.consume()
+            self.global_bucket.consume()
+            self.acquired += 1
+            self.total_delay += wait
+            self.max_delay = max(self.max_delay, wait)
+            if wait > 0:
+                self.waiting += 1
+                self.max_waiting = max(self.max_waiting, self.waiting)
+
+        if wait > 0:
+            time.sleep(wait)
+            with self.lock:
+                self.waiting -= 1
+        return None
+
+    def on_rate_limited(self, chat_id: int, retry_after: float):
+        """
+        Учитывает ответ 429: retry_after секунд не отправляется ничего. По ответу
+        нельзя понять, сработал лимит чата или общий лимит бота, а продолжать
+        отправку в другие чаты при общем лимите значит получать новые 429 и
+        продлевать блокировку, поэтому пауза ставится и на чат, и на все ведро бота
+        """
+        with self.lock:
+            self.rate_limited += 1
+            now = time.monotonic()
+            self._chat_bucket(chat_id).block(now, retry_after)
+            self.global_bucket.block(now, retry_after)
+
+    def metrics(self) -> dict:
+        """Глубина очереди ожидания и задержки, накопленные с запуска процесса"""
+        with self.lock:
+            return {
+                'waiting': self.waiting,
+                'max_waiting': self.max_waiting,
+                'acquired': self.acquired,
+                'throttled': self.throttled,
+                'rate_limited': self.rate_limited,
+                'avg_delay_ms': round(self.total_delay / self.acquired * 1000, 1) if self.acquired else 0.0,
+                'max_delay_ms': round(self.max_delay * 1000, 1),
+                'chats': len(self.chat_buckets),
+            }
@@ -0,0 +1,156 @@
+"""
+Политики хранения данных и их применение.
+
+Удаление идет пачками по первичному ключу: каждая пачка - отдельная короткая
+транзакция, поэтому SQLite не блокируется на все время очистки, а в память
+не загружается вся таблица.
+"""
+import time
+from datetime import timedelta
+from typing import Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BatteryReport, DiagnosticEvent, LogFile, Message
+
+
+class RetentionPolicy(NamedTuple):
+    """
+    model: модель с полем device
+    age_field: поле DateTimeField, по которому считается возраст записи
+    order_field: поле, задающее порядок "новее-старше" внутри устройства
+    max_age_days: удалять записи старше N дней (0 - не ограничивать)
+    max_per_device: оставлять не больше N последних записей на устройство (0 - не ограничивать)
+    """
+    model: type
+    age_field: str
+    order_field: str
+    max_age_days: int = 0
+    max_per_device: int = 0
+
+
+def get_policies() -> dict:
+    """Политики хранения из настроек RETENTION_*"""
+    return {
+        'message': RetentionPolicy(
+            Message, 'date_created', 'date_created',
+            settings.RETENTION_MESSAGE_DAYS, settings.RETENTION_MESSAGE_MAX_PER_DEVICE
+        ),
+        'diagnostic_event': RetentionPolicy(
+            DiagnosticEvent, 'created_at', 'timestamp',
+            settings.RETENTION_DIAGNOSTIC_EVENT_DAYS, settings.RETENTION_DIAGNOSTIC_EVENT_MAX_PER_DEVICE
+        ),
+        'battery_report': RetentionPolicy(
+            BatteryReport, 'last_seen', 'date_created',
+            settings.RETENTION_BATTERY_REPORT_DAYS, settings.RETENTION_BATTERY_REPORT_MAX_PER_DEVICE
+        ),
+        'log_file': RetentionPolicy(
+            LogFile, 'date_created', 'date_created',
+            settings.RETENTION_LOG_FILE_DAYS, settings.RETENTION_LOG_FILE_MAX_PER_DEVICE
+        ),
+    }
+
+
+class PruneResult(NamedTuple):
+    deleted: int
+    chunks: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.deleted / self.seconds if self.seconds else 0.0
+
+
+ProgressCallback = Callable[[int, int, float], None]  # (удалено в пачке, удалено всего, секунд с начала)
+
+
+def _delete_pk_chunks(model, next_pks: Callable[[], list], chunk_size: int,
+                      progress: Optional[ProgressCallback], pause: float) -> PruneResult:
+    """Удаляет пачки первичных ключей, которые возвращает next_pks(), пока они не кончатся"""
+    started = time.monotonic()
+    deleted = 0
+    chunks = 0
+
+    while True:
+        pks = next_pks()
+        if not pks:
+            break
+        with transaction.atomic():
+            _, counts = model.objects.filter(pk__in=pks).delete()
+        chunk_deleted = counts.get(model._meta.label, 0)
+        deleted += chunk_deleted
+        chunks += 1
+        if progress is not None:
+            progress(chunk_deleted, deleted, time.monotonic() - started)
+        if len(pks) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    return PruneResult(deleted, chunks, time.monotonic() - started)
+
+
+def delete_in_chunks(queryset, chunk_size: int = 1000, progress: Optional[ProgressCallback] = None,
+                     pause: float = 0.0) -> PruneResult:
+    """
+    Удаляет записи queryset пачками по chunk_size первичных ключей.
+
+    Каждая пачка удаляется в своей транзакции, сигналы post_delete (например,
+    удаление файлов LogFile) срабатывают как обычно. pause - пауза между
+    пачками, чтобы дать место другим писателям.
+    """
+    pks = queryset.order_by().values_list('pk', flat=True)
+    return _delete_pk_chunks(queryset.model, lambda: list(pks[:chunk_size]), chunk_size, progress, pause)
+
+
+def _delete_beyond_cap(policy: RetentionPolicy, device_id, chunk_size: int,
+                       progress: Optional[ProgressCallback], pause: float) -> PruneResult:
+    """Удаляет записи устройства сверх max_per_device последних"""
+    pks = policy.model.objects.filter(device_id=device_id).order_by(
+        f'-{policy.order_field}', '-pk'
+    ).values_list('pk', flat=True)
+    cap = policy.max_per_device
+    return _delete_pk_chunks(policy.model, lambda: list(pks[cap:cap + chunk_size]), chunk_size, progress, pause)
+
+
+def apply_policy(policy: RetentionPolicy, chunk_size: int = 1000, progress: Optional[ProgressCallback] = None,
+                 pause: float = 0.0, dry_run: bool = False) -> PruneResult:
+    """
+    Применяет политику: сначала удаляет записи старше max_age_days, затем
+    записи сверх max_per_device на каждое устройство.
+
+    При dry_run ничего не удаляет и возвращает количество записей к удалению.
+    """
+    model = policy.model
+    started = time.monotonic()
+    deleted = 0
+    chunks = 0
+
+    cutoff = None
+    if policy.max_age_days:
+        cutoff = timezone.now() - timedelta(days=policy.max_age_days)
+        expired = model.objects.filter(**{f'{policy.age_field}__lt': cutoff})
+        if dry_run:
+            deleted += expired.count()
+        else:
+            result = delete_in_chunks(expired, chunk_size, progress, pause)
+            deleted += result.deleted
+            chunks += result.chunks
+
+    if policy.max_per_device:
+        device_ids = model.objects.order_by().values_list('device_id', flat=True).distinct()
+        for device_id in list(device_ids):
+            if dry_run:
+                remaining = model.objects.filter(device_id=device_id)
+                if cutoff is not None:
+                    remaining = remaining.filter(**{f'{policy.age_field}__gte': cutoff})
+                total = remaining.count()
+                deleted += max(0, total - policy.max_per_device)
+                continue
+            result = _delete_beyond_cap(policy, device_id, chunk_size, progress, pause)
+            deleted += result.deleted
+            chunks += result.chunks
+
+    return PruneResult(deleted, chunks, time.monotonic() - started)
@@ -12,7 +12,7 @@ class DeviceSerializer(serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True, help_text="Уникальный идентификатор устройства")
     token = serializers.CharField(read_only=True, help_text="Токен аутентификации устройства")
     name = serializers.CharField(read_only=True, help_text="Название устройства")
-    last_seen = serializers.DateTimeField(read_only=True, help_text="Время последней активности")
+    last_seen = serializers.DateTimeField(read_only=True, help_text="Время последней активности (в БД записывается с задержкой до DEVICE_LAST_SEEN_FLUSH_INTERVAL секунд)")
     created_at = serializers.DateTimeField(read_only=True, help_text="Дата создания устройства")
     
     class Meta:
@@ -0,0 +1,104 @@
+"""
+Обработчики сигналов моделей приложения devices
+"""
+import os
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .dashboard_stats import metric_for, record_created, record_deleted
+from .diagnostics_archive import segment_file_path
+from .filter_rules import invalidate_filter_rules
+from .log_search import remove_blob
+from .log_storage import release_blob
+from .models import (
+    DiagnosticArchiveSegment, Device, ExportJob, LogBlob, LogFile, Message,
+    NotificationFilter, NotificationTextFilter,
+)
+from .token_resolver import invalidate_device_token
+
+
+@receiver([post_save, post_delete], sender=NotificationFilter)
+@receiver([post_save, post_delete], sender=NotificationTextFilter)
+def notification_filter_changed(sender, **kwargs):
+    """Сбрасывает скомпилированные правила фильтрации после фиксации транзакции"""
+    transaction.on_commit(invalidate_filter_rules)
+
+
+@receiver(post_save, sender=Device)
+def device_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Сбрасывает кэш токена при создании устройства или изменении чего-либо кроме last_seen"""
+    if not created and update_fields is not None and set(update_fields) <= {'last_seen'}:
+        return
+    token = instance.token
+    transaction.on_commit(lambda: invalidate_device_token(token))
+
+
+@receiver(post_delete, sender=Device)
+def device_deleted(sender, instance, **kwargs):
+    token = instance.token
+    transaction.on_commit(lambda: invalidate_device_token(token))
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_save, sender=LogFile)
+def counted_record_created(sender, instance, created, **kwargs):
+    """Увеличивает счетчики панели управления после фиксации новой записи"""
+    if not created:
+        return
+    metric = metric_for(sender)
+    created_at = instance.created_at
+    transaction.on_commit(lambda: record_created(metric, created_at))
+
+
+@receiver(post_delete, sender=Message)
+@receiver(post_delete, sender=LogFile)
+def counted_record_deleted(sender, instance, **kwargs):
+    """Уменьшает счетчики панели управления (в том числе при каскадном удалении устройства)"""
+    record_deleted(metric_for(sender), instance.created_at)
+
+
+@receiver(post_delete, sender=LogFile)
+def log_file_deleted(sender, instance, **kwargs):
+    """
+    Убирает ссылку на содержимое лога (LogBlob удаляется вместе с последней
+    ссылкой, его файл - сверкой reconcile_log_blobs). Файлы логов без блоба
+    удаляются после фиксации удаления записи
+    """
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+        return
+    if not instance.file:
+        return
+    file = instance.file
+    transaction.on_commit(lambda: file.delete(save=False))
+
+
+@receiver(post_delete, sender=LogBlob)
+def log_blob_deleted(sender, instance, **kwargs):
+    """Удаляет строки блоба из полнотекстового индекса в той же транзакции"""
+    remove_blob(instance.pk)
+
+
+@receiver(post_delete, sender=ExportJob)
+def export_job_deleted(sender, instance, **kwargs):
+    """Удаляет файл фонового экспорта после фиксации удаления записи"""
+    if not instance.file:
+        return
+    file = instance.file
+    transaction.on_commit(lambda: file.delete(save=False))
+
+
+@receiver(post_delete, sender=DiagnosticArchiveSegment)
+def archive_segment_deleted(sender, instance, **kwargs):
+    """Удаляет файл сегмента архива после фиксации удаления записи"""
+    path = segment_file_path(instance)
+
+    def remove():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    transaction.on_commit(remove)
@@ -0,0 +1,82 @@
+"""
+Компактная история статусов устройств.
+
+Отчеты приходят каждые несколько минут и чаще всего повторяют предыдущее
+состояние, поэтому хранятся отрезки: новая строка DeviceStatusHistory
+добавляется только при изменении статуса, причин, зарядки или сети, а
+повторяющиеся отчеты продлевают last_seen текущей строки.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from django.db.models import F
+
+from .models import Device, DeviceStatusHistory
+
+
+def record_status(device: Device, status_level: str, reasons: list, is_charging: bool,
+                  network_available: bool, seen_at: datetime) -> DeviceStatusHistory:
+    """Учитывает отчет о статусе: продлевает текущий отрезок или начинает новый"""
+    current = DeviceStatusHistory.objects.filter(device=device).order_by('-first_seen').first()
+
+    if (
+        current is not None
+        and current.status_level == status_level
+        and current.reasons == reasons
+        and current.is_charging == is_charging
+        and current.network_available == network_available
+    ):
+        DeviceStatusHistory.objects.filter(pk=current.pk).update(
+            last_seen=seen_at,
+            report_count=F('report_count') + 1
+        )
+        current.last_seen = seen_at
+        current.report_count += 1
+        return current
+
+    return DeviceStatusHistory.objects.create(
+        device=device,
+        status_level=status_level,
+        reasons=reasons,
+        is_charging=is_charging,
+        network_available=network_available,
+        first_seen=seen_at,
+        last_seen=seen_at
+    )
+
+
+def status_timeline(device: Device, start: datetime, end: datetime) -> List[dict]:
+    """
+    Восстанавливает хронологию статусов устройства за период [start, end].
+
+    Каждое состояние действует с first_seen до начала следующего состояния
+    (для последнего - до его last_seen). Границы обрезаются по периоду,
+    состояние на момент start берется из последнего отрезка, начатого раньше.
+
+    Returns:
+        list: словари с ключами status_level, reasons, is_charging,
+        network_available, start, end, last_report, report_count
+    """
+    history = DeviceStatusHistory.objects.filter(device=device)
+    rows = list(history.filter(first_seen__gte=start, first_seen__lte=end).order_by('first_seen'))
+    previous = history.filter(first_seen__lt=start).order_by('-first_seen').first()
+    if previous is not None:
+        rows.insert(0, previous)
+
+    timeline = []
+    for i, row in enumerate(rows):
+        next_row: Optional[DeviceStatusHistory] = rows[i + 1] if i + 1 < len(rows) else None
+        segment_end = next_row.first_seen if next_row is not None else row.last_seen
+        if segment_end < start:
+            continue
+        timeline.append({
+            'status_level': row.status_level,
+            'reasons': row.reasons,
+            'is_charging': row.is_charging,
+            'network_available': row.network_available,
+            'start': max(row.first_seen, start),
+            'end': min(segment_end, end),
+            'last_report': row.last_seen,
+            'report_count': row.report_count,
+        })
+    return timeline
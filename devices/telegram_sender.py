@@ -0,0 +1,139 @@
+"""
+Параллельная отправка сообщений в Telegram через общий пул соединений
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from .rate_limiter import TelegramRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryResult(NamedTuple):
+    """Результат отправки сообщения одному получателю"""
+    chat_id: int
+    ok: bool
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    blocked: bool = False
+    retry_after: Optional[float] = None
+
+
+class TelegramSender:
+    """
+    Рассылает сообщение всем получателям одновременно.
+
+    Один requests.Session с keep-alive пулом и ограниченный пул потоков
+    переиспользуются между вызовами, поэтому время рассылки примерно равно
+    одному запросу к Telegram API, а не N запросам подряд.
+
+    Частота отправки ограничивается TelegramRateLimiter. Если лимит не
+    позволяет отправить сразу или Telegram ответил 429, результат содержит
+    retry_after - получателя нужно перенести, а не терять.
+    """
+
+    def __init__(self, token: str, max_workers: int = 16, timeout: float = 10,
+                 limiter: Optional[TelegramRateLimiter] = None):
+        self.base_url = f"https://api.telegram.org/bot{token}"
+        self.timeout = timeout
+        self.limiter = limiter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='telegram-sender')
+
+    def send(self, chat_id: int, html_text: str) -> DeliveryResult:
+        """Отправляет сообщение в один чат"""
+        if self.limiter is not None:
+            retry_after = self.limiter.acquire(chat_id)
+            if retry_after is not None:
+                return DeliveryResult(chat_id, False, 'Превышен лимит частоты отправки', retry_after=retry_after)
+
+        try:
+            response = self.session.post(
+                f"{self.base_url}/sendMessage",
+                data={
+                    'chat_id': chat_id,
+                    'text': html_text,
+                    'parse_mode': 'HTML'
+                },
+                timeout=self.timeout
+            )
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Failed to send to user {chat_id}: {e}")
+            return DeliveryResult(chat_id, False, str(e))
+
+        if response.ok:
+            logger.debug(f"Notification sent to user {chat_id}")
+            return DeliveryResult(chat_id, True, status_code=response.status_code)
+
+        error = f"{response.status_code}: {response.text[:200]}"
+        logger.warning(f"Failed to send to user {chat_id}: {error}")
+
+        if response.status_code == 429:
+            retry_after = _parse_retry_after(response)
+            if self.limiter is not None:
+                self.limiter.on_rate_limited(chat_id, retry_after)
+            return DeliveryResult(chat_id, False, error, status_code=429, retry_after=retry_after)
+
+        # 403 - пользователь заблокировал бота
+        return DeliveryResult(
+            chat_id, False, error,
+            status_code=response.status_code,
+            blocked=response.status_code == 403
+        )
+
+    def send_many(self, chat_ids: List[int], html_text: str) -> List[DeliveryResult]:
+        """Отправляет сообщение во все чаты параллельно"""
+        if len(chat_ids) == 1:
+            return [self.send(chat_ids[0], html_text)]
+
+        futures = [self.executor.submit(self.send, chat_id, html_text) for chat_id in chat_ids]
+        results = []
+        for chat_id, future in zip(chat_ids, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"Unexpected error sending to user {chat_id}: {e}")
+                results.append(DeliveryResult(chat_id, False, str(e)))
+        return results
+
+
+def _parse_retry_after(response) -> float:
+    """Достает retry_after из ответа 429 (тело parameters.retry_after или заголовок Retry-After)"""
+    try:
+        return float(response.json()['parameters']['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def get_sender() -> TelegramSender:
+    """Возвращает общий для процесса экземпляр TelegramSender"""
+    global _sender
+    if _sender is None:
+        with _sender_lock:
+            if _sender is None:
+                _sender = TelegramSender(
+                    settings.TELEGRAM_BOT_TOKEN,
+                    max_workers=settings.TELEGRAM_SENDER_MAX_WORKERS,
+                    limiter=TelegramRateLimiter(
+                        global_rate=settings.TELEGRAM_GLOBAL_RATE_LIMIT,
+                        per_chat_rate=settings.TELEGRAM_PER_CHAT_RATE_LIMIT,
+                        max_wait=settings.TELEGRAM_RATE_LIMIT_MAX_WAIT,
+                    )
+                )
+    return _sender
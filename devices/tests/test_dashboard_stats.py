@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.test import TestCase
+
+from devices.dashboard_stats import get_counts
+from devices.models import Device, Message
+from devices.retention import delete_in_chunks
+
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        self.device = Device.objects.create(name='d1')
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                Message.objects.create(device=self.device, sender='bank', text=f'text {i}')
+
+    def assertMessageCounts(self, expected):
+        counts = get_counts()['messages']
+        self.assertEqual((counts['total'], counts['day'], counts['week']), (expected,) * 3)
+
+    def test_delete_decrements_counters(self):
+        self.assertMessageCounts(3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.first().delete()
+        self.assertMessageCounts(2)
+
+    def test_device_cascade_decrements_counters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.device.delete()
+        self.assertMessageCounts(0)
+
+    def test_retention_decrements_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_in_chunks(Message.objects.all(), chunk_size=2)
+        self.assertMessageCounts(0)
+
+    def test_rolled_back_delete_keeps_counters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Message.objects.all().delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            Message.objects.first().delete()
+        self.assertMessageCounts(2)
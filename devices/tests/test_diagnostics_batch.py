@@ -0,0 +1,46 @@
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from devices.diagnostics_archive import archive_events
+from devices.models import Device, DiagnosticArchiveSegment, DiagnosticEvent
+
+TIMESTAMP = 1705327825000
+
+
+def event(event_id, timestamp=TIMESTAMP):
+    return {
+        'eventId': event_id, 'eventCode': 'NETWORK_ERROR', 'eventSeverity': 'ERROR',
+        'component': 'NETWORK', 'timestamp': timestamp,
+    }
+
+
+class ArchivedEventReuploadTests(TestCase):
+    def setUp(self):
+        self.archive_root = tempfile.mkdtemp()
+        self.settings = override_settings(DIAGNOSTICS_ARCHIVE_ROOT=self.archive_root)
+        self.settings.enable()
+        self.device = Device.objects.create(name='d1')
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.archive_root)
+
+    def upload(self, events):
+        return self.client.post(
+            reverse('diagnostics-batch'), {'token': str(self.device.token), 'events': events}, content_type='application/json'
+        ).json()
+
+    def test_archived_event_is_a_duplicate(self):
+        self.upload([event('e1'), event('e2', TIMESTAMP + 1000)])
+        archive_events(timezone.now() + timedelta(seconds=1))
+        self.assertEqual(DiagnosticArchiveSegment.objects.count(), 1)
+
+        response = self.upload([event('e1'), event('e3', TIMESTAMP + 500)])
+
+        self.assertEqual((response['events_processed'], response['events_failed']), (2, 0))
+        self.assertEqual(list(DiagnosticEvent.objects.values_list('event_id', flat=True)), ['e3'])
@@ -0,0 +1,105 @@
+import gzip
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from devices.export_jobs import _claim, job_queryset, process_next_job, run_job, submit_export
+from devices.models import Device, DiagnosticEvent, ExportJob
+
+
+class JobQuerysetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        device = Device.objects.create(name='d1')
+        self.events = {
+            severity: DiagnosticEvent.objects.create(
+                device=device, event_id=f'e-{severity}', timestamp=0, event_code=f'CODE_{severity}',
+                event_severity=severity, component='SERVICE',
+            )
+            for severity in ('INFO', 'ERROR', 'CRITICAL')
+        }
+
+    def test_filters_are_applied_through_changelist(self):
+        job = submit_export('json', {'event_severity__exact': ['ERROR']}, None, user=self.user)
+        self.assertEqual(list(job_queryset(job)), [self.events['ERROR']])
+
+    def test_search_and_selected_ids(self):
+        job = submit_export('json', {'q': ['CODE_']}, [self.events['INFO'].pk, self.events['CRITICAL'].pk], user=self.user)
+        job.refresh_from_db()
+        self.assertEqual(
+            set(job_queryset(job)), {self.events['INFO'], self.events['CRITICAL']}
+        )
+
+
+class RunJobTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        device = Device.objects.create(name='d1')
+        DiagnosticEvent.objects.create(
+            device=device, event_id='e1', timestamp=0, event_code='CRASH', event_severity='ERROR', component='SERVICE',
+        )
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def files(self):
+        return [name for _, _, names in os.walk(self.media_root) for name in names]
+
+    def test_round_trip(self):
+        job = submit_export('csv', {'event_severity__exact': ['ERROR']}, None)
+
+        self.assertEqual(process_next_job().pk, job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total, job.processed, job.locked_at), ('done', 1, 1, None))
+        with gzip.open(job.file.path, 'rt', encoding='utf-8') as fh:
+            self.assertIn('CRASH', fh.read())
+        self.assertEqual(self.files(), [os.path.basename(job.file.name)])
+        self.assertIsNone(process_next_job())
+
+    def test_failed_job_can_be_retried(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        job = submit_export('csv', {'no_such_field': ['1']}, None, user=user)
+
+        process_next_job()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(job.error)
+        self.assertEqual(self.files(), [])
+
+        ExportJob.objects.filter(pk=job.pk).update(filters={})
+        self.client.force_login(user)
+        self.client.post(
+            reverse('admin:devices_exportjob_changelist'), {'action': 'retry_action', ACTION_CHECKBOX_NAME: [job.pk]}
+        )
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('pending', ''))
+
+        process_next_job()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertTrue(os.path.exists(job.file.path))
+
+    def test_job_taken_over_by_another_worker_saves_nothing(self):
+        job = submit_export('csv', {}, None)
+        self.assertTrue(_claim(job, timezone.now()))
+        job.refresh_from_db()
+        # Блокировка истекла, задачу вернули в очередь и забрал другой воркер
+        ExportJob.objects.filter(pk=job.pk).update(locked_at=job.locked_at + timedelta(seconds=1))
+
+        run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+        self.assertFalse(job.file)
+        self.assertEqual(self.files(), [])
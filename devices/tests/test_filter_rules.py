@@ -0,0 +1,44 @@
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from devices.filter_rules import get_filter_rules, invalidate_filter_rules
+from devices.models import NotificationTextFilter
+from devices.text_classifier import PatternSet
+
+
+class PatternSetTests(TestCase):
+    def test_patterns_that_cannot_be_merged_are_compiled_separately(self):
+        patterns = PatternSet([r'Код:\s*\d+', r'(?i)spam', r'(a)\1', r'(?P<p0>x)y', r'(?P<p1>z)w'])
+
+        self.assertEqual(patterns.search('Код: 1234'), r'Код:\s*\d+')
+        self.assertEqual(patterns.search('buy SPAM now'), r'(?i)spam')
+        self.assertEqual(patterns.search('aa'), r'(a)\1')
+        self.assertIsNone(patterns.search('ab'))
+        self.assertEqual(patterns.search('xy'), r'(?P<p0>x)y')
+        self.assertEqual(patterns.search('zw'), r'(?P<p1>z)w')
+
+    def test_backreference_keeps_its_meaning_after_other_patterns(self):
+        patterns = PatternSet([r'(q)r', r'(b)(c)\2'])
+
+        self.assertEqual(patterns.search('bcc'), r'(b)(c)\2')
+        self.assertIsNone(patterns.search('bcb'))
+
+
+class TextFilterRulesTests(TestCase):
+    def setUp(self):
+        invalidate_filter_rules()
+
+    def test_inline_flag_pattern_does_not_break_other_rules(self):
+        NotificationTextFilter.objects.create(rule_type='text_regex', pattern=r'(?i)spam', filter_type='blacklist')
+        NotificationTextFilter.objects.create(rule_type='text_regex', pattern=r'Выигрыш\s+\d+', filter_type='blacklist')
+        invalidate_filter_rules()
+
+        texts = get_filter_rules().texts
+        self.assertEqual(len(texts), 2)
+        self.assertEqual(texts.match(None, 'SPAM offer').pattern, r'(?i)spam')
+        self.assertEqual(texts.match(None, 'Выигрыш 500').pattern, r'Выигрыш\s+\d+')
+
+    def test_clean_accepts_inline_flags_and_rejects_invalid_regex(self):
+        NotificationTextFilter(rule_type='text_regex', pattern=r'(?i)spam', filter_type='blacklist').clean()
+        with self.assertRaises(ValidationError):
+            NotificationTextFilter(rule_type='text_regex', pattern=r'(unclosed', filter_type='blacklist').clean()
@@ -0,0 +1,35 @@
+from django.test import TestCase, override_settings
+
+from devices.last_seen import flush_last_seen
+from devices.models import Device
+
+
+@override_settings(DEVICE_LAST_SEEN_FLUSH_INTERVAL=15)
+class LastSeenTests(TestCase):
+    def setUp(self):
+        flush_last_seen()
+        self.device = Device.objects.create(name='d1')
+
+    def report(self):
+        response = self.client.post(
+            '/api/battery-report', {'token': str(self.device.token), 'battery_level': 80},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_report_is_not_visible_until_flush(self):
+        self.report()
+
+        self.device.refresh_from_db()
+        self.assertIsNone(self.device.last_seen)
+
+        self.assertEqual(flush_last_seen(), 1)
+        self.device.refresh_from_db()
+        self.assertIsNotNone(self.device.last_seen)
+
+    @override_settings(DEVICE_LAST_SEEN_FLUSH_INTERVAL=0)
+    def test_zero_interval_writes_immediately(self):
+        self.report()
+
+        self.device.refresh_from_db()
+        self.assertIsNotNone(self.device.last_seen)
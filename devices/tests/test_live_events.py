@@ -0,0 +1,90 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from devices.live_events import LiveEventBroker, Position
+from devices.models import Device, DeviceStatusHistory, DiagnosticEvent, Message
+
+
+class LiveEventBrokerTests(TestCase):
+    def setUp(self):
+        self.device = Device.objects.create(name='d1')
+        # Два воркера: у каждого свой буфер, источник событий общий
+        self.worker_a = LiveEventBroker(buffer_size=100, poll_interval=0)
+        self.worker_b = LiveEventBroker(buffer_size=100, poll_interval=0)
+        self.worker_a.poll()
+        self.worker_b.poll()
+
+    def ingest(self):
+        Message.objects.create(device=self.device, sender='bank', text='hello')
+        DiagnosticEvent.objects.create(
+            device=self.device, event_id='e1', timestamp=0, event_code='CRASH',
+            event_severity='CRITICAL', component='SERVICE',
+        )
+        DiagnosticEvent.objects.create(
+            device=self.device, event_id='e2', timestamp=0, event_code='NOTE',
+            event_severity='INFO', component='SERVICE',
+        )
+        now = timezone.now()
+        DeviceStatusHistory.objects.create(
+            device=self.device, status_level='ERROR', reasons=['battery'], first_seen=now, last_seen=now,
+        )
+
+    def test_every_worker_sees_events_ingested_anywhere(self):
+        start = self.worker_a.position
+        self.ingest()
+        self.worker_a.poll()
+        self.worker_b.poll()
+
+        for worker in (self.worker_a, self.worker_b):
+            events, gap = worker.since(start)
+            self.assertFalse(gap)
+            self.assertEqual([event.event_type for event in events], ['message', 'diagnostic', 'status'])
+
+    def test_last_event_id_from_other_worker_resumes_without_reset(self):
+        start = self.worker_a.position
+        self.ingest()
+        self.worker_a.poll()
+        self.worker_b.poll()
+        message_event = self.worker_a.since(start)[0][0]
+
+        position = Position.parse(message_event.position.as_id())
+        events, gap = self.worker_b.since(position)
+        self.assertFalse(gap)
+        self.assertEqual([event.event_type for event in events], ['diagnostic', 'status'])
+
+    def test_position_before_buffer_is_a_gap(self):
+        start = self.worker_a.position
+        Message.objects.create(device=self.device, sender='bank', text='before worker c')
+        worker_c = LiveEventBroker(buffer_size=100, poll_interval=0)
+        worker_c.poll()
+
+        self.assertEqual(worker_c.since(start), ([], True))
+        # Пропущенное до начала буфера досылается из БД
+        missed = worker_c.catch_up(start)
+        self.assertEqual([event.event_type for event in missed], ['message'])
+
+    def test_catch_up_beyond_buffer_size_is_refused(self):
+        start = self.worker_a.position
+        for i in range(3):
+            Message.objects.create(device=self.device, sender='bank', text=f'text {i}')
+        worker = LiveEventBroker(buffer_size=2, poll_interval=0)
+        worker.poll()
+
+        self.assertIsNone(worker.catch_up(start))
+
+    def test_evicted_events_are_a_gap(self):
+        worker = LiveEventBroker(buffer_size=2, poll_interval=0)
+        worker.poll()
+        start = worker.position
+        for i in range(3):
+            Message.objects.create(device=self.device, sender='bank', text=f'text {i}')
+        worker.poll()  # за один опрос берется не больше buffer_size событий каждого вида
+        worker.poll()
+
+        self.assertTrue(worker.since(start)[1])
+        self.assertFalse(worker.since(worker.position)[1])
+
+    def test_invalid_event_id(self):
+        self.assertIsNone(Position.parse('abc-12'))
+        self.assertIsNone(Position.parse('x_y~~1'))
+        self.assertEqual(Position.parse('~~5'), Position('', '', 5))
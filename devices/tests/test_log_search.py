@@ -0,0 +1,94 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from devices.log_search import FTS_TABLE, index_blob, iter_lines, search_logs
+from devices.log_storage import store_blob
+from devices.models import Device, LogBlob, LogFile
+
+CONTENT = b'01-15 14:30:25 I/App: ok\n' * 10
+
+
+def fts_rows():
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+class IterLinesTests(TestCase):
+    def test_crlf_and_line_split_across_blocks(self):
+        lines = list(iter_lines([b'first\r\nsec', b'ond\r', b'\n\r\nlast\r\n']))
+        self.assertEqual(lines, [(1, 0, b'first\r'), (2, 7, b'second\r'), (3, 15, b'\r'), (4, 17, b'last\r')])
+
+    def test_last_line_without_trailing_newline(self):
+        lines = list(iter_lines([b'one\ntw', b'o']))
+        self.assertEqual(lines, [(1, 0, b'one'), (2, 4, b'two')])
+
+
+class LogSearchTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root, LOG_COMPRESSION='gzip')
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+
+class IndexBlobTests(LogSearchTestCase):
+    def test_blob_deleted_while_indexing_leaves_no_rows(self):
+        blob = store_blob('0' * 64, [CONTENT])
+
+        def chunks(blob):
+            yield CONTENT
+            LogBlob.objects.filter(pk=blob.pk).delete()
+            yield CONTENT
+
+        with mock.patch('devices.log_search.iter_log_chunks', chunks), \
+                mock.patch('devices.log_search.INDEX_BATCH_SIZE', 5):
+            index_blob(blob)
+
+        self.assertEqual(fts_rows(), 0)
+
+    def test_offsets_point_at_line_start_in_crlf_file(self):
+        content = b'a\r\nNullPointerException here\r\nb'
+        blob = store_blob('1' * 64, [content])
+        device = Device.objects.create(name='d1')
+        LogFile.objects.create(device=device, blob=blob)
+        index_blob(blob)
+
+        hit, = search_logs('NullPointerException').hits
+        self.assertEqual((hit.line_no, hit.line), (2, 'NullPointerException here'))
+        self.assertTrue(content[hit.byte_offset:].startswith(b'NullPointerException'))
+
+
+class SearchLogsTests(LogSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.devices = [Device.objects.create(name=f'd{i}') for i in range(3)]
+        self.files = []
+        for i, device in enumerate(self.devices):
+            blob = store_blob(str(i) * 64, [f'boot {i}\nFATAL crash on {device.name}\n'.encode()])
+            self.files.append(LogFile.objects.create(device=device, blob=blob))
+            index_blob(blob)
+
+    def test_per_blob_and_post_filter_paths_agree(self):
+        devices = self.devices[:2]
+        per_blob = search_logs('FATAL', devices=devices).hits
+        with mock.patch('devices.log_search.PER_BLOB_SEARCH_MAX', 0):
+            post_filter = search_logs('FATAL', devices=devices).hits
+
+        expected = [self.files[1], self.files[0]]  # от новых блобов к старым
+        self.assertEqual([hit.log_file for hit in per_blob], expected)
+        self.assertEqual([hit.log_file for hit in post_filter], expected)
+
+    def test_deleting_last_log_file_removes_blob_from_index(self):
+        self.files[0].delete()
+
+        self.assertFalse(LogBlob.objects.filter(pk=self.files[0].blob_id).exists())
+        self.assertEqual([hit.log_file for hit in search_logs('FATAL').hits], [self.files[2], self.files[1]])
+        self.assertEqual(fts_rows(), 4)
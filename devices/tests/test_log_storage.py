@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import TestCase, override_settings
+
+from devices.log_storage import iter_log_chunks, reconcile_blobs, release_blob, store_blob
+from devices.models import LogBlob
+
+CONTENT = b'01-15 14:30:25 I/App: ok\n' * 100
+SHA256 = '0' * 64
+
+
+class LogBlobStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root, LOG_COMPRESSION='gzip')
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_releasing_last_reference_keeps_file_for_concurrent_upload(self):
+        blob = store_blob(SHA256, [CONTENT])
+        path = blob.file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            release_blob(blob.pk)
+        self.assertFalse(LogBlob.objects.exists())
+        self.assertTrue(os.path.exists(path))
+
+        # Те же байты загружены снова, пока файл удаленного блоба еще на диске
+        blob = store_blob(SHA256, [CONTENT])
+        self.assertEqual(b''.join(iter_log_chunks(blob)), CONTENT)
+
+    def test_reconcile_removes_only_old_orphan_files(self):
+        blob = store_blob(SHA256, [CONTENT])
+        path = blob.file.path
+        release_blob(blob.pk)
+
+        self.assertEqual(reconcile_blobs()['orphan_files'], 0)
+        os.utime(path, (time.time() - 7200,) * 2)
+        self.assertEqual(reconcile_blobs()['orphan_files'], 1)
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,16 @@
+from django.test import SimpleTestCase
+
+from devices.rate_limiter import TelegramRateLimiter
+
+
+class TelegramRateLimiterTests(SimpleTestCase):
+    def test_429_pauses_every_chat(self):
+        limiter = TelegramRateLimiter(global_rate=30, per_chat_rate=1, max_wait=1)
+
+        limiter.on_rate_limited(1, 10)
+
+        for chat_id in (1, 2):
+            retry_after = limiter.acquire(chat_id)
+            self.assertIsNotNone(retry_after)
+            self.assertGreater(retry_after, 9)
+        self.assertEqual(limiter.metrics()['throttled'], 2)
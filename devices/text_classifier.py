@@ -0,0 +1,212 @@
+"""
+Классификация текста уведомлений по наборам регулярных выражений.
+
+Каждый набор компилируется один раз: паттерны без спецсимволов проверяются
+поиском подстроки в тексте, приведенном к нижнему регистру, остальные
+объединяются в одно регулярное выражение-альтернацию с именованной группой на
+каждый паттерн. Текст просматривается за один проход re.search, а не отдельным
+поиском на каждый паттерн.
+
+Не каждое корректное выражение можно вставить в альтернацию: флаги вроде (?i)
+допустимы только в начале всего выражения, номера групп в обратных ссылках
+(\\1) сдвигаются, имена групп могут совпасть. Такие паттерны компилируются
+отдельно и проверяются после общей альтернации.
+"""
+import re
+from typing import Iterable, List, Optional
+
+_REGEX_SPECIAL = re.compile(r'[.^$*+?{}\[\]\\|()]')
+# Ссылка на группу по номеру: \1 (не экранированный \\1) или условие (?(1)...)
+_NUMERIC_REFERENCE = re.compile(r'(?:^|[^\\])(?:\\\\)*\\[1-9]|\(\?\(\d')
+_GROUP_NAME = re.compile(r'p\d+')
+
+
+def _mergeable(pattern: str, compiled: re.Pattern, flags: int, names: set) -> bool:
+    """Можно ли вставить паттерн в общую альтернацию, не изменив его смысл"""
+    if _NUMERIC_REFERENCE.search(pattern):
+        return False
+    if any(name in names or _GROUP_NAME.fullmatch(name) for name in compiled.groupindex):
+        return False
+    try:
+        re.compile(f'(?P<p0>{pattern})', flags)
+    except re.error:
+        return False
+    return True
+
+
+class PatternSet:
+    """
+    Набор паттернов, проверяемый за один проход.
+
+    Повторяющиеся паттерны отбрасываются при сборке. Некорректное регулярное
+    выражение вызывает re.error. search() возвращает исходный текст
+    сработавшего паттерна или None.
+    """
+
+    def __init__(self, patterns: Iterable[str], flags: int = re.IGNORECASE, literals: Iterable[str] = ()):
+        """
+        Args:
+            patterns: регулярные выражения
+            flags: флаги re для регулярных выражений
+            literals: строки, которые ищутся как есть, даже если содержат спецсимволы
+        """
+        literals = list(dict.fromkeys(literals))
+        self.patterns: List[str] = list(dict.fromkeys(list(patterns) + literals))
+        self.ignore_case = bool(flags & re.IGNORECASE)
+        forced_literals = set(literals)
+
+        # Литералы: (текст для поиска, исходный паттерн)
+        self.literals = []
+        regex_patterns = []
+        for pattern in self.patterns:
+            if pattern not in forced_literals and _REGEX_SPECIAL.search(pattern):
+                regex_patterns.append(pattern)
+            else:
+                self.literals.append((pattern.lower() if self.ignore_case else pattern, pattern))
+
+        # Паттерны, которые нельзя объединить: (скомпилированное выражение, исходный паттерн)
+        self.separate = []
+        merged = []
+        names = set()
+        for pattern in regex_patterns:
+            compiled = re.compile(pattern, flags)
+            if _mergeable(pattern, compiled, flags, names):
+                merged.append(pattern)
+                names.update(compiled.groupindex)
+            else:
+                self.separate.append((compiled, pattern))
+
+        self.regex_patterns = merged
+        self.regex = None
+        if merged:
+            try:
+                self.regex = re.compile(
+                    '|'.join(f'(?P<p{i}>{pattern})' for i, pattern in enumerate(merged)),
+                    flags
+                )
+            except re.error:
+                # Сочетание, которое не предусмотрела проверка - компилируем все по отдельности
+                self.separate = [(re.compile(pattern, flags), pattern) for pattern in regex_patterns]
+                self.regex_patterns = []
+
+    def search(self, text: str) -> Optional[str]:
+        """Первый сработавший паттерн (сначала литералы, затем регулярные выражения) или None"""
+        if not text:
+            return None
+
+        if self.literals:
+            haystack = text.lower() if self.ignore_case else text
+            for literal, pattern in self.literals:
+                if literal in haystack:
+                    return pattern
+
+        if self.regex is not None:
+            match = self.regex.search(text)
+            if match is not None:
+                return self.regex_patterns[int(match.lastgroup[1:])]
+
+        for compiled, pattern in self.separate:
+            if compiled.search(text):
+                return pattern
+        return None
+
+    def __contains__(self, text: str) -> bool:
+        return self.search(text) is not None
+
+    def __len__(self):
+        return len(self.patterns)
+
+
+# Системные паттерны для фильтрации
+SYSTEM_PATTERNS = PatternSet([
+    r'^No Content$',
+    r'Осталось совсем немного',
+    r'Чтобы продолжить, подключитесь к Интернету',
+    r'Безопасная загрузка проверенных приложений',
+    r'This service is running in the foreground',
+    r'Service is running',
+    r'Download completed',
+    r'Download failed',
+    r'System update',
+    r'OTA update',
+    r'Battery optimization',
+    r'Storage space',
+    r'Background app',
+    r'App installed',
+    r'App updated',
+    r'Осталось:\s*\d+\s*%',
+    r'Выполняем проверку контента',
+    r'Нажмите, чтобы настроить',
+    r'Ваш телефон был автоматически отсоединен',
+])
+
+# Паттерны банковских SMS
+BANKING_PATTERNS = PatternSet([
+    r'Снятие наличных',
+    r'Баланс:',
+    r'Код:\s*\d+',
+    r'код\s*\d+',
+    r'Пожалуйста, получив сообщение',
+    r'Уважаемый Клиент',
+    r'С заботой о Вас',
+    r'voshel v.*Onlajn',
+    r'Polzovatel.*voshel',
+    r'RMX\d+',
+    r'Обновление системы',
+    r'Критическое обновление',
+    r'Вам было отправлено СМС',
+    r'Пытались с вами связаться',
+    r'Никому не сообщайте код',
+    r'код подтверждения',
+    r'вход в.*код',
+    r'СберБизнес',
+    r'ВТБ',
+    r'Альфа.*код',
+    r'LOCKO.*код',
+    r'BLANC.*код',
+    r'Тинькофф',
+    r'Райффайзен',
+    r'Газпромбанк',
+    r'Альфа-Банк',
+    r'Сбербанк',
+    r'VTB',
+    r'Тинькофф Банк',
+    r'Райффайзенбанк',
+    r'Газпромбанк',
+    r'МТС Банк',
+    r'Росбанк',
+    r'УралСиб',
+    r'Хоум Кредит',
+    r'Ренессанс Кредит',
+    r'ОТП Банк',
+    r'ЮниКредит Банк',
+    r'Россельхозбанк',
+    r'Почта Банк',
+    r'МКБ',
+    r'Ак Барс',
+    r'Совкомбанк',
+    r'Точка',
+    r'Модульбанк',
+    r'Альфа-Банк',
+    r'Банк Открытие',
+    r'Промсвязьбанк',
+    r'Росбанк',
+    r'Сбербанк',
+    r'ВТБ',
+    r'Тинькофф',
+    r'Альфа',
+    r'LOCKO',
+    r'BLANC',
+    r'МТС',
+    r'Билайн',
+    r'МегаФон',
+    r'Теле2',
+    r'Yota',
+    r'Ростелеком',
+    r'МТС',
+    r'Билайн',
+    r'МегаФон',
+    r'Теле2',
+    r'Yota',
+    r'Ростелеком',
+])
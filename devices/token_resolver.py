@@ -0,0 +1,126 @@
+"""
+Поиск устройства по токену с кэшем в памяти процесса.
+
+Используется аутентификацией X-TOKEN и эндпоинтами, принимающими токен в теле
+запроса. Найденные устройства кэшируются на DEVICE_TOKEN_CACHE_TTL секунд,
+неизвестные токены - на DEVICE_TOKEN_NEGATIVE_TTL секунд, чтобы перебор
+токенов не нагружал БД. Размер кэша ограничен, вытесняются давно не
+использованные записи (LRU).
+
+При удалении устройства или изменении его имени/токена запись сбрасывается
+сигналом (см. signals.py); в других процессах она устаревает по TTL.
+"""
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+
+from .models import Device
+
+
+class TTLCache:
+    """Потокобезопасный LRU-кэш с ограниченным временем жизни записей"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_MISSING = object()
+_NOT_FOUND = object()  # отрицательная запись: токен неизвестен
+
+_cache = TTLCache(settings.DEVICE_TOKEN_CACHE_SIZE)
+
+
+def _normalize(token) -> uuid.UUID:
+    if isinstance(token, uuid.UUID):
+        return token
+    try:
+        return uuid.UUID(str(token))
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError(f'Invalid device token: {token!r}')
+
+
+def resolve_device(token) -> Optional[Device]:
+    """
+    Возвращает устройство по токену или None, если такого устройства нет.
+
+    Каждый вызов получает собственную копию Device, поэтому изменение
+    экземпляра в одном запросе не затрагивает другие.
+
+    Raises:
+        ValueError: токен не является UUID
+    """
+    key = _normalize(token)
+    cached = _cache.get(key, _MISSING)
+    if cached is _NOT_FOUND:
+        return None
+    if cached is not _MISSING:
+        return copy.copy(cached)
+
+    device = Device.objects.filter(token=key).first()
+    if device is None:
+        _cache.set(key, _NOT_FOUND, settings.DEVICE_TOKEN_NEGATIVE_TTL)
+        return None
+    _cache.set(key, device, settings.DEVICE_TOKEN_CACHE_TTL)
+    return copy.copy(device)
+
+
+def invalidate_device_token(token):
+    """Удаляет токен из кэша (положительную или отрицательную запись)"""
+    try:
+        _cache.delete(_normalize(token))
+    except ValueError:
+        pass
+
+
+def clear_token_cache():
+    _cache.clear()
+
+
+def token_cache_metrics() -> dict:
+    return {
+        'size': len(_cache),
+        'hits': _cache.hits,
+        'misses': _cache.misses,
+    }
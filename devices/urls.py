@@ -6,7 +6,9 @@ urlpatterns = [
     path('battery-report', views.SimpleBatteryReportView.as_view(), name='simple-battery'),
     path('mobile/message', views.MessageView.as_view(), name='message'),
     path('mobile/log', views.LogFileView.as_view(), name='log'),
+    path('logs/<uuid:pk>/download', views.log_file_download, name='log-file-download'),
     path('mobile/diagnostics/batch', views.DiagnosticsBatchView.as_view(), name='diagnostics-batch'),
     path('admin/latest-messages', views.latest_messages_admin, name='latest-messages-admin'),
+    path('admin/live-events', views.live_events_admin, name='live-events-admin'),
 ]
 
@@ -4,15 +4,31 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from django.contrib.admin.views.decorators import staff_member_required
-from django.core.exceptions import ValidationError
-from django.db import IntegrityError, OperationalError
-from django.http import JsonResponse
+from django.db import OperationalError, transaction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import condition
+from asgiref.sync import sync_to_async
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 import logging
-from .models import Device, BatteryReport, Message, LogFile, DeviceStatus, DiagnosticEvent
-from .serializers import DeviceSerializer, MessageSerializer, LogFileSerializer, DeviceStatusSerializer, DiagnosticEventSerializer, DiagnosticsBatchResponseSerializer
-from .notifications import notify
+from .models import Message, LogFile, DeviceStatus, DiagnosticEvent
+from .serializers import DeviceSerializer, MessageSerializer, LogFileSerializer, DeviceStatusSerializer, DiagnosticsBatchResponseSerializer
+from .notifications import enqueue_notification
+from .diagnostics_archive import archived_event_ids
+from .diagnostics_validator import validate_events
+from .token_resolver import resolve_device
+from .last_seen import touch_device
+from .status_history import record_status
+from .battery_history import record_battery_level
+from .log_ingest import scan_log_file
+from .log_storage import LOG_IO_CHUNK_SIZE, iter_log_chunks, original_name, store_blob
+from .message_feed import latest_cursor, make_cursor, message_payload, messages_since
+from .live_events import Position, get_broker
 from .notification_filter import NotificationFilterService
 from .status_calculator import DeviceStatusCalculator
 
@@ -21,7 +37,12 @@ logger = logging.getLogger(__name__)
 
 class DeviceView(APIView):
     """
-    Получение информации об устройстве
+    Получение информации об устройстве.
+
+    last_seen пишется в БД отложенно (devices.last_seen): для запрашивающего
+    устройства ответ содержит текущее время, а значение в БД, которое видят
+    админка, бот и другие процессы, отстает не больше чем на
+    DEVICE_LAST_SEEN_FLUSH_INTERVAL секунд (по умолчанию 15)
     """
     permission_classes = [IsAuthenticated]
     
@@ -36,6 +57,11 @@ class DeviceView(APIView):
         - Получение данных устройства для отображения в мобильном приложении
         - Проверка статуса регистрации устройства
         - Получение последнего времени активности
+        
+        **last_seen**: для самого устройства - время этого запроса. В БД время
+        активности записывается пачками раз в `DEVICE_LAST_SEEN_FLUSH_INTERVAL`
+        секунд (по умолчанию 15), поэтому в админке и боте оно может отставать
+        на этот интервал.
         """,
         tags=['Устройства'],
         responses={
@@ -84,6 +110,13 @@ class SimpleBatteryReportView(APIView):
     Расширенная отправка отчета о статусе устройства (без аутентификации)
     """
     permission_classes = []  # Убираем требование аутентификации
+
+    # Поля DeviceStatus, перезаписываемые при каждом отчете (id, device и created_at не меняются)
+    STATUS_UPSERT_FIELDS = [
+        'status_level', 'reasons', 'battery_level', 'is_charging', 'network_available',
+        'unsent_notifications', 'last_notification_timestamp', 'timestamp',
+        'app_version', 'android_version', 'device_model', 'date_created'
+    ]
     
     @swagger_auto_schema(
         operation_summary="📊 Отправить расширенный отчет о статусе устройства",
@@ -244,6 +277,7 @@ class SimpleBatteryReportView(APIView):
             )
         }
     )
+    @transaction.atomic
     def post(self, request):
         token = request.data.get('token')
         battery_level = request.data.get('battery_level')
@@ -267,8 +301,13 @@ class SimpleBatteryReportView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            device = Device.objects.get(token=token)
-        except Device.DoesNotExist:
+            device = resolve_device(token)
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'Неверный формат токена устройства'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if device is None:
             return Response({
                 'success': False,
                 'error': 'Устройство с таким токеном не найдено'
@@ -336,51 +375,36 @@ class SimpleBatteryReportView(APIView):
                 last_notification_timestamp=last_notification_timestamp
             )
         
-        # Создаем отчет о батарее (для обратной совместимости)
-        battery_report = BatteryReport.objects.create(
+        # Отчет о батарее (для обратной совместимости): одинаковые уровни подряд продлевают один интервал
+        battery_report = record_battery_level(device, battery_level, timezone.now())
+        
+        # Текущий статус устройства записываем одним upsert (INSERT ... ON CONFLICT DO UPDATE)
+        device_status = DeviceStatus(
+            id=device.id,
             device=device,
-            battery_level=battery_level
+            status_level=status_level,
+            reasons=reasons,
+            battery_level=battery_level,
+            is_charging=is_charging,
+            network_available=network_available,
+            unsent_notifications=unsent_notifications,
+            last_notification_timestamp=last_notification_timestamp,
+            timestamp=timestamp,
+            app_version=app_version,
+            android_version=android_version,
+            device_model=device_model,
+            date_created=timezone.now()
         )
-        
-        # Обновляем последний статус устройства вместо создания новой записи
-        # Находим последнюю запись статуса для этого устройства
-        device_status = DeviceStatus.objects.filter(device=device).order_by('-date_created').first()
-        
-        if device_status:
-            # Обновляем существующую запись
-            device_status.status_level = status_level
-            device_status.reasons = reasons
-            device_status.battery_level = battery_level
-            device_status.is_charging = is_charging
-            device_status.network_available = network_available
-            device_status.unsent_notifications = unsent_notifications
-            device_status.last_notification_timestamp = last_notification_timestamp
-            device_status.timestamp = timestamp
-            device_status.app_version = app_version
-            device_status.android_version = android_version
-            device_status.device_model = device_model
-            device_status.date_created = timezone.now()  # Обновляем время на текущее
-            device_status.save()
-        else:
-            # Создаем новую запись, если её нет
-            device_status = DeviceStatus.objects.create(
-                device=device,
-                status_level=status_level,
-                reasons=reasons,
-                battery_level=battery_level,
-                is_charging=is_charging,
-                network_available=network_available,
-                unsent_notifications=unsent_notifications,
-                last_notification_timestamp=last_notification_timestamp,
-                timestamp=timestamp,
-                app_version=app_version,
-                android_version=android_version,
-                device_model=device_model
-            )
+        DeviceStatus.objects.bulk_create(
+            [device_status],
+            update_conflicts=True,
+            unique_fields=['device'],
+            update_fields=self.STATUS_UPSERT_FIELDS
+        )
+        record_status(device, status_level, reasons, is_charging, network_available, device_status.date_created)
         
         # Обновляем last_seen устройства
-        device.last_seen = timezone.now()
-        device.save(update_fields=['last_seen'])
+        touch_device(device)
         
         # Отправляем уведомление в Telegram если статус требует внимания
         if status_level in ['ATTENTION', 'ERROR']:
@@ -396,8 +420,7 @@ class SimpleBatteryReportView(APIView):
             for reason in reasons:
                 notification_text += f"• {reason}\n"
             
-            # TODO: Move to Celery for async processing
-            notify(notification_text)
+            enqueue_notification(notification_text)
         
         return Response({
             'success': True,
@@ -534,6 +557,7 @@ class MessageView(APIView):
             )
         ]
     )
+    @transaction.atomic
     def post(self, request):
         device = request.user
         serializer = MessageSerializer(data=request.data)
@@ -554,8 +578,7 @@ class MessageView(APIView):
             # Если сообщение должно быть отфильтровано - не сохраняем в БД и не отправляем уведомление
             if should_filter:
                 # Update device last_seen
-                device.last_seen = timezone.now()
-                device.save(update_fields=['last_seen'])
+                touch_device(device)
                 
                 return Response(
                     {
@@ -575,16 +598,14 @@ class MessageView(APIView):
             )
             
             # Update device last_seen
-            device.last_seen = timezone.now()
-            device.save(update_fields=['last_seen'])
+            touch_device(device)
             
             # Send notification to admin chat ТОЛЬКО для неотфильтрованных сообщений
             notification_text = f"🚨 <b>НОВОЕ СООБЩЕНИЕ</b>\n\n"
             notification_text += f"{device.name} {message.date_created.strftime('%d.%m.%Y %H:%M:%S')}\n\n"
             notification_text += f"💬 <b>Сообщение:</b>\n{message.text}"
             
-            # TODO: Move to Celery for async processing
-            notify(notification_text)
+            enqueue_notification(notification_text)
             
             return Response(
                 {
@@ -599,35 +620,106 @@ class MessageView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _latest_messages_limit(request):
+    limit = request.GET.get('limit')
+    try:
+        limit = int(limit) if limit else 10
+    except (TypeError, ValueError):
+        limit = 10
+    return max(1, min(limit, 50))
+
+
+def _latest_messages_etag(request):
+    """ETag ленты: курсор последнего сообщения и размер выборки"""
+    return f"{latest_cursor() or 'empty'}-{_latest_messages_limit(request)}"
+
+
 @staff_member_required
+@condition(etag_func=_latest_messages_etag)
 def latest_messages_admin(request):
     """
     Возвращает последние сообщения для обновления дашборда.
     Доступно только администраторам.
+    
+    С параметром since (курсор из предыдущего ответа) возвращает только
+    сообщения, поступившие после него. Если новых сообщений нет и клиент
+    передал If-None-Match с прошлым ETag, отвечает 304 без тела.
     """
-    limit = request.GET.get('limit')
-    try:
-        limit = int(limit) if limit else 10
-    except (TypeError, ValueError):
-        limit = 10
-    limit = max(1, min(limit, 50))
+    limit = _latest_messages_limit(request)
+    since = request.GET.get('since')
     
-    messages_qs = (
-        Message.objects.select_related('device')
-        .order_by('-date_created')[:limit]
-    )
+    if since:
+        try:
+            messages_list = messages_since(since, limit)
+        except ValueError:
+            return JsonResponse({'error': 'Некорректный курсор since'}, status=400)
+    else:
+        messages_list = list(
+            Message.objects.select_related('device')
+            .order_by('-date_created')[:limit]
+        )
+    
+    payload = [dict(message_payload(msg), cursor=make_cursor(msg.created_at, msg.id)) for msg in messages_list]
     
-    payload = []
-    for msg in messages_qs:
-        local_dt = timezone.localtime(msg.date_created) if msg.date_created else None
-        payload.append({
-            'device_name': msg.device.name,
-            'date_created': local_dt.strftime('%d.%m.%Y %H:%M') if local_dt else '',
-            'sender': msg.sender,
-            'text': msg.text,
-        })
+    if since:
+        cursor = make_cursor(messages_list[0].created_at, messages_list[0].id) if messages_list else since
+    else:
+        cursor = latest_cursor()
     
-    return JsonResponse({'messages': payload})
+    return JsonResponse({'messages': payload, 'cursor': cursor, 'incremental': bool(since)})
+
+
+async def live_events_admin(request):
+    """
+    Поток Server-Sent Events для дашборда: новые сообщения (message),
+    критические диагностические события (diagnostic) и смены статуса
+    устройств (status). Поддерживает переподключение с Last-Event-ID.
+    Доступно только администраторам, работает только под ASGI.
+    
+    Под WSGI (runserver, gunicorn без uvicorn-воркера) бесконечный поток занял бы
+    синхронный воркер до таймаута, поэтому отвечаем 204: EventSource по 204
+    не переподключается, и дашборд остается на опросе раз в 5 секунд.
+    """
+    is_staff = await sync_to_async(lambda: request.user.is_active and request.user.is_staff)()
+    if not is_staff:
+        return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+    
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    
+    broker = get_broker()
+    if broker.subscriber_count >= settings.LIVE_EVENTS_MAX_SUBSCRIBERS:
+        return JsonResponse({'error': 'Слишком много подключений'}, status=503)
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    last_position = Position.parse(last_event_id)
+    # Идентификатор прежнего формата или испорченный - пропущенные события не восстановить
+    reset = bool(last_event_id) and last_position is None
+    
+    async def stream():
+        yield f'retry: {settings.LIVE_EVENTS_RETRY_MS}\n\n'
+        async for chunk in broker.listen(last_position, reset, settings.LIVE_EVENTS_HEARTBEAT):
+            yield chunk
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def log_file_download(request, pk):
+    """
+    Отдает исходное содержимое лог файла, распаковывая его по мере отправки.
+    Ссылка с UUID записи уходит в уведомления вместо прямой ссылки на /media/
+    """
+    log_file = get_object_or_404(LogFile, pk=pk)
+    if not log_file.file:
+        raise Http404
+    response = StreamingHttpResponse(iter_log_chunks(log_file), content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = content_disposition_header(False, original_name(log_file))
+    if log_file.original_size:
+        response['Content-Length'] = log_file.original_size
+    return response
 
 
 class LogFileView(APIView):
@@ -678,7 +770,8 @@ class LogFileView(APIView):
                     "application/json": {
                         "id": "550e8400-e29b-41d4-a716-446655440003",
                         "message": "Лог файл успешно загружен",
-                        "file_size": 1024
+                        "file_size": 1024,
+                        "line_count": 32
                     }
                 }
             ),
@@ -711,6 +804,7 @@ class LogFileView(APIView):
             )
         ]
     )
+    @transaction.atomic
     def post(self, request):
         device = request.user
         
@@ -747,43 +841,50 @@ class LogFileView(APIView):
         serializer = LogFileSerializer(data=data)
         
         if serializer.is_valid():
-            # Читаем содержимое файла для превью
+            # Проверяем кодировку и считаем символы потоково, превью - из начала файла
             try:
-                file_content = uploaded_file.read().decode('utf-8')
-                # Возвращаем указатель файла в начало
-                uploaded_file.seek(0)
+                scan = scan_log_file(uploaded_file)
             except UnicodeDecodeError:
                 return Response(
                     {'error': 'Ошибка чтения файла. Убедитесь, что файл содержит текст в кодировке UTF-8.'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Создаем запись лога с файлом и превью текста
+            # Содержимое хранится в LogBlob по SHA-256: повторная загрузка тех же
+            # байт только добавляет ссылку, файл пишется (сжатым) один раз
+            blob = store_blob(scan.sha256, uploaded_file.chunks(LOG_IO_CHUNK_SIZE))
+            
+            # Создаем запись лога с превью текста
             log_file = serializer.save(
                 device=device,
-                text=file_content[:1000] + "..." if len(file_content) > 1000 else file_content
+                text=scan.preview,
+                blob=blob,
+                file=blob.file.name,
+                compression=blob.compression,
+                original_size=blob.original_size,
+                stored_size=blob.stored_size,
+                original_name=uploaded_file.name,
             )
             
             # Update device last_seen
-            device.last_seen = timezone.now()
-            device.save(update_fields=['last_seen'])
+            touch_device(device)
             
             # Send notification to admin chat with file
             notification_text = f"📄 <b>НОВЫЙ ЛОГ ФАЙЛ</b>\n\n"
             notification_text += f"📱 Устройство: {device.name}\n"
             notification_text += f"⏰ Время: {log_file.date_created.strftime('%d.%m.%Y %H:%M:%S')}\n"
-            notification_text += f"📊 Размер: {len(file_content)} символов\n"
+            notification_text += f"📊 Размер: {scan.chars} символов, {scan.lines} строк\n"
             notification_text += f"📁 Файл: {uploaded_file.name}\n"
-            notification_text += f"🔗 Скачать: <a href='{log_file.file.url}'>Открыть файл</a>"
+            notification_text += f"🔗 Скачать: <a href='{reverse('log-file-download', args=[log_file.pk])}'>Открыть файл</a>"
             
-            # TODO: Move to Celery for async processing
-            notify(notification_text)
+            enqueue_notification(notification_text)
             
             return Response(
                 {
                     'id': str(log_file.id), 
                     'message': 'Лог файл успешно загружен',
-                    'file_size': len(file_content),
+                    'file_size': scan.chars,
+                    'line_count': scan.lines,
                     'file_name': uploaded_file.name
                 }, 
                 status=status.HTTP_201_CREATED
@@ -798,6 +899,9 @@ class DiagnosticsBatchView(APIView):
     """
     permission_classes = []  # Без аутентификации, используем токен из запроса
     
+    # Размер пачки для IN-запросов и bulk_create (лимит переменных SQLite)
+    BULK_CHUNK_SIZE = 500
+    
     @swagger_auto_schema(
         operation_summary="📊 Загрузить пакет диагностических событий",
         operation_description="""
@@ -823,6 +927,9 @@ class DiagnosticsBatchView(APIView):
         - `metrics` - снимок метрик (MetricsSnapshot) (опционально)
         - `context` - произвольные дополнительные данные (опционально)
         - `thread`, `attempt`, `flowId` - данные для отладки (опционально)
+        
+        Повторная отправка уже сохраненного события (в том числе перенесенного
+        в архив) не ошибка: событие считается обработанным и не дублируется.
         """,
         tags=['Диагностика'],
         request_body=openapi.Schema(
@@ -912,80 +1019,78 @@ class DiagnosticsBatchView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            device = Device.objects.get(token=token)
-        except Device.DoesNotExist:
-            return Response({
-                'success': False,
-                'error': 'Устройство с таким токеном не найдено'
-            }, status=status.HTTP_404_NOT_FOUND)
-        except (ValidationError, ValueError):
+            device = resolve_device(token)
+        except ValueError:
             return Response({
                 'success': False,
                 'error': 'Неверный формат токена устройства'
             }, status=status.HTTP_400_BAD_REQUEST)
+        if device is None:
+            return Response({
+                'success': False,
+                'error': 'Устройство с таким токеном не найдено'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        new_events = {}  # event_id -> (index, DiagnosticEvent)
+        duplicates = 0
+        now_ms = int(timezone.now().timestamp() * 1000)
+
+        # 1. Валидируем весь пакет за один проход, без сериализатора на каждое событие
+        valid_events, errors = validate_events(events_data)
+        events_failed = len(errors)
 
-        events_processed = 0
-        events_failed = 0
-        errors = []
-
-        for idx, event_data in enumerate(events_data):
-            if not isinstance(event_data, dict):
-                events_failed += 1
-                errors.append({
-                    'index': idx,
-                    'eventId': 'unknown',
-                    'error': 'Событие должно быть объектом'
-                })
+        for idx, values in valid_events:
+            event_id = values['event_id']
+            if event_id in new_events:
+                # Повтор внутри пакета считается уже сохраненным
+                duplicates += 1
                 continue
 
+            if values.get('timestamp') is None:
+                values['timestamp'] = now_ms
+            new_events[event_id] = (idx, DiagnosticEvent(device=device, **values))
+
+        # 2. Одним IN-запросом (пачками) находим уже сохраненные event_id - повторная отправка не ошибка
+        event_ids = list(new_events)
+        for i in range(0, len(event_ids), self.BULK_CHUNK_SIZE):
+            existing = DiagnosticEvent.objects.filter(
+                event_id__in=event_ids[i:i + self.BULK_CHUNK_SIZE]
+            ).values_list('event_id', flat=True)
+            for event_id in existing:
+                del new_events[event_id]
+                duplicates += 1
+
+        # События, уже перенесенные в архив (повторная отправка старого пакета), тоже дубликаты
+        for event_id in archived_event_ids(device, {
+            event_id: event.timestamp for event_id, (_, event) in new_events.items()
+        }):
+            del new_events[event_id]
+            duplicates += 1
+
+        # 3. Вставляем новые события одной транзакцией
+        events_processed = duplicates
+        if new_events:
             try:
-                serializer = DiagnosticEventSerializer(data=event_data)
-                if not serializer.is_valid():
+                with transaction.atomic():
+                    DiagnosticEvent.objects.bulk_create(
+                        [event for _, event in new_events.values()],
+                        batch_size=self.BULK_CHUNK_SIZE,
+                        ignore_conflicts=True,  # параллельная загрузка того же пакета
+                    )
+                events_processed += len(new_events)
+            except Exception as e:
+                logger.error('Failed to save diagnostic events: %s', e)
+                for event_id, (idx, _) in new_events.items():
                     events_failed += 1
                     errors.append({
                         'index': idx,
-                        'eventId': event_data.get('eventId', 'unknown'),
-                        'errors': serializer.errors
+                        'eventId': event_id,
+                        'error': str(e)
                     })
-                    continue
-
-                validated_data = serializer.validated_data
-
-                timestamp = validated_data.get('timestamp')
-                if not timestamp:
-                    timestamp = int(timezone.now().timestamp() * 1000)
-
-                DiagnosticEvent.objects.create(
-                    event_id=validated_data['eventId'],
-                    device=device,
-                    timestamp=timestamp,
-                    event_code=validated_data['eventCode'],
-                    event_severity=validated_data['eventSeverity'],
-                    component=validated_data['component'],
-                    pipeline_stage=validated_data.get('pipelineStage'),
-                    context=validated_data.get('context', {}),
-                    thread=validated_data.get('thread'),
-                    attempt=validated_data.get('attempt'),
-                    flow_id=validated_data.get('flowId'),
-                    state_snapshot=validated_data.get('state'),
-                    metrics_snapshot=validated_data.get('metrics'),
-                )
-
-                events_processed += 1
-
-            except IntegrityError:
-                events_processed += 1
-            except Exception as e:
-                events_failed += 1
-                errors.append({
-                    'index': idx,
-                    'eventId': event_data.get('eventId', 'unknown'),
-                    'error': str(e)
-                })
+                errors.sort(key=lambda error: error['index'])
 
         try:
-            device.last_seen = timezone.now()
-            device.save(update_fields=['last_seen'])
+            touch_device(device)
         except OperationalError as e:
             logger.warning('Failed to update device last_seen: %s', e)
 
@@ -998,7 +1103,7 @@ class DiagnosticsBatchView(APIView):
             for event in critical_events[:5]:
                 notification_text += f"• {event.get('eventCode', 'Unknown')} ({event.get('component', 'Unknown')})\n"
 
-            notify(notification_text)
+            enqueue_notification(notification_text)
 
         return Response({
             'success': True,
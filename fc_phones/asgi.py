@@ -1,5 +1,11 @@
 """
 ASGI config for fc_phones project.
+
+Живая лента дашборда (/api/admin/live-events, Server-Sent Events) работает
+только под ASGI-сервером (uvicorn из requirements.txt). deploy-fresh.sh
+запускает проект так: gunicorn fc_phones.asgi:application -k uvicorn.workers.UvicornWorker,
+deploy.sh - uvicorn fc_phones.asgi:application. Под WSGI (runserver) ручка
+отвечает 204, и дашборд обновляется опросом.
 """
 
 import os
@@ -132,10 +132,69 @@ REST_FRAMEWORK = {
 # Telegram Bot settings
 TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN', default='')
 TELEGRAM_ADMIN_CHAT_ID = config('TELEGRAM_ADMIN_CHAT_ID', default='')
+TELEGRAM_SENDER_MAX_WORKERS = config('TELEGRAM_SENDER_MAX_WORKERS', default=16, cast=int)  # параллельных запросов к Telegram API
+# Лимиты Telegram Bot API: ~30 сообщений в секунду на бота и ~1 в секунду в один чат
+TELEGRAM_GLOBAL_RATE_LIMIT = config('TELEGRAM_GLOBAL_RATE_LIMIT', default=30, cast=float)
+TELEGRAM_PER_CHAT_RATE_LIMIT = config('TELEGRAM_PER_CHAT_RATE_LIMIT', default=1, cast=float)
+TELEGRAM_RATE_LIMIT_MAX_WAIT = config('TELEGRAM_RATE_LIMIT_MAX_WAIT', default=5, cast=float)  # дольше - переносим в очередь
+
+# Очередь уведомлений (run_notification_worker)
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = config('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+NOTIFICATION_OUTBOX_BACKOFF_BASE = config('NOTIFICATION_OUTBOX_BACKOFF_BASE', default=5, cast=int)  # секунды
+NOTIFICATION_OUTBOX_BACKOFF_MAX = config('NOTIFICATION_OUTBOX_BACKOFF_MAX', default=3600, cast=int)  # секунды
+NOTIFICATION_OUTBOX_LOCK_TIMEOUT = config('NOTIFICATION_OUTBOX_LOCK_TIMEOUT', default=300, cast=int)  # секунды
+
+# Фильтры уведомлений кэшируются в памяти процесса; изменения из других процессов
+# подхватываются не позже чем через указанное число секунд
+NOTIFICATION_FILTER_RELOAD_INTERVAL = config('NOTIFICATION_FILTER_RELOAD_INTERVAL', default=30, cast=float)
+
+# Кэш поиска устройства по токену (в памяти процесса)
+DEVICE_TOKEN_CACHE_SIZE = config('DEVICE_TOKEN_CACHE_SIZE', default=10000, cast=int)
+DEVICE_TOKEN_CACHE_TTL = config('DEVICE_TOKEN_CACHE_TTL', default=300, cast=float)  # секунды
+DEVICE_TOKEN_NEGATIVE_TTL = config('DEVICE_TOKEN_NEGATIVE_TTL', default=60, cast=float)  # для неизвестных токенов
+# Как часто накопленные Device.last_seen записываются в БД одним UPDATE; 0 - писать сразу
+DEVICE_LAST_SEEN_FLUSH_INTERVAL = config('DEVICE_LAST_SEEN_FLUSH_INTERVAL', default=15, cast=float)
+
+# Сколько дней хранить сырые интервалы BatteryReport до свертки в почасовые сводки (rollup_battery_reports)
+BATTERY_REPORT_RAW_RETENTION_DAYS = config('BATTERY_REPORT_RAW_RETENTION_DAYS', default=7, cast=int)
+
+# Политики хранения для команды prune: возраст в днях и/или число последних записей на устройство (0 - без ограничения)
+RETENTION_MESSAGE_DAYS = config('RETENTION_MESSAGE_DAYS', default=0, cast=int)
+RETENTION_MESSAGE_MAX_PER_DEVICE = config('RETENTION_MESSAGE_MAX_PER_DEVICE', default=0, cast=int)
+RETENTION_DIAGNOSTIC_EVENT_DAYS = config('RETENTION_DIAGNOSTIC_EVENT_DAYS', default=0, cast=int)
+RETENTION_DIAGNOSTIC_EVENT_MAX_PER_DEVICE = config('RETENTION_DIAGNOSTIC_EVENT_MAX_PER_DEVICE', default=0, cast=int)
+RETENTION_BATTERY_REPORT_DAYS = config('RETENTION_BATTERY_REPORT_DAYS', default=0, cast=int)
+RETENTION_BATTERY_REPORT_MAX_PER_DEVICE = config('RETENTION_BATTERY_REPORT_MAX_PER_DEVICE', default=0, cast=int)
+RETENTION_LOG_FILE_DAYS = config('RETENTION_LOG_FILE_DAYS', default=0, cast=int)
+RETENTION_LOG_FILE_MAX_PER_DEVICE = config('RETENTION_LOG_FILE_MAX_PER_DEVICE', default=0, cast=int)
+
+# Архив диагностических событий (archive_diagnostics): события старше N дней переносятся в сжатые NDJSON-сегменты
+DIAGNOSTICS_ARCHIVE_ROOT = config('DIAGNOSTICS_ARCHIVE_ROOT', default=str(BASE_DIR / 'archive' / 'diagnostics'))
+DIAGNOSTICS_ARCHIVE_AFTER_DAYS = config('DIAGNOSTICS_ARCHIVE_AFTER_DAYS', default=30, cast=int)
+
+# Фоновые экспорты диагностики (run_export_worker): задача в 'running' без прогресса дольше
+# LOCK_TIMEOUT секунд возвращается в очередь; готовые файлы хранятся KEEP_DAYS дней (0 - бессрочно)
+EXPORT_JOB_LOCK_TIMEOUT = config('EXPORT_JOB_LOCK_TIMEOUT', default=600, cast=int)
+EXPORT_JOB_KEEP_DAYS = config('EXPORT_JOB_KEEP_DAYS', default=7, cast=int)
+
+# Живая лента дашборда (SSE, только под ASGI): размер буфера событий, интервал опроса БД (сек),
+# интервал heartbeat (сек), задержка переподключения клиента (мс) и максимум одновременных подключений на процесс
+LIVE_EVENTS_BUFFER_SIZE = config('LIVE_EVENTS_BUFFER_SIZE', default=500, cast=int)
+LIVE_EVENTS_POLL_INTERVAL = config('LIVE_EVENTS_POLL_INTERVAL', default=1, cast=float)
+LIVE_EVENTS_HEARTBEAT = config('LIVE_EVENTS_HEARTBEAT', default=15, cast=int)
+LIVE_EVENTS_RETRY_MS = config('LIVE_EVENTS_RETRY_MS', default=3000, cast=int)
+LIVE_EVENTS_MAX_SUBSCRIBERS = config('LIVE_EVENTS_MAX_SUBSCRIBERS', default=100, cast=int)
 
 # File upload settings
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50 MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50 MB
+# Загрузки больше этого размера Django пишет блоками во временный файл на диске
+# (FILE_UPLOAD_TEMP_DIR, по умолчанию системный tmp), а не держит в памяти
+FILE_UPLOAD_MAX_MEMORY_SIZE = config('FILE_UPLOAD_MAX_MEMORY_SIZE', default=256 * 1024, cast=int)  # 256 KB
+FILE_UPLOAD_TEMP_DIR = config('FILE_UPLOAD_TEMP_DIR', default=None)
+
+# Сжатие лог файлов на диске: auto (zstd, если установлен zstandard, иначе gzip), zstd, gzip или none
+LOG_COMPRESSION = config('LOG_COMPRESSION', default='auto')
+LOG_ZSTD_LEVEL = config('LOG_ZSTD_LEVEL', default=9, cast=int)
 
 
 UNFOLD = {
@@ -187,6 +246,16 @@ UNFOLD = {
                         "icon": "bug_report",
                         "link": "/admin/devices/diagnosticevent/",
                     },
+                    {
+                        "title": "Архив диагностики",
+                        "icon": "inventory_2",
+                        "link": "/admin/devices/diagnosticarchivesegment/",
+                    },
+                    {
+                        "title": "Фоновые экспорты",
+                        "icon": "download",
+                        "link": "/admin/devices/exportjob/",
+                    },
                     {
                         "title": "Статус устройств",
                         "icon": "analytics",
@@ -207,11 +276,21 @@ UNFOLD = {
                         "icon": "filter_list",
                         "link": "/admin/devices/notificationfilter/",
                     },
+                    {
+                        "title": "Фильтры по тексту",
+                        "icon": "rule",
+                        "link": "/admin/devices/notificationtextfilter/",
+                    },
                     {
                         "title": "Токены устройств",
                         "icon": "phone",
                         "link": "/admin/devices/device/",
                     },
+                    {
+                        "title": "Очередь уведомлений",
+                        "icon": "outbox",
+                        "link": "/admin/devices/notificationoutbox/",
+                    },
                     {
                         "title": "Пользователи Telegram",
                         "icon": "people",